@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+市场数据表查询基准
+对 MarketDataManager 的典型查询（按股票+时间区间、最新N条、保留期清理）输出执行计划与耗时，
+用于对比 migrate_market_schema.py 迁移前后的效果：
+
+    python database/benchmark_market_schema.py --output before.json
+    python database/migrate_market_schema.py --apply
+    python database/benchmark_market_schema.py --output after.json --compare before.json
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.market_data_manager import MarketDataManager
+
+# (名称, 表, 时间列, 区间天数, SQL)；区间以该股票最新一条数据为终点
+RANGE_QUERIES = [
+    ('tick_range_1d', 'tick_data', 'tick_time', 1,
+     "SELECT * FROM tick_data WHERE symbol = %s AND tick_time BETWEEN %s AND %s ORDER BY tick_time"),
+    ('minute_range_5d', 'minute_data', 'datetime', 5,
+     "SELECT * FROM minute_data WHERE symbol = %s AND datetime BETWEEN %s AND %s ORDER BY datetime"),
+    ('daily_range_1y', 'daily_data', 'trade_date', 365,
+     "SELECT * FROM daily_data WHERE symbol = %s AND trade_date BETWEEN %s AND %s ORDER BY trade_date"),
+]
+
+LATEST_QUERIES = [
+    ('tick_latest_100', "SELECT * FROM tick_data WHERE symbol = %s ORDER BY tick_time DESC LIMIT 100"),
+    ('daily_latest_price', "SELECT close FROM daily_data WHERE symbol = %s ORDER BY trade_date DESC LIMIT 1"),
+]
+
+# 保留期清理只看执行计划，不实际执行
+RETENTION_QUERIES = [
+    ('tick_retention', 'tick_data', 'tick_time', 60),
+    ('minute_retention', 'minute_data', 'datetime', 30),
+]
+
+
+def _explain(manager: MarketDataManager, sql: str, params) -> List[Dict]:
+    rows = manager.execute_query("EXPLAIN " + sql, params)
+    keep = ('table', 'partitions', 'type', 'key', 'rows', 'filtered', 'Extra')
+    return [{k: row.get(k) for k in keep if k in row} for row in rows]
+
+
+def _time_query(manager: MarketDataManager, sql: str, params, repeat: int) -> Dict:
+    latencies = []
+    n_rows = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n_rows = len(manager.execute_query(sql, params))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {
+        'rows': n_rows,
+        'median_ms': float(np.median(latencies)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+    }
+
+
+def run_benchmark(manager: MarketDataManager, symbols: List[str], repeat: int = 5) -> Dict:
+    """
+    运行全部基准查询
+
+    Returns:
+        {查询名: {'plan': EXPLAIN结果, 'rows', 'median_ms', 'p95_ms'}}，多只股票的耗时取平均
+    """
+    results = {}
+
+    def add(name, plan, timing):
+        entry = results.setdefault(name, {'plan': plan, 'samples': []})
+        if timing:
+            entry['samples'].append(timing)
+
+    for symbol in symbols:
+        for name, table, time_column, days, sql in RANGE_QUERIES:
+            latest = manager.execute_query(
+                f"SELECT MAX(`{time_column}`) AS latest FROM `{table}` WHERE symbol = %s", (symbol,))
+            end = latest[0]['latest'] if latest else None
+            if end is None:
+                continue
+            params = (symbol, end - timedelta(days=days), end)
+            add(name, _explain(manager, sql, params), _time_query(manager, sql, params, repeat))
+        for name, sql in LATEST_QUERIES:
+            add(name, _explain(manager, sql, (symbol,)), _time_query(manager, sql, (symbol,), repeat))
+
+    for name, table, time_column, days in RETENTION_QUERIES:
+        cutoff = date.today() - timedelta(days=days)
+        partitions = manager.get_partitions(table)
+        plan = _explain(manager, f"DELETE FROM `{table}` WHERE `{time_column}` < %s", (cutoff,))
+        expired = [p['name'] for p in partitions if p['upper'] is not None and p['upper'] <= cutoff]
+        results[name] = {
+            'plan': plan,
+            'method': 'DROP PARTITION' if partitions else 'DELETE',
+            'partitions_to_drop': expired,
+            'samples': [],
+        }
+
+    for entry in results.values():
+        samples = entry.pop('samples')
+        if samples:
+            entry['rows'] = samples[-1]['rows']
+            entry['median_ms'] = float(np.mean([s['median_ms'] for s in samples]))
+            entry['p95_ms'] = float(np.mean([s['p95_ms'] for s in samples]))
+    return results
+
+
+def _plan_summary(plan: List[Dict]) -> str:
+    return '; '.join(f"type={row.get('type')} key={row.get('key')} rows={row.get('rows')} "
+                     f"partitions={row.get('partitions')} {row.get('Extra') or ''}".strip() for row in plan)
+
+
+def print_report(results: Dict, before: Optional[Dict] = None):
+    """打印基准结果；提供迁移前结果时并列对比耗时与执行计划"""
+    for name, entry in results.items():
+        print(f"\n[{name}]")
+        if before and name in before:
+            old = before[name]
+            if 'median_ms' in old and 'median_ms' in entry:
+                speedup = old['median_ms'] / entry['median_ms'] if entry['median_ms'] else float('inf')
+                print(f"  耗时: {old['median_ms']:.2f}ms -> {entry['median_ms']:.2f}ms (x{speedup:.1f}), "
+                      f"p95 {old['p95_ms']:.2f}ms -> {entry['p95_ms']:.2f}ms")
+            if 'method' in old:
+                print(f"  清理方式: {old['method']} -> {entry.get('method')}")
+            print(f"  迁移前计划: {_plan_summary(old['plan'])}")
+            print(f"  迁移后计划: {_plan_summary(entry['plan'])}")
+        else:
+            if 'median_ms' in entry:
+                print(f"  耗时: median {entry['median_ms']:.2f}ms, p95 {entry['p95_ms']:.2f}ms, {entry['rows']} 行")
+            if 'method' in entry:
+                print(f"  清理方式: {entry['method']} {entry['partitions_to_drop'] or ''}")
+            print(f"  执行计划: {_plan_summary(entry['plan'])}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='市场数据表查询基准（执行计划与耗时）')
+    parser.add_argument('--host', default='localhost', help='数据库主机')
+    parser.add_argument('--port', type=int, default=3306, help='数据库端口')
+    parser.add_argument('--user', default='market_data_app', help='数据库用户名')
+    parser.add_argument('--password', default='app_password', help='数据库密码')
+    parser.add_argument('--database', default='market_data', help='数据库名称')
+    parser.add_argument('--symbols', nargs='+', default=['000001.SZ'], help='参与测试的股票代码')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询重复次数')
+    parser.add_argument('--output', help='结果保存为JSON')
+    parser.add_argument('--compare', help='与之前保存的JSON结果对比')
+    args = parser.parse_args()
+
+    manager = MarketDataManager(host=args.host, port=args.port, user=args.user,
+                                password=args.password, database=args.database)
+    results = run_benchmark(manager, args.symbols, args.repeat)
+    before = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            before = json.load(f)
+    print_report(results, before)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+        print(f"\n结果已保存: {args.output}")
+    manager.close_pool()
+
+
+if __name__ == '__main__':
+    main()
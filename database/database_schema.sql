@@ -33,7 +33,7 @@ CREATE TABLE IF NOT EXISTS stock_basic (
 -- 2. 股票行情数据表
 -- ========================================
 
--- 日线行情数据表
+-- 日线行情数据表（按股票查询走 uk_ts_code_date 的最左前缀，不再单独建 ts_code 索引）
 CREATE TABLE IF NOT EXISTS daily_data (
     id BIGINT AUTO_INCREMENT PRIMARY KEY,
     ts_code VARCHAR(20) NOT NULL COMMENT 'TS代码',
@@ -49,8 +49,7 @@ CREATE TABLE IF NOT EXISTS daily_data (
     amount DECIMAL(20,4) COMMENT '成交额',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE KEY uk_ts_code_date (ts_code, trade_date),
-    INDEX idx_trade_date (trade_date),
-    INDEX idx_ts_code (ts_code)
+    INDEX idx_trade_date (trade_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='日线行情数据表';
 
 -- 复权因子表
@@ -79,8 +78,7 @@ CREATE TABLE IF NOT EXISTS minute_data (
     period VARCHAR(10) DEFAULT '1min' COMMENT '周期',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE KEY uk_ts_code_datetime (ts_code, trade_datetime),
-    INDEX idx_trade_datetime (trade_datetime),
-    INDEX idx_ts_code (ts_code)
+    INDEX idx_trade_datetime (trade_datetime)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='分钟级行情数据表';
 
 -- ========================================
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+技术指标增量状态
+每只股票保存推进指标所需的最小状态，新交易日的K线到来时O(1)更新全部指标，不再回读历史重算：
+- 最近 STATE_WINDOW 根K线的 high/low/close 环形窗口（MA、RSI、BOLL、KDJ的RSV、ATR、CCI、WR）
+- EMA12/EMA26/DEA/K/D 的指数加权累加器，递推方式与 pandas ewm(adjust=True) 逐步一致
+
+全部状态保存在 data/indicator_state.npy（结构化数组，进程内只加载一次），
+计算结果与 TechnicalIndicatorsCalculator 全量计算一致。
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STATE_PATH = os.path.join('data', 'indicator_state.npy')
+
+# 窗口长度取所有滚动指标中最长的 ma250
+STATE_WINDOW = 250
+
+# 指数加权累加器：(名称, alpha)，span=n 对应 alpha=2/(n+1)
+EWM_SPECS = (
+    ('ema12', 2 / 13),
+    ('ema26', 2 / 27),
+    ('macd_dea', 2 / 10),
+    ('kdj_k', 1 / 3),
+    ('kdj_d', 1 / 3),
+)
+
+STATE_DTYPE = np.dtype([
+    ('symbol', 'U16'),
+    ('trade_date', 'i4'),  # 最后一根已计入状态的K线日期 YYYYMMDD
+    ('count', 'i8'),  # 已计入的K线总数
+    ('window', 'f8', (STATE_WINDOW, 3)),  # 最近K线 (high, low, close)，按时间升序靠右对齐，不足处为NaN
+    ('ewm', 'f8', (len(EWM_SPECS), 3)),  # 每个累加器的 (加权值, 权重和, 有效观测数)
+])
+
+
+def _ewm_step(acc: np.ndarray, alpha: float, value: float) -> float:
+    """
+    指数加权均值推进一步，与 pandas ewm(alpha, adjust=True, ignore_na=False).mean() 的递推相同
+
+    Args:
+        acc: [加权值, 权重和, 有效观测数]，原地更新
+    """
+    weighted, old_wt, nobs = acc
+    is_observation = value == value
+    if weighted == weighted:
+        old_wt *= 1 - alpha
+        if is_observation:
+            if weighted != value:
+                weighted = (old_wt * weighted + value) / (old_wt + 1.0)
+            old_wt += 1.0
+    elif is_observation:
+        weighted = value
+    nobs += is_observation
+    acc[0], acc[1], acc[2] = weighted, old_wt, nobs
+    return weighted if nobs >= 1 else np.nan
+
+
+class IndicatorState:
+    """单只股票的指标状态"""
+
+    def __init__(self, record: Optional[np.void] = None):
+        if record is None:
+            self.trade_date = 0
+            self.count = 0
+            self.window = np.full((STATE_WINDOW, 3), np.nan)
+            self.ewm = np.tile(np.array([np.nan, 1.0, 0.0]), (len(EWM_SPECS), 1))
+        else:
+            self.trade_date = int(record['trade_date'])
+            self.count = int(record['count'])
+            self.window = np.array(record['window'])
+            self.ewm = np.array(record['ewm'])
+
+    def update(self, trade_date: int, high: float, low: float, close: float) -> Dict[str, float]:
+        """计入一根新K线，返回该交易日的全部指标（历史不足的指标为NaN）"""
+        window = self.window
+        window[:-1] = window[1:]
+        window[-1] = (high, low, close)
+        self.count += 1
+        self.trade_date = trade_date
+        n = self.count
+        highs, lows, closes = window[:, 0], window[:, 1], window[:, 2]
+        # 名称 -> (累加器行视图, alpha)，_ewm_step 原地更新 self.ewm
+        ewm = {name: (self.ewm[i], alpha) for i, (name, alpha) in enumerate(EWM_SPECS)}
+        out = {}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 移动平均线
+            for period in (5, 10, 20, 60, 120, 250):
+                out[f'ma{period}'] = closes[-period:].mean() if n >= period else np.nan
+
+            # MACD
+            dif = _ewm_step(*ewm['ema12'], close) - _ewm_step(*ewm['ema26'], close)
+            out['macd_dif'] = dif
+            out['macd_dea'] = _ewm_step(*ewm['macd_dea'], dif)
+            out['macd_histogram'] = dif - out['macd_dea']
+
+            # RSI：首根K线的涨跌视为0（与 diff().where(...) 的NaN填0一致）
+            for period in (6, 12, 24):
+                if n < period:
+                    out[f'rsi{period}'] = np.nan
+                    continue
+                delta = np.diff(closes[-(period + 1):])
+                gain = np.where(delta > 0, delta, 0.0).mean()
+                loss = np.where(delta < 0, -delta, 0.0).mean()
+                out[f'rsi{period}'] = 100 - 100 / (1 + np.float64(gain) / loss)
+
+            # KDJ
+            rsv = np.nan
+            if n >= 9:
+                low_min, high_max = lows[-9:].min(), highs[-9:].max()
+                rsv = (np.float64(close) - low_min) / (high_max - low_min) * 100
+            out['kdj_k'] = _ewm_step(*ewm['kdj_k'], rsv)
+            out['kdj_d'] = _ewm_step(*ewm['kdj_d'], out['kdj_k'])
+            out['kdj_j'] = 3 * out['kdj_k'] - 2 * out['kdj_d']
+
+            # 布林带
+            if n >= 20:
+                middle, std = closes[-20:].mean(), closes[-20:].std(ddof=1)
+                out['boll_middle'], out['boll_upper'], out['boll_lower'] = middle, middle + std * 2, middle - std * 2
+            else:
+                out['boll_middle'] = out['boll_upper'] = out['boll_lower'] = np.nan
+
+            # ATR：需要前一根收盘价，首根K线的真实波幅为NaN
+            if n >= 15:
+                prev_close = closes[-15:-1]
+                h, l = highs[-14:], lows[-14:]
+                true_range = np.maximum(h - l, np.maximum(np.abs(h - prev_close), np.abs(l - prev_close)))
+                out['atr'] = true_range.mean()
+            else:
+                out['atr'] = np.nan
+
+            # CCI
+            if n >= 20:
+                typical_price = (highs[-20:] + lows[-20:] + closes[-20:]) / 3
+                sma = typical_price.mean()
+                out['cci'] = (typical_price[-1] - sma) / (0.015 * np.abs(typical_price - sma).mean())
+            else:
+                out['cci'] = np.nan
+
+            # 威廉指标
+            if n >= 14:
+                highest_high, lowest_low = highs[-14:].max(), lows[-14:].min()
+                out['williams_r'] = -100 * (highest_high - np.float64(close)) / (highest_high - lowest_low)
+            else:
+                out['williams_r'] = np.nan
+
+        return {name: float(value) for name, value in out.items()}
+
+
+class IndicatorStateStore:
+    """全部股票的指标状态，进程内共享"""
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        """
+        Args:
+            path: 状态文件
+        """
+        self.path = path
+        self._states: Dict[str, IndicatorState] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            for record in np.load(self.path):
+                self._states[str(record['symbol'])] = IndicatorState(record)
+
+    def save(self):
+        """写回状态文件（先写临时文件再替换）"""
+        with self._lock:
+            records = np.zeros(len(self._states), dtype=STATE_DTYPE)
+            for i, (symbol, state) in enumerate(self._states.items()):
+                records[i] = (symbol, state.trade_date, state.count, state.window, state.ewm)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp.npy'
+        np.save(tmp_path, records)
+        os.replace(tmp_path, self.path)
+
+    def get(self, symbol: str) -> Optional[IndicatorState]:
+        return self._states.get(symbol)
+
+    def last_trade_date(self, symbol: str) -> Optional[int]:
+        """状态中最后一根K线的日期（YYYYMMDD），无状态返回None"""
+        state = self._states.get(symbol)
+        return state.trade_date if state else None
+
+    def reset(self, symbol: str):
+        """丢弃某只股票的状态（如历史数据被修正后需要重建）"""
+        with self._lock:
+            self._states.pop(symbol, None)
+
+    def advance(self, symbol: str, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        把新K线依次计入状态，已计入的日期（不晚于状态日期）自动跳过
+
+        Args:
+            bars: 含 trade_date/high/low/close 的日线，任意顺序
+        Returns:
+            symbol/trade_date/各指标 的DataFrame（每根新K线一行，历史不足的指标为NaN）
+        """
+        with self._lock:
+            state = self._states.get(symbol)
+            if state is None:
+                state = self._states[symbol] = IndicatorState()
+        if bars is None or bars.empty:
+            return pd.DataFrame()
+        bars = bars.sort_values('trade_date')
+        dates = pd.to_datetime(bars['trade_date'])
+        int_dates = (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).to_numpy()
+        values = bars[['high', 'low', 'close']].to_numpy(dtype=float)
+        rows = []
+        for trade_date, int_date, (high, low, close) in zip(bars['trade_date'].to_numpy(), int_dates, values):
+            if int_date <= state.trade_date:
+                continue
+            row = state.update(int(int_date), high, low, close)
+            row['symbol'] = symbol
+            row['trade_date'] = trade_date
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+_indicator_state_store: Optional[IndicatorStateStore] = None
+_indicator_state_store_lock = threading.Lock()
+
+
+def get_indicator_state_store() -> IndicatorStateStore:
+    """获取全局指标状态存储（首次使用时加载）"""
+    global _indicator_state_store
+    with _indicator_state_store_lock:
+        if _indicator_state_store is None:
+            _indicator_state_store = IndicatorStateStore()
+        return _indicator_state_store
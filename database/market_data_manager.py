@@ -10,19 +10,43 @@
 
 import os
 import sys
+import time
+import queue
 import logging
+import threading
 import pymysql
+import pymysql.cursors
 import pandas as pd
-from typing import Dict, Any, List, Optional, Union, Tuple
+from typing import Dict, Any, List, Optional, Union, Tuple, Iterator
 from contextlib import contextmanager
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import json
+import tempfile
 from pathlib import Path
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+# 按月范围分区的表 -> 分区列（分区名 pYYYYMM 存放该月数据，另有 pmax 兜底）
+PARTITIONED_TABLES = {
+    'tick_data': 'tick_time',
+    'minute_data': 'datetime',
+}
+
+
+def _add_months(month: date, n: int) -> date:
+    """月初日期加n个月"""
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_partition_definition(month: date) -> str:
+    """单个月分区的定义，例如 PARTITION p202501 VALUES LESS THAN ('2025-02-01 00:00:00')"""
+    upper = _add_months(month.replace(day=1), 1)
+    return f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper:%Y-%m-%d} 00:00:00')"
+
+
 class MarketDataManager:
     """市场数据管理器 - 专注于数据存储"""
     
@@ -33,7 +57,11 @@ class MarketDataManager:
                  password: str = 'app_password',
                  database: str = 'market_data',
                  charset: str = 'utf8mb4',
-                 autocommit: bool = False):
+                 autocommit: bool = False,
+                 pool_size: int = 5,
+                 pool_timeout: float = 30.0,
+                 pool_recycle: int = 3600,
+                 local_infile: bool = False):
         """
         初始化市场数据管理器
         
@@ -45,6 +73,10 @@ class MarketDataManager:
             database: 数据库名称
             charset: 字符集
             autocommit: 是否自动提交
+            pool_size: 连接池最大连接数
+            pool_timeout: 连接池已满时等待空闲连接的超时（秒）
+            pool_recycle: 连接最长复用时间（秒），超过后重建
+            local_infile: 是否允许 LOAD DATA LOCAL INFILE（批量写入的可选快速通道，需服务端同时开启）
         """
         self.host = host
         self.port = port
@@ -53,6 +85,17 @@ class MarketDataManager:
         self.database = database
         self.charset = charset
         self.autocommit = autocommit
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.local_infile = local_infile
+        
+        # 最近一次批量写入的统计（行数、耗时、行/秒）
+        self.last_insert_stats: Dict[str, Any] = {}
+        
+        # 连接池：空闲连接栈 + 限制同时借出数量的信号量
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
         
         # 设置日志
         self.logger = self._setup_logger()
@@ -87,7 +130,8 @@ class MarketDataManager:
                 database=self.database,
                 charset=self.charset,
                 autocommit=self.autocommit,
-                cursorclass=pymysql.cursors.DictCursor
+                cursorclass=pymysql.cursors.DictCursor,
+                local_infile=self.local_infile
             )
             self.logger.debug(f"创建数据库连接: {self.host}:{self.port}/{self.database}")
             return connection
@@ -95,25 +139,117 @@ class MarketDataManager:
             self.logger.error(f"创建数据库连接失败: {e}")
             raise
     
+    def _acquire_connection(self) -> pymysql.Connection:
+        """从连接池借出连接：优先复用空闲连接，复用前做健康检查，失效或超期则重建"""
+        if not self._slots.acquire(timeout=self.pool_timeout):
+            raise TimeoutError(f"等待数据库连接超时（连接池大小 {self.pool_size}）")
+        try:
+            while True:
+                try:
+                    connection, created_at = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if time.time() - created_at > self.pool_recycle:
+                    self._close_quietly(connection)
+                    continue
+                try:
+                    connection.ping(reconnect=True)
+                    connection._pool_created_at = created_at
+                    return connection
+                except Exception as e:
+                    self.logger.debug(f"丢弃失效连接: {e}")
+                    self._close_quietly(connection)
+            connection = self.get_connection()
+            connection._pool_created_at = time.time()
+            return connection
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release_connection(self, connection: pymysql.Connection, reusable: bool = True):
+        """归还连接；非自动提交模式下先结束事务，避免复用时读到旧快照"""
+        try:
+            if reusable and connection.open:
+                if not self.autocommit:
+                    connection.rollback()
+                self._idle.put((connection, getattr(connection, '_pool_created_at', time.time())))
+            else:
+                self._close_quietly(connection)
+        except Exception:
+            self._close_quietly(connection)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_pool(self):
+        """关闭连接池中所有空闲连接"""
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_quietly(connection)
+
     @contextmanager
-    def get_cursor(self):
-        """获取数据库游标的上下文管理器"""
+    def get_cursor(self, cursorclass=None):
+        """获取数据库游标的上下文管理器（连接来自连接池，用完归还）"""
         connection = None
         cursor = None
+        reusable = True
         try:
-            connection = self.get_connection()
-            cursor = connection.cursor()
+            connection = self._acquire_connection()
+            cursor = connection.cursor(cursorclass) if cursorclass else connection.cursor()
             yield cursor
         except Exception as e:
+            reusable = False
             if connection:
-                connection.rollback()
+                try:
+                    connection.rollback()
+                except Exception:
+                    pass
             self.logger.error(f"数据库操作失败: {e}")
             raise
         finally:
             if cursor:
-                cursor.close()
+                try:
+                    cursor.close()
+                except Exception:
+                    reusable = False
             if connection:
-                connection.close()
+                self._release_connection(connection, reusable)
+
+    def stream_query(self, sql: str, params: Optional[Tuple] = None,
+                     chunksize: int = 50000) -> Iterator[pd.DataFrame]:
+        """
+        流式查询：服务端游标（SSCursor）逐批读取，每批返回一个DataFrame，内存占用与总行数无关
+
+        Args:
+            chunksize: 每批行数
+        """
+        connection = self._acquire_connection()
+        cursor = None
+        exhausted = False
+        try:
+            cursor = connection.cursor(pymysql.cursors.SSCursor)
+            cursor.execute(sql, params)
+            columns = [col[0] for col in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    exhausted = True
+                    break
+                yield pd.DataFrame(list(rows), columns=columns)
+        finally:
+            # 未读完就中止时，服务端游标上还有未读结果，直接关闭连接而不是逐行读完再归还
+            if cursor and exhausted:
+                cursor.close()
+            self._release_connection(connection, reusable=exhausted)
     
     def execute_query(self, sql: str, params: Optional[Tuple] = None) -> List[Dict]:
         """执行查询SQL"""
@@ -136,16 +272,103 @@ class MarketDataManager:
             return result
     
     def insert_dataframe(self, df: pd.DataFrame, table_name: str, 
-                        if_exists: str = 'append', index: bool = False) -> int:
-        """将DataFrame插入数据库"""
+                        if_exists: str = 'append', index: bool = False,
+                        on_duplicate: str = 'update', batch_size: Optional[int] = None,
+                        use_load_data: bool = False) -> int:
+        """
+        将DataFrame批量写入数据库
+        
+        Args:
+            df: 待写入数据，列名与表字段一致
+            table_name: 表名
+            if_exists: 'append' 追加；'replace' 先清空表（TRUNCATE，保留表结构和索引）
+            index: 是否把索引作为列写入
+            on_duplicate: 唯一键冲突时 'update' 覆盖（ON DUPLICATE KEY UPDATE）、'ignore' 跳过、'error' 报错
+            batch_size: executemany 每批行数，默认按列数自动计算（控制单条语句大小低于 max_allowed_packet）
+            use_load_data: 使用 LOAD DATA LOCAL INFILE 经临时CSV导入（需 local_infile=True），失败时回退executemany
+        
+        Returns:
+            写入行数
+        """
+        if df is None or df.empty:
+            return 0
+        if index:
+            df = df.reset_index()
+        columns = [str(c) for c in df.columns]
+        t0 = time.time()
         try:
-            with self.get_cursor() as cursor:
-                connection = cursor.connection
-                df.to_sql(table_name, connection, if_exists=if_exists, index=index, method='multi')
-                return len(df)
+            if if_exists == 'replace':
+                self.execute_update(f"TRUNCATE TABLE `{table_name}`")
+            elif if_exists != 'append':
+                raise ValueError(f"不支持的if_exists: {if_exists}")
+            method = 'executemany'
+            if use_load_data:
+                try:
+                    rows = self._load_data_infile(df, table_name, columns, on_duplicate)
+                    method = 'load_data'
+                except Exception as e:
+                    self.logger.warning(f"LOAD DATA 写入失败，回退executemany: {e}")
+                    rows = self._executemany_insert(df, table_name, columns, on_duplicate, batch_size)
+            else:
+                rows = self._executemany_insert(df, table_name, columns, on_duplicate, batch_size)
         except Exception as e:
             self.logger.error(f"插入DataFrame失败: {e}")
             raise
+        elapsed = time.time() - t0
+        rate = rows / elapsed if elapsed > 0 else float('inf')
+        self.last_insert_stats = {'table': table_name, 'rows': rows, 'elapsed': elapsed,
+                                  'rows_per_sec': rate, 'method': method}
+        self.logger.info(f"批量写入 {table_name}: {rows} 行，耗时 {elapsed:.2f}s，{rate:,.0f} 行/秒（{method}）")
+        return rows
+    
+    @staticmethod
+    def _auto_batch_size(n_columns: int) -> int:
+        """按列数估算每批行数：单条多行INSERT控制在约10万个值以内"""
+        return max(500, min(10000, 100000 // max(1, n_columns)))
+    
+    def _executemany_insert(self, df: pd.DataFrame, table_name: str, columns: List[str],
+                            on_duplicate: str, batch_size: Optional[int]) -> int:
+        """分批executemany（pymysql会合并为多行VALUES），每批一个事务"""
+        col_sql = ', '.join(f"`{c}`" for c in columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        verb = 'INSERT IGNORE' if on_duplicate == 'ignore' else 'INSERT'
+        sql = f"{verb} INTO `{table_name}` ({col_sql}) VALUES ({placeholders})"
+        if on_duplicate == 'update':
+            sql += " ON DUPLICATE KEY UPDATE " + ', '.join(f"`{c}` = VALUES(`{c}`)" for c in columns)
+        # NaN转NULL，numpy类型转Python原生类型
+        data = df.astype(object)
+        data = data.where(data.notna(), None)
+        params = list(data.itertuples(index=False, name=None))
+        batch_size = batch_size or self._auto_batch_size(len(columns))
+        with self.get_cursor() as cursor:
+            for i in range(0, len(params), batch_size):
+                cursor.executemany(sql, params[i:i + batch_size])
+                cursor.connection.commit()
+        return len(params)
+    
+    def _load_data_infile(self, df: pd.DataFrame, table_name: str, columns: List[str], on_duplicate: str) -> int:
+        """写临时CSV后用 LOAD DATA LOCAL INFILE 导入（REPLACE/IGNORE 处理唯一键冲突）"""
+        if not self.local_infile:
+            raise RuntimeError("未开启 local_infile")
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            df.to_csv(path, index=False, header=False, na_rep='\\N', lineterminator='\n',
+                      date_format='%Y-%m-%d %H:%M:%S')
+            duplicate = {'update': 'REPLACE', 'ignore': 'IGNORE'}.get(on_duplicate, '')
+            col_sql = ', '.join(f"`{c}`" for c in columns)
+            sql = f"""
+            LOAD DATA LOCAL INFILE %s {duplicate} INTO TABLE `{table_name}`
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            ({col_sql})
+            """
+            with self.get_cursor() as cursor:
+                cursor.execute(sql, (path.replace('\\', '/'),))
+                cursor.connection.commit()
+            return len(df)
+        finally:
+            os.remove(path)
     
     def query_dataframe(self, sql: str, params: Optional[Tuple] = None) -> pd.DataFrame:
         """查询数据并返回DataFrame"""
@@ -186,38 +409,44 @@ class MarketDataManager:
     # 市场数据相关方法
     # ========================================
     
-    def insert_tick_data(self, df: pd.DataFrame) -> int:
-        """插入tick数据"""
-        return self.insert_dataframe(df, 'tick_data', if_exists='append')
+    def insert_tick_data(self, df: pd.DataFrame, use_load_data: bool = False) -> int:
+        """插入tick数据（唯一键冲突时覆盖）"""
+        return self.insert_dataframe(df, 'tick_data', if_exists='append', use_load_data=use_load_data)
     
-    def insert_minute_data(self, df: pd.DataFrame) -> int:
-        """插入分钟数据"""
-        return self.insert_dataframe(df, 'minute_data', if_exists='append')
+    def insert_minute_data(self, df: pd.DataFrame, use_load_data: bool = False) -> int:
+        """插入分钟数据（唯一键冲突时覆盖）"""
+        return self.insert_dataframe(df, 'minute_data', if_exists='append', use_load_data=use_load_data)
     
-    def insert_daily_data(self, df: pd.DataFrame) -> int:
-        """插入日线数据"""
-        return self.insert_dataframe(df, 'daily_data', if_exists='append')
+    def insert_daily_data(self, df: pd.DataFrame, use_load_data: bool = False) -> int:
+        """插入日线数据（唯一键冲突时覆盖）"""
+        return self.insert_dataframe(df, 'daily_data', if_exists='append', use_load_data=use_load_data)
     
     def insert_adj_factor(self, df: pd.DataFrame) -> int:
         """插入复权因子"""
         return self.insert_dataframe(df, 'adj_factor', if_exists='append')
     
-    def get_tick_data(self, symbol: str, start_time: str, end_time: str) -> pd.DataFrame:
-        """获取tick数据"""
+    def get_tick_data(self, symbol: str, start_time: str, end_time: str,
+                      chunksize: Optional[int] = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        """获取tick数据；指定chunksize时返回按批读取的DataFrame迭代器（流式）"""
         sql = """
         SELECT * FROM tick_data 
         WHERE symbol = %s AND tick_time BETWEEN %s AND %s
         ORDER BY tick_time
         """
+        if chunksize:
+            return self.stream_query(sql, (symbol, start_time, end_time), chunksize)
         return self.query_dataframe(sql, (symbol, start_time, end_time))
     
-    def get_minute_data(self, symbol: str, start_time: str, end_time: str) -> pd.DataFrame:
-        """获取分钟数据"""
+    def get_minute_data(self, symbol: str, start_time: str, end_time: str,
+                        chunksize: Optional[int] = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        """获取分钟数据；指定chunksize时返回按批读取的DataFrame迭代器（流式）"""
         sql = """
         SELECT * FROM minute_data 
         WHERE symbol = %s AND datetime BETWEEN %s AND %s
         ORDER BY datetime
         """
+        if chunksize:
+            return self.stream_query(sql, (symbol, start_time, end_time), chunksize)
         return self.query_dataframe(sql, (symbol, start_time, end_time))
     
     def get_daily_data(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
@@ -254,9 +483,9 @@ class MarketDataManager:
     # 技术指标相关方法
     # ========================================
     
-    def insert_technical_indicators(self, df: pd.DataFrame) -> int:
-        """插入技术指标"""
-        return self.insert_dataframe(df, 'technical_indicators', if_exists='append')
+    def insert_technical_indicators(self, df: pd.DataFrame, use_load_data: bool = False) -> int:
+        """插入技术指标（唯一键冲突时覆盖）"""
+        return self.insert_dataframe(df, 'technical_indicators', if_exists='append', use_load_data=use_load_data)
     
     def get_technical_indicators(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
         """获取技术指标"""
@@ -291,6 +520,28 @@ class MarketDataManager:
         """
         return self.execute_update(sql, (data_type, symbol, status, record_count, error_message))
     
+    def update_sync_status_batch(self, data_type: str, statuses: List[Tuple[str, str, int, str]]) -> int:
+        """
+        批量更新同步状态（一次 executemany）
+        
+        Args:
+            statuses: [(symbol, status, record_count, error_message)]
+        """
+        if not statuses:
+            return 0
+        sql = """
+        INSERT INTO data_sync_status (data_type, symbol, last_sync_time, sync_status, record_count, error_message)
+        VALUES (%s, %s, NOW(), %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+        last_sync_time = NOW(),
+        sync_status = VALUES(sync_status),
+        record_count = VALUES(record_count),
+        error_message = VALUES(error_message),
+        updated_at = NOW()
+        """
+        return self.execute_batch(sql, [(data_type, symbol, status, count, error)
+                                        for symbol, status, count, error in statuses])
+    
     def get_sync_status(self, data_type: Optional[str] = None) -> pd.DataFrame:
         """获取同步状态"""
         sql = "SELECT * FROM data_sync_status"
@@ -371,11 +622,131 @@ class MarketDataManager:
     # 数据清理相关方法
     # ========================================
     
-    def clean_historical_data(self, days_to_keep: int = 30) -> int:
-        """清理历史数据"""
-        sql = "CALL CleanHistoricalData(%s)"
-        result = self.execute_query(sql, (days_to_keep,))
-        return result[0]['deleted_rows'] if result else 0
+    def clean_historical_data(self, days_to_keep: int = 30, batch_size: int = 50000) -> int:
+        """
+        清理历史数据（保留期与原 CleanHistoricalData 存储过程一致）
+        - tick_data 保留 days_to_keep+30 天，minute_data/technical_indicators 保留 days_to_keep 天，
+          daily_data 保留 days_to_keep+365 天
+        - 已按月分区的表直接 DROP PARTITION（按整月对齐，不足一个月的部分留到下次），
+          不再逐行 DELETE；未分区的表按 batch_size 分批删除，避免长事务
+        
+        Returns:
+            删除的行数（分区表为分区行数估算值）
+        """
+        cutoff = date.today() - timedelta(days=days_to_keep)
+        plan = [
+            ('tick_data', 'tick_time', cutoff - timedelta(days=30)),
+            ('minute_data', 'datetime', cutoff),
+            ('technical_indicators', 'trade_date', cutoff),
+            ('daily_data', 'trade_date', cutoff - timedelta(days=365)),
+        ]
+        total = 0
+        for table, time_column, table_cutoff in plan:
+            if self.get_partitions(table):
+                deleted = self.drop_partitions_before(table, table_cutoff)
+            else:
+                deleted = self._delete_before(table, time_column, table_cutoff, batch_size)
+            self.logger.info(f"清理 {table} {table_cutoff} 之前的数据: {deleted} 行")
+            total += deleted
+        self.maintain_partitions()
+        return total
+    
+    def _delete_before(self, table: str, time_column: str, cutoff: date, batch_size: int) -> int:
+        """分批删除 time_column < cutoff 的行，每批单独提交"""
+        sql = f"DELETE FROM `{table}` WHERE `{time_column}` < %s LIMIT {int(batch_size)}"
+        total = 0
+        while True:
+            deleted = self.execute_update(sql, (cutoff,))
+            total += deleted
+            if deleted < batch_size:
+                return total
+    
+    # ========================================
+    # 分区维护相关方法
+    # ========================================
+    
+    def get_partitions(self, table_name: str) -> List[Dict]:
+        """
+        表的分区信息，按分区顺序排列；未分区的表返回空列表
+        
+        Returns:
+            [{'name': 'p202501', 'upper': date(2025, 2, 1) 或 None(MAXVALUE), 'rows': 估算行数}]
+        """
+        sql = """
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """
+        partitions = []
+        for row in self.execute_query(sql, (self.database, table_name)):
+            bound = (row['PARTITION_DESCRIPTION'] or '').strip("'\" ")
+            upper = None if bound.upper() == 'MAXVALUE' else datetime.strptime(bound[:10], '%Y-%m-%d').date()
+            partitions.append({'name': row['PARTITION_NAME'], 'upper': upper, 'rows': int(row['TABLE_ROWS'] or 0)})
+        return partitions
+    
+    def ensure_partitions(self, table_name: str, months_ahead: int = 3) -> int:
+        """
+        为按月分区的表补齐到当前月之后 months_ahead 个月的分区（从 pmax 中拆分，pmax 为空时是纯元数据操作）
+        
+        Returns:
+            新增的分区数；未分区的表返回0
+        """
+        partitions = self.get_partitions(table_name)
+        if not partitions or partitions[-1]['upper'] is not None:
+            return 0
+        time_column = PARTITIONED_TABLES[table_name]
+        bounded = [p['upper'] for p in partitions if p['upper'] is not None]
+        if bounded:
+            start = bounded[-1]
+        else:
+            # 只有 pmax：从已有数据的最早月份开始拆分
+            rows = self.execute_query(f"SELECT MIN(`{time_column}`) AS min_time FROM `{table_name}`")
+            min_time = rows[0]['min_time'] if rows else None
+            start = (min_time.date() if isinstance(min_time, datetime) else min_time or date.today()).replace(day=1)
+        today = date.today()
+        end = _add_months(today.replace(day=1), months_ahead + 1)
+        months = []
+        month = start
+        while month < end:
+            months.append(month)
+            month = _add_months(month, 1)
+        if not months:
+            return 0
+        definitions = ', '.join(month_partition_definition(m) for m in months)
+        self.execute_update(
+            f"ALTER TABLE `{table_name}` REORGANIZE PARTITION {partitions[-1]['name']} INTO "
+            f"({definitions}, PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+        )
+        self.logger.info(f"{table_name} 新增 {len(months)} 个月分区: {months[0]:%Y-%m} ~ {months[-1]:%Y-%m}")
+        return len(months)
+    
+    def drop_partitions_before(self, table_name: str, cutoff: date) -> int:
+        """
+        删除上界不晚于 cutoff 的分区（分区内数据全部早于 cutoff），O(分区数) 的元数据操作
+        
+        Returns:
+            删除分区的估算行数
+        """
+        expired = [p for p in self.get_partitions(table_name) if p['upper'] is not None and p['upper'] <= cutoff]
+        if not expired:
+            return 0
+        self.execute_update(
+            f"ALTER TABLE `{table_name}` DROP PARTITION {', '.join(p['name'] for p in expired)}"
+        )
+        self.logger.info(f"{table_name} 删除分区: {', '.join(p['name'] for p in expired)}")
+        return sum(p['rows'] for p in expired)
+    
+    def maintain_partitions(self, months_ahead: int = 3) -> Dict[str, int]:
+        """所有按月分区的表补齐未来分区，返回 {表名: 新增分区数}"""
+        result = {}
+        for table_name in PARTITIONED_TABLES:
+            try:
+                result[table_name] = self.ensure_partitions(table_name, months_ahead)
+            except Exception as e:
+                self.logger.error(f"{table_name} 分区维护失败: {e}")
+                result[table_name] = 0
+        return result
     
     # ========================================
     # 系统配置相关方法
@@ -439,22 +810,28 @@ class MarketDataManager:
             output_path = Path(output_dir)
             output_path.mkdir(parents=True, exist_ok=True)
             
-            # 根据数据类型获取数据
+            # 根据数据类型获取数据（tick/分钟数据流式分批写入，不整体加载到内存）
             if data_type == 'tick':
-                df = self.get_tick_data(symbol, f"{start_date} 00:00:00", f"{end_date} 23:59:59")
+                chunks = self.get_tick_data(symbol, f"{start_date} 00:00:00", f"{end_date} 23:59:59", chunksize=50000)
                 filename = f"{symbol}_{data_type}_{start_date}_{end_date}.csv"
             elif data_type == 'minute':
-                df = self.get_minute_data(symbol, f"{start_date} 00:00:00", f"{end_date} 23:59:59")
+                chunks = self.get_minute_data(symbol, f"{start_date} 00:00:00", f"{end_date} 23:59:59", chunksize=50000)
                 filename = f"{symbol}_{data_type}_{start_date}_{end_date}.csv"
             elif data_type == 'daily':
-                df = self.get_daily_data(symbol, start_date, end_date)
+                chunks = [self.get_daily_data(symbol, start_date, end_date)]
                 filename = f"{symbol}_{data_type}_{start_date}_{end_date}.csv"
             else:
                 raise ValueError(f"不支持的数据类型: {data_type}")
             
             # 保存到CSV
             filepath = output_path / filename
-            df.to_csv(filepath, index=False, encoding='utf-8-sig')
+            first = True
+            for df in chunks:
+                df.to_csv(filepath, index=False, encoding='utf-8-sig' if first else 'utf-8',
+                          mode='w' if first else 'a', header=first)
+                first = False
+            if first:
+                pd.DataFrame().to_csv(filepath, index=False, encoding='utf-8-sig')
             
             self.logger.info(f"数据导出成功: {filepath}")
             return str(filepath)
@@ -38,8 +38,10 @@ CREATE TABLE IF NOT EXISTS stock_basic (
 -- ========================================
 
 -- 3秒级别tick数据表
+-- 主键 (symbol, tick_time) 即聚簇索引，按股票+时间区间查询只做一次主键范围扫描；
+-- 按月分区（pmax之外的月分区由 migrate_market_schema.py / MarketDataManager.maintain_partitions 创建），
+-- 过期数据直接 DROP PARTITION
 CREATE TABLE IF NOT EXISTS tick_data (
-    id BIGINT AUTO_INCREMENT PRIMARY KEY,
     symbol VARCHAR(20) NOT NULL COMMENT '股票代码',
     tick_time DATETIME(3) NOT NULL COMMENT 'tick时间（精确到毫秒）',
     last_price DECIMAL(10,4) NOT NULL COMMENT '最新价',
@@ -66,15 +68,14 @@ CREATE TABLE IF NOT EXISTS tick_data (
     ask_price5 DECIMAL(10,4) COMMENT '卖五价',
     ask_volume5 BIGINT COMMENT '卖五量',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE KEY uk_symbol_time (symbol, tick_time),
-    INDEX idx_symbol (symbol),
-    INDEX idx_tick_time (tick_time),
-    INDEX idx_symbol_time_desc (symbol, tick_time DESC)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='3秒级别tick数据表';
+    PRIMARY KEY (symbol, tick_time)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='3秒级别tick数据表'
+PARTITION BY RANGE COLUMNS(tick_time) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
 
--- 分钟级数据表
+-- 分钟级数据表（主键与分区方式同 tick_data）
 CREATE TABLE IF NOT EXISTS minute_data (
-    id BIGINT AUTO_INCREMENT PRIMARY KEY,
     symbol VARCHAR(20) NOT NULL COMMENT '股票代码',
     datetime DATETIME NOT NULL COMMENT '时间',
     open DECIMAL(10,4) NOT NULL COMMENT '开盘价',
@@ -85,15 +86,14 @@ CREATE TABLE IF NOT EXISTS minute_data (
     amount DECIMAL(20,4) NOT NULL COMMENT '成交金额',
     period VARCHAR(10) DEFAULT '1min' COMMENT '周期',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE KEY uk_symbol_datetime (symbol, datetime),
-    INDEX idx_symbol (symbol),
-    INDEX idx_datetime (datetime),
-    INDEX idx_symbol_datetime_desc (symbol, datetime DESC)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='分钟级数据表';
+    PRIMARY KEY (symbol, datetime)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='分钟级数据表'
+PARTITION BY RANGE COLUMNS(datetime) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
 
 -- 日线数据表
 CREATE TABLE IF NOT EXISTS daily_data (
-    id BIGINT AUTO_INCREMENT PRIMARY KEY,
     symbol VARCHAR(20) NOT NULL COMMENT '股票代码',
     trade_date DATE NOT NULL COMMENT '交易日期',
     open DECIMAL(10,4) NOT NULL COMMENT '开盘价',
@@ -113,10 +113,8 @@ CREATE TABLE IF NOT EXISTS daily_data (
     total_mv DECIMAL(20,4) COMMENT '总市值',
     circ_mv DECIMAL(20,4) COMMENT '流通市值',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE KEY uk_symbol_date (symbol, trade_date),
-    INDEX idx_symbol (symbol),
-    INDEX idx_trade_date (trade_date),
-    INDEX idx_symbol_date_desc (symbol, trade_date DESC)
+    PRIMARY KEY (symbol, trade_date),
+    INDEX idx_trade_date (trade_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='日线数据表';
 
 -- 复权因子表
@@ -279,7 +277,8 @@ FROM daily_data;
 
 DELIMITER //
 
--- 清理历史数据存储过程
+-- 清理历史数据存储过程（逐行DELETE，仅供未分区的旧库使用；
+-- MarketDataManager.clean_historical_data 对分区表直接 DROP PARTITION）
 CREATE PROCEDURE CleanHistoricalData(IN days_to_keep INT)
 BEGIN
     DECLARE cutoff_date DATE;
@@ -377,10 +376,7 @@ DELIMITER ;
 -- 9. 创建索引优化
 -- ========================================
 
--- 为常用查询创建复合索引
-CREATE INDEX idx_tick_data_symbol_time ON tick_data(symbol, tick_time);
-CREATE INDEX idx_daily_data_symbol_date ON daily_data(symbol, trade_date);
-CREATE INDEX idx_minute_data_symbol_datetime ON minute_data(symbol, datetime);
+-- tick_data / minute_data / daily_data 的 (symbol, 时间) 复合主键已覆盖常用查询，无需额外复合索引
 
 -- ========================================
 -- 10. 权限设置
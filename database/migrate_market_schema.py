@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+市场数据表结构迁移工具
+把 tick_data / minute_data / daily_data 迁移为：
+- 主键改为 (symbol, 时间)：InnoDB 按主键聚簇存储，同一股票的数据物理上按时间连续，
+  "按股票+时间区间、按时间排序" 的查询只做一次主键范围扫描，无需回表和排序
+- 去掉自增id及与主键前缀重复的单列/复合索引，减少写入放大
+- tick_data / minute_data 按月 RANGE COLUMNS 分区（pYYYYMM + pmax），
+  保留期清理由 DELETE 改为 DROP PARTITION（见 MarketDataManager.clean_historical_data）
+
+迁移方式：建新表 -> 按时间分块复制 -> 追平复制期间的新数据 -> RENAME 原子切换，原表保留为 <表名>__old。
+默认只打印迁移计划，加 --apply 才执行；建议在停写窗口执行。
+
+    python database/migrate_market_schema.py                 # 查看计划
+    python database/migrate_market_schema.py --apply --benchmark --symbols 000001.SZ
+"""
+
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.market_data_manager import (MarketDataManager, PARTITIONED_TABLES, _add_months,
+                                          month_partition_definition)
+
+# 表 -> 目标主键、保留的二级索引、每次复制的时间跨度（天）
+TABLE_LAYOUTS = {
+    'tick_data': {'key': ('symbol', 'tick_time'), 'keep_indexes': (), 'copy_days': 1},
+    'minute_data': {'key': ('symbol', 'datetime'), 'keep_indexes': (), 'copy_days': 7},
+    # 日线保留按日期的索引，供全市场截面查询使用
+    'daily_data': {'key': ('symbol', 'trade_date'), 'keep_indexes': ('idx_trade_date',), 'copy_days': 366},
+}
+
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.combine(value, datetime.min.time())
+
+
+class MarketSchemaMigrator:
+    """市场数据表结构迁移器"""
+
+    def __init__(self, manager: MarketDataManager, months_ahead: int = 3):
+        """
+        Args:
+            manager: 市场数据管理器（需要DDL权限的账号）
+            months_ahead: 分区预建到当前月之后的月数
+        """
+        self.manager = manager
+        self.months_ahead = months_ahead
+        self.logger = logging.getLogger('MarketSchemaMigrator')
+
+    def inspect(self, table: str) -> Dict:
+        """读取表的当前结构：列、主键、索引、分区"""
+        db = self.manager.database
+        columns = [row['COLUMN_NAME'] for row in self.manager.execute_query(
+            "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION", (db, table))]
+        indexes: Dict[str, List[str]] = {}
+        for row in self.manager.execute_query(
+                "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX", (db, table)):
+            indexes.setdefault(row['INDEX_NAME'], []).append(row['COLUMN_NAME'])
+        return {
+            'columns': columns,
+            'primary': tuple(indexes.pop('PRIMARY', [])),
+            'indexes': indexes,
+            'partitions': self.manager.get_partitions(table),
+        }
+
+    def is_migrated(self, table: str, info: Optional[Dict] = None) -> bool:
+        info = info or self.inspect(table)
+        layout = TABLE_LAYOUTS[table]
+        if info['primary'] != layout['key']:
+            return False
+        return table not in PARTITIONED_TABLES or bool(info['partitions'])
+
+    def _time_bounds(self, table: str):
+        """原表数据的最早/最晚时间（原表有时间列索引，不会全表扫描）"""
+        time_column = TABLE_LAYOUTS[table]['key'][1]
+        rows = self.manager.execute_query(
+            f"SELECT MIN(`{time_column}`) AS min_time, MAX(`{time_column}`) AS max_time FROM `{table}`")
+        if not rows or rows[0]['min_time'] is None:
+            return None, None
+        return rows[0]['min_time'], rows[0]['max_time']
+
+    def _alter_statement(self, table: str, info: Dict) -> str:
+        """新表（CREATE TABLE ... LIKE 原表）上的主键/索引调整语句"""
+        layout = TABLE_LAYOUTS[table]
+        clauses = []
+        if 'id' in info['columns'] and 'id' not in layout['key']:
+            # 删除自增主键列会一并删除原主键
+            clauses.append('DROP COLUMN `id`')
+        elif info['primary']:
+            clauses.append('DROP PRIMARY KEY')
+        for name in info['indexes']:
+            if name not in layout['keep_indexes']:
+                clauses.append(f'DROP INDEX `{name}`')
+        clauses.append(f"ADD PRIMARY KEY ({', '.join(f'`{c}`' for c in layout['key'])})")
+        return f"ALTER TABLE `{table}__new` " + ', '.join(clauses)
+
+    def _partition_statement(self, table: str, min_time) -> Optional[str]:
+        if table not in PARTITIONED_TABLES:
+            return None
+        first = (min_time.date() if isinstance(min_time, datetime) else min_time or date.today()).replace(day=1)
+        end = _add_months(date.today().replace(day=1), self.months_ahead + 1)
+        months = []
+        month = first
+        while month < end:
+            months.append(month)
+            month = _add_months(month, 1)
+        definitions = ', '.join(month_partition_definition(m) for m in months)
+        return (f"ALTER TABLE `{table}__new` PARTITION BY RANGE COLUMNS(`{PARTITIONED_TABLES[table]}`) "
+                f"({definitions}, PARTITION pmax VALUES LESS THAN (MAXVALUE))")
+
+    def plan(self, table: str) -> Dict:
+        """生成迁移计划（不执行）"""
+        info = self.inspect(table)
+        if not info['columns']:
+            return {'table': table, 'action': 'missing'}
+        if self.is_migrated(table, info):
+            return {'table': table, 'action': 'maintain'}
+        min_time, max_time = self._time_bounds(table)
+        statements = [
+            f"DROP TABLE IF EXISTS `{table}__new`",
+            f"CREATE TABLE `{table}__new` LIKE `{table}`",
+            self._alter_statement(table, info),
+        ]
+        partition_sql = self._partition_statement(table, min_time)
+        if partition_sql:
+            statements.append(partition_sql)
+        return {
+            'table': table,
+            'action': 'migrate',
+            'statements': statements,
+            'columns': [c for c in info['columns'] if c != 'id' or 'id' in TABLE_LAYOUTS[table]['key']],
+            'min_time': min_time,
+            'max_time': max_time,
+        }
+
+    def _copy(self, plan: Dict) -> int:
+        """按时间分块把原表数据复制到新表，每块单独提交"""
+        table = plan['table']
+        layout = TABLE_LAYOUTS[table]
+        time_column = layout['key'][1]
+        column_list = ', '.join(f'`{c}`' for c in plan['columns'])
+        sql = (f"INSERT IGNORE INTO `{table}__new` ({column_list}) SELECT {column_list} FROM `{table}` "
+               f"WHERE `{time_column}` >= %s AND `{time_column}` < %s")
+        if plan['min_time'] is None:
+            return 0
+        stop = _as_datetime(plan['max_time'])
+        step = timedelta(days=layout['copy_days'])
+        total = 0
+        t0 = time.time()
+        chunk_start = _as_datetime(plan['min_time']).replace(hour=0, minute=0, second=0, microsecond=0)
+        while chunk_start <= stop:
+            chunk_end = chunk_start + step
+            total += self.manager.execute_update(sql, (chunk_start, chunk_end))
+            chunk_start = chunk_end
+        # 追平复制期间写入的新数据（最后一个分块起点之后）
+        catch_up = (f"INSERT IGNORE INTO `{table}__new` ({column_list}) SELECT {column_list} FROM `{table}` "
+                    f"WHERE `{time_column}` >= %s")
+        total += self.manager.execute_update(catch_up, (chunk_start - step,))
+        elapsed = time.time() - t0
+        self.logger.info(f"{table} 复制 {total} 行，耗时 {elapsed:.1f}s（{total / elapsed if elapsed else 0:.0f} 行/秒）")
+        return total
+
+    def migrate(self, table: str, apply: bool = False, drop_old: bool = False) -> Dict:
+        """
+        迁移单张表；已迁移的表只补齐未来分区
+
+        Args:
+            apply: False只打印计划
+            drop_old: 切换后删除原表（默认保留为 <表名>__old 以便回滚）
+        """
+        plan = self.plan(table)
+        if plan['action'] == 'missing':
+            self.logger.warning(f"{table} 不存在，跳过")
+            return plan
+        if plan['action'] == 'maintain':
+            self.logger.info(f"{table} 已是目标结构")
+            if apply and table in PARTITIONED_TABLES:
+                plan['partitions_added'] = self.manager.ensure_partitions(table, self.months_ahead)
+            return plan
+
+        swap = f"RENAME TABLE `{table}` TO `{table}__old`, `{table}__new` TO `{table}`"
+        if not apply:
+            print(f"\n-- {table}: {plan['min_time']} ~ {plan['max_time']}")
+            for sql in plan['statements']:
+                print(sql + ';')
+            print(f"-- 按 {TABLE_LAYOUTS[table]['copy_days']} 天分块: INSERT IGNORE INTO `{table}__new` SELECT ... ;")
+            print(swap + ';')
+            if drop_old:
+                print(f"DROP TABLE `{table}__old`;")
+            return plan
+
+        self.logger.info(f"开始迁移 {table}")
+        for sql in plan['statements']:
+            self.manager.execute_update(sql)
+        plan['copied'] = self._copy(plan)
+        self.manager.execute_update(f"DROP TABLE IF EXISTS `{table}__old`")
+        self.manager.execute_update(swap)
+        if drop_old:
+            self.manager.execute_update(f"DROP TABLE `{table}__old`")
+        self.logger.info(f"{table} 迁移完成")
+        return plan
+
+    def migrate_all(self, tables: Optional[List[str]] = None, apply: bool = False,
+                    drop_old: bool = False) -> List[Dict]:
+        return [self.migrate(table, apply, drop_old) for table in (tables or list(TABLE_LAYOUTS))]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='市场数据表结构迁移工具（复合主键 + 按月分区）')
+    parser.add_argument('--host', default='localhost', help='数据库主机')
+    parser.add_argument('--port', type=int, default=3306, help='数据库端口')
+    parser.add_argument('--user', default='market_data_admin', help='数据库用户名（需要DDL权限）')
+    parser.add_argument('--password', default='admin_password', help='数据库密码')
+    parser.add_argument('--database', default='market_data', help='数据库名称')
+    parser.add_argument('--tables', nargs='+', choices=list(TABLE_LAYOUTS), help='要迁移的表，默认全部')
+    parser.add_argument('--months-ahead', type=int, default=3, help='预建未来分区的月数')
+    parser.add_argument('--apply', action='store_true', help='执行迁移（默认只打印计划）')
+    parser.add_argument('--drop-old', action='store_true', help='切换后删除原表')
+    parser.add_argument('--benchmark', action='store_true', help='迁移前后运行查询基准并对比')
+    parser.add_argument('--symbols', nargs='+', default=['000001.SZ'], help='基准测试使用的股票代码')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    manager = MarketDataManager(host=args.host, port=args.port, user=args.user,
+                                password=args.password, database=args.database)
+    migrator = MarketSchemaMigrator(manager, months_ahead=args.months_ahead)
+
+    before = None
+    if args.benchmark:
+        from database.benchmark_market_schema import run_benchmark, print_report
+        before = run_benchmark(manager, args.symbols)
+
+    migrator.migrate_all(args.tables, apply=args.apply, drop_old=args.drop_old)
+
+    if args.benchmark:
+        if args.apply:
+            print_report(run_benchmark(manager, args.symbols), before)
+        else:
+            print_report(before)
+    manager.close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,23 +8,50 @@
 版本: 1.0
 """
 
+import time
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, date
 import logging
 
+from database.indicator_state import IndicatorStateStore, get_indicator_state_store
+
+# technical_indicators 表中的指标列
+INDICATOR_COLUMNS = [
+    'ma5', 'ma10', 'ma20', 'ma60', 'ma120', 'ma250',
+    'macd_dif', 'macd_dea', 'macd_histogram',
+    'rsi6', 'rsi12', 'rsi24',
+    'kdj_k', 'kdj_d', 'kdj_j',
+    'boll_upper', 'boll_middle', 'boll_lower',
+    'atr', 'cci', 'williams_r'
+]
+
+
+def rolling_mean_abs_deviation(values, mean, period: int):
+    """
+    滚动平均绝对偏差：窗口内各点与窗口均值之差的绝对值的均值
+    用 period 次整列平移代替 rolling().apply 的逐窗口Python回调，Series/DataFrame 均可
+    """
+    total = (values - mean).abs()
+    for k in range(1, period):
+        total = total + (values.shift(k) - mean).abs()
+    return total / period
+
+
 class TechnicalIndicatorsCalculator:
     """技术指标计算器"""
     
-    def __init__(self, market_data_manager):
+    def __init__(self, market_data_manager, state_store: Optional[IndicatorStateStore] = None):
         """
         初始化技术指标计算器
         
         Args:
             market_data_manager: 市场数据管理器实例
+            state_store: 增量更新使用的指标状态存储，默认为全局实例
         """
         self.manager = market_data_manager
+        self.state_store = state_store
         self.logger = self._setup_logger()
     
     def _setup_logger(self) -> logging.Logger:
@@ -147,9 +174,7 @@ class TechnicalIndicatorsCalculator:
         sma = typical_price.rolling(period).mean()
         
         # 平均偏差
-        mean_deviation = typical_price.rolling(period).apply(
-            lambda x: np.mean(np.abs(x - x.mean()))
-        )
+        mean_deviation = rolling_mean_abs_deviation(typical_price, sma, period)
         
         # CCI
         df['cci'] = (typical_price - sma) / (0.015 * mean_deviation)
@@ -170,28 +195,149 @@ class TechnicalIndicatorsCalculator:
         return df
     
     def calculate_all_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """计算所有技术指标"""
+        """计算所有技术指标（单只股票，与面板计算共用同一套公式）"""
         df = df.copy()
         
         # 确保数据按日期排序
         df = df.sort_values('trade_date')
         
-        # 计算各种指标
-        df = self.calculate_moving_averages(df)
-        df = self.calculate_macd(df)
-        df = self.calculate_bollinger_bands(df)
-        df = self.calculate_kdj(df)
-        df = self.calculate_atr(df)
-        df = self.calculate_cci(df)
-        df = self.calculate_williams_r(df)
-        
-        # 计算RSI
-        df['rsi6'] = self.calculate_rsi(df['close'], 6)
-        df['rsi12'] = self.calculate_rsi(df['close'], 12)
-        df['rsi24'] = self.calculate_rsi(df['close'], 24)
+        # 单列面板（不带列名，避免 high/low/close 之间按列名对齐）
+        high, low, close = (pd.DataFrame(df[name].to_numpy(dtype=float)) for name in ('high', 'low', 'close'))
+        indicators = self.calculate_panel_indicators(high, low, close)
+        for name in INDICATOR_COLUMNS:
+            df[name] = indicators[name].iloc[:, 0].to_numpy()
         
         return df
     
+    def calculate_panel_indicators(self, high: pd.DataFrame, low: pd.DataFrame,
+                                   close: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        按列一次计算全部指标：每列一只股票，每行为该股票的第i个交易日
+        rolling/ewm 在整张面板上按列执行，没有逐只股票的Python循环
+        
+        Returns:
+            {指标名: 与输入同形状的DataFrame}
+        """
+        out = {}
+        
+        # 移动平均线
+        for period in (5, 10, 20, 60, 120, 250):
+            out[f'ma{period}'] = close.rolling(period).mean()
+        
+        # MACD
+        out['macd_dif'] = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+        out['macd_dea'] = out['macd_dif'].ewm(span=9).mean()
+        out['macd_histogram'] = out['macd_dif'] - out['macd_dea']
+        
+        # RSI
+        for period in (6, 12, 24):
+            out[f'rsi{period}'] = self.calculate_rsi(close, period)
+        
+        # KDJ
+        low_min = low.rolling(9).min()
+        high_max = high.rolling(9).max()
+        rsv = (close - low_min) / (high_max - low_min) * 100
+        out['kdj_k'] = rsv.ewm(alpha=1/3).mean()
+        out['kdj_d'] = out['kdj_k'].ewm(alpha=1/3).mean()
+        out['kdj_j'] = 3 * out['kdj_k'] - 2 * out['kdj_d']
+        
+        # 布林带
+        out['boll_middle'] = close.rolling(20).mean()
+        std = close.rolling(20).std()
+        out['boll_upper'] = out['boll_middle'] + std * 2
+        out['boll_lower'] = out['boll_middle'] - std * 2
+        
+        # ATR
+        prev_close = close.shift()
+        true_range = np.maximum(high - low, np.maximum((high - prev_close).abs(), (low - prev_close).abs()))
+        out['atr'] = true_range.rolling(14).mean()
+        
+        # CCI
+        typical_price = (high + low + close) / 3
+        sma = typical_price.rolling(20).mean()
+        out['cci'] = (typical_price - sma) / (0.015 * rolling_mean_abs_deviation(typical_price, sma, 20))
+        
+        # 威廉指标
+        highest_high = high.rolling(14).max()
+        lowest_low = low.rolling(14).min()
+        out['williams_r'] = -100 * (highest_high - close) / (highest_high - lowest_low)
+        
+        return out
+    
+    def load_daily_panel(self, symbols: Optional[List[str]], start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        一次查询加载区间内多只股票（symbols为None时全市场）的日线，服务端游标分批读取
+        
+        Returns:
+            symbol/trade_date/high/low/close 长表，按 (symbol, trade_date) 排序
+        """
+        sql = "SELECT symbol, trade_date, high, low, close FROM daily_data WHERE trade_date BETWEEN %s AND %s"
+        params = [start_date, end_date]
+        if symbols:
+            sql += f" AND symbol IN ({','.join(['%s'] * len(symbols))})"
+            params += list(symbols)
+        chunks = list(self.manager.stream_query(sql, tuple(params), chunksize=200000))
+        if not chunks:
+            return pd.DataFrame(columns=['symbol', 'trade_date', 'high', 'low', 'close'])
+        daily = pd.concat(chunks, ignore_index=True)
+        for name in ('high', 'low', 'close'):
+            daily[name] = daily[name].astype(float)
+        return daily.sort_values(['symbol', 'trade_date'], kind='stable', ignore_index=True)
+    
+    @staticmethod
+    def build_panel(daily: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        长表转（观测序号 × 股票）面板：股票的第i个交易日放在第i行，停牌日不占行，
+        滚动窗口因此与逐只计算完全一致；数据较短的股票行尾补NaN
+        
+        Args:
+            daily: load_daily_panel 的结果（已按 symbol, trade_date 排序）
+        Returns:
+            (股票代码数组, 每条记录的行号, 每条记录的列号, {'high'/'low'/'close': 面板矩阵})
+        """
+        codes, symbols = pd.factorize(daily['symbol'], sort=True)
+        rows = daily.groupby(codes, sort=False).cumcount().to_numpy()
+        shape = (int(rows.max()) + 1 if len(rows) else 0, len(symbols))
+        panel = {}
+        for name in ('high', 'low', 'close'):
+            matrix = np.full(shape, np.nan)
+            matrix[rows, codes] = daily[name].to_numpy(dtype=float)
+            panel[name] = matrix
+        return np.asarray(symbols), rows, codes, panel
+    
+    def calculate_indicators_frame(self, daily: pd.DataFrame, start_date: Optional[str] = None,
+                                   block_size: int = 1000):
+        """
+        对长表日线做面板指标计算，按 block_size 只股票一块依次产出结果，控制内存占用
+        
+        Args:
+            daily: load_daily_panel 的结果
+            start_date: 只输出该日期及之后的行（之前的数据仅用于预热）
+        Yields:
+            (本块股票代码数组, symbol/trade_date/指标列 的长表)，长表已去掉指标不完整的行
+        """
+        symbols, rows, codes, panel = self.build_panel(daily)
+        keep = np.ones(len(daily), dtype=bool)
+        if start_date:
+            keep = (pd.to_datetime(daily['trade_date']) >= pd.Timestamp(start_date)).to_numpy()
+        trade_dates = daily['trade_date'].to_numpy()
+        for first in range(0, len(symbols), block_size):
+            last = min(first + block_size, len(symbols))
+            # daily 按股票排序，同一块的记录在长表中是连续区间
+            lo, hi = np.searchsorted(codes, [first, last])
+            block_rows = rows[lo:hi]
+            block_cols = codes[lo:hi] - first
+            n_rows = int(block_rows.max()) + 1
+            frames = {name: pd.DataFrame(matrix[:n_rows, first:last]) for name, matrix in panel.items()}
+            indicators = self.calculate_panel_indicators(frames['high'], frames['low'], frames['close'])
+            result = {'symbol': symbols[first:last][block_cols], 'trade_date': trade_dates[lo:hi]}
+            for name in INDICATOR_COLUMNS:
+                result[name] = indicators[name].to_numpy()[block_rows, block_cols]
+            frame = pd.DataFrame(result)[keep[lo:hi]]
+            # 与逐只计算一致：去掉历史数据不足（或分母为0）导致指标不完整的行
+            frame = frame.replace([np.inf, -np.inf], np.nan).dropna()
+            yield symbols[first:last], frame
+    
     def calculate_and_store_indicators(self, symbol: str, start_date: str, end_date: str) -> int:
         """计算并存储技术指标"""
         try:
@@ -235,63 +381,122 @@ class TechnicalIndicatorsCalculator:
             self.logger.error(f"计算 {symbol} 技术指标失败: {e}")
             return 0
     
-    def batch_calculate_indicators(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, int]:
-        """批量计算技术指标"""
-        results = {}
-        
-        for symbol in symbols:
-            try:
-                count = self.calculate_and_store_indicators(symbol, start_date, end_date)
-                results[symbol] = count
-                
-                # 更新同步状态
-                self.manager.update_sync_status(
-                    'technical_indicators', 
-                    symbol, 
-                    'SUCCESS' if count > 0 else 'FAILED',
-                    count
-                )
-                
-            except Exception as e:
-                self.logger.error(f"批量计算 {symbol} 技术指标失败: {e}")
-                results[symbol] = 0
-                
-                # 更新同步状态
-                self.manager.update_sync_status(
-                    'technical_indicators', 
-                    symbol, 
-                    'FAILED',
-                    0,
-                    str(e)
-                )
+    def batch_calculate_indicators(self, symbols: Optional[List[str]], start_date: str, end_date: str,
+                                   warmup_days: int = 0, block_size: int = 1000,
+                                   use_load_data: bool = False) -> Dict[str, int]:
+        """
+        批量计算技术指标：一次查询加载全部日线 -> 面板按列计算 -> 按块批量写入 -> 批量更新同步状态
         
+        Args:
+            symbols: 股票列表，None为全市场
+            warmup_days: 额外加载 start_date 之前的自然日数用于指标预热（如ma250），预热期不写入
+            block_size: 每块计算/写入的股票数
+            use_load_data: 写入时使用 LOAD DATA LOCAL INFILE
+        Returns:
+            {symbol: 写入行数}
+        """
+        t0 = time.time()
+        load_start = start_date
+        if warmup_days:
+            load_start = (pd.Timestamp(start_date) - pd.Timedelta(days=warmup_days)).strftime('%Y-%m-%d')
+        daily = self.load_daily_panel(symbols, load_start, end_date)
+        load_elapsed = time.time() - t0
+        
+        results = {symbol: 0 for symbol in (symbols or [])}
+        errors = {}
+        if not daily.empty:
+            blocks = self.calculate_indicators_frame(daily, start_date if warmup_days else None, block_size)
+            for names, frame in blocks:
+                try:
+                    if not frame.empty:
+                        self.manager.insert_technical_indicators(frame, use_load_data=use_load_data)
+                    counts = frame['symbol'].value_counts()
+                    for symbol in names:
+                        results[symbol] = int(counts.get(symbol, 0))
+                except Exception as e:
+                    self.logger.error(f"批量写入技术指标失败（{names[0]} ~ {names[-1]}）: {e}")
+                    for symbol in names:
+                        results[symbol] = 0
+                        errors[symbol] = str(e)
+        
+        # 更新同步状态
+        self.manager.update_sync_status_batch('technical_indicators', [
+            (symbol, 'SUCCESS' if count > 0 else 'FAILED', count, errors.get(symbol, ''))
+            for symbol, count in results.items()
+        ])
+        
+        total = sum(results.values())
+        elapsed = time.time() - t0
+        self.logger.info(f"批量计算技术指标完成: {len(results)} 只股票，写入 {total} 条，"
+                         f"加载 {len(daily)} 条日线 {load_elapsed:.1f}s，总耗时 {elapsed:.1f}s")
         return results
     
     def update_latest_indicators(self, symbol: str) -> int:
-        """更新最新日期的技术指标"""
+        """更新最新日期的技术指标（增量，见 update_all_latest_indicators）"""
         try:
-            # 获取最新的技术指标日期
-            latest_indicators = self.manager.execute_query(
-                "SELECT MAX(trade_date) as latest_date FROM technical_indicators WHERE symbol = %s",
-                (symbol,)
-            )
-            
-            if not latest_indicators or not latest_indicators[0]['latest_date']:
-                # 如果没有历史数据，计算最近一年的指标
-                from datetime import datetime, timedelta
-                end_date = datetime.now().strftime('%Y-%m-%d')
-                start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
-            else:
-                # 从最新日期开始计算
-                latest_date = latest_indicators[0]['latest_date']
-                start_date = latest_date.strftime('%Y-%m-%d')
-                end_date = datetime.now().strftime('%Y-%m-%d')
-            
-            return self.calculate_and_store_indicators(symbol, start_date, end_date)
-            
+            return self.update_all_latest_indicators([symbol]).get(symbol, 0)
         except Exception as e:
             self.logger.error(f"更新 {symbol} 最新技术指标失败: {e}")
             return 0
+    
+    def update_all_latest_indicators(self, symbols: List[str], use_load_data: bool = False) -> Dict[str, int]:
+        """
+        增量更新技术指标：从持久化的指标状态（EMA累加器、最近K线窗口）逐根推进新交易日，
+        每根K线O(1)，耗时与历史长度无关，结果与全量重算一致
+        无状态的股票先用全部历史日线建立状态，只写入 technical_indicators 中还没有的日期
+        
+        Returns:
+            {symbol: 写入行数}
+        """
+        store = self.state_store or get_indicator_state_store()
+        today = datetime.now().strftime('%Y-%m-%d')
+        with_state = [symbol for symbol in symbols if store.last_trade_date(symbol)]
+        without_state = [symbol for symbol in symbols if not store.last_trade_date(symbol)]
+        
+        frames = []
+        if with_state:
+            since = str(min(store.last_trade_date(symbol) for symbol in with_state))
+            frames.append(self.load_daily_panel(with_state, f"{since[:4]}-{since[4:6]}-{since[6:]}", today))
+        latest_dates = {}
+        if without_state:
+            frames.append(self.load_daily_panel(without_state, '1990-01-01', today))
+            rows = self.manager.execute_query(
+                "SELECT symbol, MAX(trade_date) AS latest_date FROM technical_indicators "
+                f"WHERE symbol IN ({','.join(['%s'] * len(without_state))}) GROUP BY symbol",
+                tuple(without_state)
+            )
+            latest_dates = {row['symbol']: row['latest_date'] for row in rows if row['latest_date']}
+        
+        results = {symbol: 0 for symbol in symbols}
+        outputs = []
+        daily = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if not daily.empty:
+            for symbol, bars in daily.groupby('symbol', sort=False):
+                rows = store.advance(symbol, bars)
+                if rows.empty:
+                    continue
+                if symbol in latest_dates:
+                    rows = rows[pd.to_datetime(rows['trade_date']) > pd.Timestamp(latest_dates[symbol])]
+                rows = rows[['symbol', 'trade_date'] + INDICATOR_COLUMNS].replace([np.inf, -np.inf], np.nan).dropna()
+                results[symbol] = len(rows)
+                outputs.append(rows)
+        
+        if outputs:
+            try:
+                self.manager.insert_technical_indicators(pd.concat(outputs, ignore_index=True),
+                                                         use_load_data=use_load_data)
+            except Exception:
+                # 状态已推进但结果未写入：丢弃这些股票的状态，下次从全部历史重建
+                for symbol in daily['symbol'].unique():
+                    store.reset(symbol)
+                raise
+        store.save()
+        
+        self.manager.update_sync_status_batch('technical_indicators', [
+            (symbol, 'SUCCESS', count, '') for symbol, count in results.items()
+        ])
+        self.logger.info(f"增量更新技术指标: {len(symbols)} 只股票，写入 {sum(results.values())} 条")
+        return results
 
 
 # 使用示例
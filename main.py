@@ -5,12 +5,13 @@ import pandas as pd
 import threading
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-import tushare as ts
 from xtquant.xttrader import XtQuantTrader
 from xtquant.xttype import StockAccount
 from modules.tornadoapp.db.dbUtil import init_beanie
-from utils.data import download_all_data
+from utils.data import download_all_data, compact_all_data
+from modules.data_service.storage.bar_store import get_bar_store
 from utils.callback import MyXtQuantTraderCallback
+from utils.quote_cache import get_quote_cache
 from utils.date_util import is_trading_time
 from xtquant.xttrader import XtQuantTrader
 from utils.environment_manager import get_env_manager
@@ -18,14 +19,14 @@ from modules.stock_selector.selector import StockSelector
 from modules.tornadoapp.position.position_analyzer import PositionAnalyzer
 from modules.tornadoapp.auto_trader import TechnicalAnalyzer
 
-from modules.tornadoapp.oms.order_manager import OrderManager
+from modules.tornadoapp.oms.order_manager import OrderManager, ORDER_PRICE_MAX_AGE
 from modules.tornadoapp.risk.risk_manager import RiskManager
 from modules.tornadoapp.compliance.compliance_manager import ComplianceManager
 from modules.tornadoapp.audit.audit_logger import AuditLogger
 # 只保留实际用到的依赖
 
-# 全局行情缓存
-latest_price_cache = {}
+# 全局行情缓存（与auto_trader、PositionAnalyzer、OrderManager共用）
+latest_price_cache = get_quote_cache()
 
 # 全局调度器实例
 scheduler = BackgroundScheduler()
@@ -48,38 +49,28 @@ def setup_scheduler():
         id="morning_analysis",
         replace_existing=True
     )
+    # 每日只追加当天数据，每周六整理一次文件（去重排序）
+    scheduler.add_job(
+        compact_all_data,
+        trigger=CronTrigger(day_of_week="5", hour=10, minute=0),
+        id="compact_all_data",
+        replace_existing=True
+    )
     # 只添加任务，不再start调度器
 
 def get_history_func(symbol, tushare_token=None):
-    """用Tushare获取历史行情，返回DataFrame"""
+    """从本地行情存储读取历史行情（按需增量刷新Tushare），返回DataFrame"""
     if tushare_token is None:
         raise ValueError("tushare_token未设置")
-    pro = ts.pro_api(tushare_token)
     try:
-        df = pro.daily(ts_code=symbol, start_date='20240101', end_date='20991231')
-        if not df.empty:
-            df = df.sort_values('trade_date')
-            df['close'] = df['close'].astype(float)
-        return df
+        return get_bar_store(tushare_token).get_history(symbol)
     except Exception as e:
         print(f"获取{symbol}历史行情失败: {e}")
         return None
 
 def get_latest_price_func(symbol, xt_trader=None):
-    """优先用缓存，无则用xtdata.get_full_tick兜底获取最新价"""
-    price = latest_price_cache.get(symbol)
-    if price is not None:
-        return price
-    try:
-        from xtquant import xtdata
-        tick_info = xtdata.get_full_tick([symbol])
-        if symbol in tick_info and 'lastPrice' in tick_info[symbol]:
-            price = tick_info[symbol]['lastPrice']
-            latest_price_cache[symbol] = price
-            return price
-    except Exception as e:
-        print(f"xtdata获取{symbol}最新价失败: {e}")
-    return None
+    """从全局行情缓存获取最新价，过期时批量刷新（xtdata.get_full_tick），报价过旧时返回None"""
+    return latest_price_cache.get_price(symbol, max_age=ORDER_PRICE_MAX_AGE)
 
 # 策略模板示例
 class SimpleMAStrategy:
@@ -177,11 +168,8 @@ async def auto_select_and_buy(xt_trader, acc, order_manager, top_n=10):
         data_manager = get_data_service_manager()
         for stock in new_stocks:
             try:
-                bars = data_manager.get_bar_data(stock, '20240101', '20991231', '1min')
-                if bars:
-                    price = bars[-1].close
-                else:
-                    price = None
+                latest_bar = data_manager.get_latest_bar(stock, '1min')
+                price = latest_bar['close'] if latest_bar else None
                 if price is None:
                     logger.warning(f"无法获取 {stock} 最新价格，使用默认价格")
                     price = 10.0
@@ -7,7 +7,7 @@
 import backtrader as bt
 import pandas as pd
 import numpy as np
-import tushare as ts
+from utils.tushare_limiter import pro_api
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import logging
@@ -25,8 +25,7 @@ class TushareDataFeed(bt.feeds.PandasData):
 
     @staticmethod
     def _fetch_data_static(symbol, start_date, end_date, tushare_token):
-        import tushare as ts
-        pro = ts.pro_api(tushare_token)
+        pro = pro_api(tushare_token)
         df = pro.daily(
             ts_code=symbol,
             start_date=start_date,
@@ -61,6 +61,6 @@ class BarDataAPI(RequestHandler):
         end = self.get_argument('end')
         freq = self.get_argument('freq', '1min')
         manager = get_data_service_manager()
-        bars = manager.get_bar_data(ts_code, start, end, freq)
+        bars = manager.get_bar_frame(ts_code, start, end, freq)
         self.set_header('Content-Type', 'application/json')
-        self.write({'data': [bar.dict() for bar in bars]}) 
\ No newline at end of file
+        self.write({'data': bars.to_dict(orient='records')}) 
\ No newline at end of file
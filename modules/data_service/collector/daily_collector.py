@@ -3,7 +3,7 @@ import time
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from modules.data_service.datasource.tushare_pro import TushareProSource
-from modules.data_service.storage.db_manager import save_daily_data, update_progress, log_collect, get_unfinished_tasks
+from modules.data_service.storage.db_manager import save_daily_data, update_progress, log_collect, get_unfinished_tasks, flush_buffers
 
 def clean_daily_data(df: pd.DataFrame) -> pd.DataFrame:
     """数据清洗与标准化：去除缺失主键、填充缺失值、类型转换"""
@@ -53,13 +53,79 @@ def collect_one(ts_pro, ts_code, start_date, end_date, trade_dates=None):
             log_collect(ts_code, start_date, 'collect', 'fail', msg, time.time()-t0)
         return pd.DataFrame()
 
-def collect_all_daily(start_date, end_date, stock_list=None, max_workers=4, only_unfinished=True):
-    """主采集入口：支持断点续传、灵活采集范围、多线程、限流"""
+def collect_by_date(ts_pro, trade_date, ts_codes=None):
+    """
+    按交易日采集全市场截面：一次 daily(trade_date=...) 调用取回当天所有股票，
+    再按股票写入日线表并逐只记录进度
+
+    Args:
+        trade_date: 交易日
+        ts_codes: 本交易日需要采集的股票集合，None表示截面中的全部股票
+    """
+    t0 = time.time()
+    try:
+        df = clean_daily_data(ts_pro.get_daily(trade_date=trade_date))
+        if ts_codes is not None and not df.empty:
+            df = df[df['ts_code'].isin(ts_codes)]
+        if not df.empty:
+            save_daily_data(None, df)
+        got = set(df['ts_code']) if not df.empty else set()
+        elapsed = time.time() - t0
+        for ts_code in got:
+            update_progress(ts_code, trade_date, 'success')
+            log_collect(ts_code, trade_date, 'collect', 'success', 'ok', elapsed)
+        # 截面中缺失的股票（停牌等）记为无数据
+        for ts_code in (ts_codes or ()):
+            if ts_code not in got:
+                update_progress(ts_code, trade_date, 'fail', 'no data')
+                log_collect(ts_code, trade_date, 'collect', 'fail', 'no data', elapsed)
+        return df
+    except Exception as e:
+        msg = str(e)
+        for ts_code in (ts_codes or ()):
+            update_progress(ts_code, trade_date, 'fail', msg)
+        log_collect(None, trade_date, 'collect', 'fail', msg, time.time()-t0)
+        return pd.DataFrame()
+
+
+def choose_fetch_mode(task_map, trade_dates):
+    """
+    根据（股票 × 交易日）任务矩阵的形状选择采集方式
+
+    按股票采集每只股票一次调用（区间任务）或每个日期一次调用（逐日任务）；
+    按日期采集每个交易日一次调用。取调用次数较少的一种。
+
+    Returns:
+        ('date' | 'stock', 预计调用次数)
+    """
+    stock_calls = sum(1 if dates is None else len(dates) for dates in task_map.values())
+    date_calls = len(trade_dates)
+    if date_calls and date_calls < stock_calls:
+        return 'date', date_calls
+    return 'stock', stock_calls
+
+
+def collect_all_daily(start_date, end_date, stock_list=None, max_workers=4, only_unfinished=True, mode='auto',
+                      tasks=None):
+    """
+    主采集入口：支持断点续传、灵活采集范围、多线程、限流（Tushare全局令牌桶）
+
+    Args:
+        mode: 'auto' 按任务矩阵形状自动选择；'date' 按交易日取全市场截面；'stock' 按股票取区间
+        tasks: 指定的 (ts_code, trade_date) 任务集合（如数据质量检查得出的缺失项），优先于only_unfinished
+    """
     ts_pro = TushareProSource()
+    if tasks is not None and stock_list is None:
+        stock_list = sorted({ts_code for ts_code, _ in tasks})
+    full_market = stock_list is None
     if stock_list is None:
         stock_list = ts_pro.get_stock_list()
     # 获取所有待采集任务
-    if only_unfinished:
+    if tasks is not None:
+        task_map = {}
+        for ts_code, trade_date in tasks:
+            task_map.setdefault(ts_code, []).append(trade_date)
+    elif only_unfinished:
         # 查询未采集或失败的任务
         unfinished = get_unfinished_tasks(start_date, end_date, stock_list)
         # 组织为 ts_code -> [trade_date,...]
@@ -73,20 +139,35 @@ def collect_all_daily(start_date, end_date, stock_list=None, max_workers=4, only
     else:
         task_map = {ts_code: None for ts_code in stock_list}
 
-    def worker(ts_code, trade_dates):
-        return collect_one(ts_pro, ts_code, start_date, end_date, trade_dates)
+    # 组织为 trade_date -> {ts_code,...}（区间任务展开为区间内全部交易日）
+    date_map = {}
+    if mode != 'stock':
+        range_dates = ts_pro.get_trade_dates(start_date, end_date) if None in task_map.values() else []
+        for ts_code, trade_dates in task_map.items():
+            for trade_date in (range_dates if trade_dates is None else trade_dates):
+                date_map.setdefault(trade_date, set()).add(ts_code)
+    if mode == 'auto':
+        mode, calls = choose_fetch_mode(task_map, date_map)
+        print(f'采集方式: {"按日期截面" if mode == "date" else "按股票"}，预计调用 {calls} 次')
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = []
-        for ts_code, trade_dates in task_map.items():
-            futures.append(executor.submit(worker, ts_code, trade_dates))
-            time.sleep(0.1)  # 限流，防止Tushare被ban
+        if mode == 'date':
+            for trade_date, ts_codes in sorted(date_map.items()):
+                # 全市场区间采集时不过滤截面，顺带补入新上市股票
+                wanted = None if full_market and len(ts_codes) == len(stock_list) else ts_codes
+                futures.append(executor.submit(collect_by_date, ts_pro, trade_date, wanted))
+        else:
+            for ts_code, trade_dates in task_map.items():
+                futures.append(executor.submit(collect_one, ts_pro, ts_code, start_date, end_date, trade_dates))
         for i, future in enumerate(as_completed(futures), 1):
             try:
                 future.result()
             except Exception as e:
                 print(f'采集任务异常: {e}')
             print(f'进度: {i}/{len(futures)}')
+    # 写入剩余缓冲的采集进度和日志
+    flush_buffers()
 
     print('采集完成，开始结果校验...')
     check_collect_result(start_date, end_date, stock_list)
@@ -9,6 +9,8 @@ if __name__ == '__main__':
     parser.add_argument('--stock', type=str, nargs='*', help='股票代码列表，留空为全市场')
     parser.add_argument('--threads', type=int, default=4, help='并发线程数')
     parser.add_argument('--resume', action='store_true', help='仅采集未完成任务（断点续传）')
+    parser.add_argument('--mode', type=str, default='auto', choices=['auto', 'date', 'stock'],
+                        help='采集方式：auto自动选择，date按交易日全市场截面，stock按股票区间')
     args = parser.parse_args()
 
     collect_all_daily(
@@ -16,5 +18,6 @@ if __name__ == '__main__':
         end_date=args.end,
         stock_list=args.stock,
         max_workers=args.threads,
-        only_unfinished=args.resume
+        only_unfinished=args.resume,
+        mode=args.mode
     ) 
\ No newline at end of file
@@ -2,15 +2,29 @@
 from apscheduler.schedulers.blocking import BlockingScheduler
 from modules.data_service.collector.daily_collector import collect_all_daily
 from datetime import datetime, timedelta
+from utils.trading_calendar import get_trading_calendar
 
 def daily_job():
+    if not get_trading_calendar().is_trading_day():
+        print('今日非交易日，跳过自动采集')
+        return
     today = datetime.now().strftime('%Y%m%d')
-    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
+    yesterday = get_trading_calendar().prev_trading_day()
     print(f'自动采集任务启动: {yesterday} ~ {today}')
     collect_all_daily(start_date=yesterday, end_date=today, only_unfinished=True)
 
+def integrity_job(days=30):
+    """全市场完整性检查：只补采近days天内确实缺失的数据"""
+    from modules.data_service.quality import auto_fill_missing
+    end_date = datetime.now().strftime('%Y%m%d')
+    start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
+    print(f'完整性检查启动: {start_date} ~ {end_date}')
+    count = auto_fill_missing(start_date, end_date)
+    print(f'完整性检查完成，补采任务 {count} 个')
+
 if __name__ == '__main__':
     scheduler = BlockingScheduler()
     scheduler.add_job(daily_job, 'cron', hour=18, minute=0)  # 每天18:00自动采集
+    scheduler.add_job(integrity_job, 'cron', hour=20, minute=0)  # 每天20:00完整性检查与补采
     print('定时采集调度器已启动...')
     scheduler.start() 
\ No newline at end of file
@@ -1,10 +1,19 @@
-from typing import List
-from modules.data_service.schema import BarData, TickData
+from typing import List, Optional
+import pandas as pd
+from modules.data_service.schema import BarData, TickData, bars_to_frame
 
 class MarketDataSourceBase:
     def get_bar_data(self, ts_code: str, start_time: str, end_time: str, freq: str) -> List[BarData]:
         raise NotImplementedError
 
+    def get_bar_frame(self, ts_code: str, start_time: str, end_time: str, freq: str) -> pd.DataFrame:
+        """列式K线（列为 BAR_COLUMNS，按 trade_time 升序），默认由 get_bar_data 转换，数据源可直接实现"""
+        return bars_to_frame(self.get_bar_data(ts_code, start_time, end_time, freq))
+
+    def get_latest_bar(self, ts_code: str, freq: str) -> Optional[dict]:
+        """最新一根K线，数据源可实现更轻量的查询；默认返回None由管理器回退到区间查询"""
+        return None
+
     def get_tick_data(self, ts_code: str, start_time: str, end_time: str) -> List[TickData]:
         raise NotImplementedError
 
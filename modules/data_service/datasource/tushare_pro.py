@@ -1,42 +1,78 @@
 # modules/data_service/datasource/tushare_pro.py
-import tushare as ts
+from utils.tushare_limiter import pro_api
+from utils.trading_calendar import get_trading_calendar
 from modules.data_service.config import TUSHARE_TOKEN
-from modules.data_service.schema import BarData, TickData
+from modules.data_service.schema import BarData, TickData, BAR_COLUMNS, frame_to_bars
 from modules.data_service.datasource.source_base import MarketDataSourceBase
 import pandas as pd
+from datetime import datetime, timedelta
 
 class TushareProSource(MarketDataSourceBase):
     def __init__(self):
-        self.pro = ts.pro_api(TUSHARE_TOKEN)
+        self.pro = pro_api(TUSHARE_TOKEN)
 
     def get_stock_list(self):
         df = self.pro.stock_basic(exchange='', list_status='L', fields='ts_code')
         return df['ts_code'].tolist()
 
-    def get_bar_data(self, ts_code, start_time, end_time, freq):
-        import time
+    def get_daily(self, ts_code=None, start_date=None, end_date=None, trade_date=None) -> pd.DataFrame:
+        """日线原始DataFrame：按股票取区间，或按trade_date一次取全市场截面"""
+        if trade_date:
+            df = self.pro.daily(trade_date=trade_date)
+        else:
+            df = self.pro.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
+        return df if df is not None else pd.DataFrame()
+
+    def get_trade_dates(self, start_date, end_date) -> list:
+        """区间内的交易日列表（升序，YYYYMMDD），读本地交易日历，不再调用trade_cal"""
+        return get_trading_calendar().trading_days_between(start_date, end_date)
+
+    def get_bar_frame(self, ts_code, start_time, end_time, freq) -> pd.DataFrame:
+        """列式K线：Tushare返回的DataFrame直接整列重命名/转换，不逐行构建对象"""
         # freq: '1min', '5min', '15min', '30min', '60min', 'day'
+        # 限频由 utils.tushare_limiter 按接口令牌桶控制（daily / stk_mins 分别计额度）
         if freq == 'day':
             df = self.pro.daily(ts_code=ts_code, start_date=start_time, end_date=end_time)
-            time.sleep(31)  # 限频：每分钟最多2次
         else:
             # tushare分钟线接口
             df = self.pro.query('stk_mins', ts_code=ts_code, start_date=start_time, end_date=end_time, freq=freq)
-            time.sleep(31)  # 限频：每分钟最多2次
-        bars = []
-        for _, row in df.iterrows():
-            bars.append(BarData(
-                ts_code=str(row['ts_code']),
-                trade_time=str(row.get('trade_time', row.get('trade_date', ''))),
-                open=float(row['open']),
-                high=float(row['high']),
-                low=float(row['low']),
-                close=float(row['close']),
-                volume=float(row['vol']),
-                amount=float(row.get('amount', 0) or 0),
-                freq=str(freq)
-            ))
-        return bars
+        return self._to_bar_frame(df, freq)
+
+    @staticmethod
+    def _to_bar_frame(df: pd.DataFrame, freq) -> pd.DataFrame:
+        if df is None or df.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        time_col = 'trade_time' if 'trade_time' in df.columns else 'trade_date'
+        frame = pd.DataFrame({
+            'ts_code': df['ts_code'].astype(str),
+            'trade_time': df[time_col].astype(str),
+            'open': df['open'].astype(float),
+            'high': df['high'].astype(float),
+            'low': df['low'].astype(float),
+            'close': df['close'].astype(float),
+            'volume': df['vol'].astype(float),
+            'amount': df['amount'].fillna(0).astype(float) if 'amount' in df.columns else 0.0,
+            'freq': str(freq),
+        }, columns=BAR_COLUMNS)
+        # Tushare按时间倒序返回，统一为升序，保证最后一行是最新K线
+        return frame.sort_values('trade_time', kind='stable').reset_index(drop=True)
+
+    def get_bar_data(self, ts_code, start_time, end_time, freq):
+        return frame_to_bars(self.get_bar_frame(ts_code, start_time, end_time, freq))
+
+    def get_latest_bar(self, ts_code, freq):
+        """最新一根K线：只查询最近一小段区间"""
+        days = 30 if freq == 'day' else 7
+        end = datetime.now()
+        start = end - timedelta(days=days)
+        if freq == 'day':
+            frame = self.get_bar_frame(ts_code, start.strftime('%Y%m%d'), end.strftime('%Y%m%d'), freq)
+        else:
+            frame = self.get_bar_frame(ts_code, start.strftime('%Y-%m-%d 09:00:00'),
+                                       end.strftime('%Y-%m-%d %H:%M:%S'), freq)
+        if frame.empty:
+            return None
+        return frame.iloc[-1].to_dict()
 
     def get_tick_data(self, ts_code, start_time, end_time):
         # tushare不直接支持tick，可用level2或其他源实现
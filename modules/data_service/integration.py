@@ -17,8 +17,15 @@ from modules.data_service.manager import DataServiceManager
 
 logger = logging.getLogger(__name__)
 
+_data_service_manager = None
+_data_service_manager_lock = threading.Lock()
+
 def get_data_service_manager() -> DataServiceManager:
-    """获取统一数据服务管理器实例，支持多源主备切换"""
-    tushare_source = TushareProSource()
-    # 未来可扩展更多源
-    return DataServiceManager([tushare_source]) 
\ No newline at end of file
+    """获取统一数据服务管理器实例（全局共享，保留各数据源的健康统计），支持多源主备切换"""
+    global _data_service_manager
+    with _data_service_manager_lock:
+        if _data_service_manager is None:
+            tushare_source = TushareProSource()
+            # 未来可扩展更多源
+            _data_service_manager = DataServiceManager([tushare_source])
+        return _data_service_manager 
\ No newline at end of file
@@ -1,34 +1,168 @@
-from typing import List
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Optional
+import numpy as np
+import pandas as pd
 from modules.data_service.datasource.source_base import MarketDataSourceBase
-from modules.data_service.schema import BarData, TickData
+from modules.data_service.schema import BarData, TickData, frame_to_bars
+
+
+class SourceHealth:
+    """单个数据源的滑动窗口健康统计：最近window次调用的耗时与成败"""
+
+    def __init__(self, window: int = 50, default_latency: float = 1.0):
+        self.calls = deque(maxlen=window)  # (耗时秒, 是否成功)
+        self.default_latency = default_latency
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self.lock:
+            self.calls.append((latency, ok))
+
+    def error_rate(self) -> float:
+        with self.lock:
+            if not self.calls:
+                return 0.0
+            return sum(1 for _, ok in self.calls if not ok) / len(self.calls)
+
+    def p95(self) -> float:
+        """成功调用耗时的95分位，无样本时返回default_latency"""
+        with self.lock:
+            latencies = [t for t, ok in self.calls if ok]
+        if not latencies:
+            return self.default_latency
+        return float(np.percentile(latencies, 95))
+
+    def score(self) -> float:
+        """越小越健康：p95耗时按错误率放大"""
+        return self.p95() * (1 + 10 * self.error_rate())
+
+    def snapshot(self) -> dict:
+        return {'calls': len(self.calls), 'error_rate': self.error_rate(), 'p95': self.p95(), 'score': self.score()}
+
 
 class DataServiceManager:
-    def __init__(self, sources: List[MarketDataSourceBase]):
+    def __init__(self, sources: List[MarketDataSourceBase], hedge: bool = True, window: int = 50,
+                 min_hedge_delay: float = 0.2, timeout: Optional[float] = None, max_workers: int = 8):
+        """
+        Args:
+            sources: 数据源列表（初始优先级顺序，之后按健康度动态排序）
+            hedge: 是否启用对冲请求：当前数据源超过其p95耗时仍未返回时并发请求下一个数据源，取先返回的结果
+            window: 健康统计的滑动窗口（调用次数）
+            min_hedge_delay: 对冲等待的下限（秒）
+            timeout: 单次查询总超时（秒），None为不限
+            max_workers: 数据源调用线程池大小
+        """
         self.sources = sources  # 按优先级排列
+        self.hedge = hedge
+        self.min_hedge_delay = min_hedge_delay
+        self.timeout = timeout
+        self.health = {id(src): SourceHealth(window) for src in sources}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='data-source')
 
-    def get_bar_data(self, ts_code, start_time, end_time, freq) -> List[BarData]:
-        for src in self.sources:
-            try:
-                return src.get_bar_data(ts_code, start_time, end_time, freq)
-            except Exception as e:
-                print(f"数据源{src}异常: {e}")
+    def ranked_sources(self) -> List[MarketDataSourceBase]:
+        """按健康度排序的数据源（分数相同保持原优先级）"""
+        order = {id(src): i for i, src in enumerate(self.sources)}
+        return sorted(self.sources, key=lambda src: (round(self.health[id(src)].score(), 3), order[id(src)]))
+
+    def get_source_health(self) -> dict:
+        """各数据源健康统计"""
+        return {str(src): self.health[id(src)].snapshot() for src in self.sources}
+
+    def _timed_call(self, src, func):
+        t0 = time.monotonic()
+        try:
+            result = func(src)
+        except NotImplementedError:
+            # 数据源不支持该接口，不计入健康统计
+            raise
+        except Exception:
+            self.health[id(src)].record(time.monotonic() - t0, False)
+            raise
+        self.health[id(src)].record(time.monotonic() - t0, True)
+        return result
+
+    def _route(self, func):
+        """
+        按健康度依次请求数据源：
+        - 数据源报错时立即切换下一个
+        - 启用对冲时，当前数据源超过其p95耗时仍未返回就并发请求下一个，取最先成功的结果
+        """
+        sources = self.ranked_sources()
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        pending = {}
+        next_idx = 0
+
+        def launch():
+            nonlocal next_idx
+            src = sources[next_idx]
+            next_idx += 1
+            pending[self._executor.submit(self._timed_call, src, func)] = src
+
+        launch()
+        while pending:
+            hedge_delay = None
+            if self.hedge and next_idx < len(sources):
+                # 以最近发出的数据源的p95作为对冲截止时间
+                hedge_delay = max(self.min_hedge_delay, self.health[id(sources[next_idx - 1])].p95())
+            wait_time = hedge_delay
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait_time = remaining if wait_time is None else min(wait_time, remaining)
+            done, _ = wait(list(pending), timeout=wait_time, return_when=FIRST_COMPLETED)
+            if not done:
+                if next_idx < len(sources):
+                    launch()
                 continue
+            for future in done:
+                src = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    print(f"数据源{src}异常: {e}")
+            if not pending and next_idx < len(sources):
+                launch()
+        if pending:
+            raise TimeoutError(f"数据源查询超时（{self.timeout}秒）")
         raise Exception("所有数据源均不可用")
 
+    def get_bar_frame(self, ts_code, start_time, end_time, freq) -> pd.DataFrame:
+        """列式K线（主接口）：列为 BAR_COLUMNS，按 trade_time 升序，不逐行构建pydantic对象"""
+        return self._route(lambda src: src.get_bar_frame(ts_code, start_time, end_time, freq))
+
+    def get_bar_data(self, ts_code, start_time, end_time, freq) -> List[BarData]:
+        """BarData列表（兼容接口），由列式结果按需构建"""
+        return frame_to_bars(self.get_bar_frame(ts_code, start_time, end_time, freq))
+
+    def get_latest_bar(self, ts_code, freq='1min', as_model=False):
+        """
+        最新一根K线快速通道
+
+        Args:
+            as_model: True返回BarData，默认返回dict
+
+        Returns:
+            dict / BarData，无数据返回None
+        """
+        def fetch(src):
+            bar = src.get_latest_bar(ts_code, freq)
+            if bar is None:
+                # 数据源未实现轻量查询时回退到区间查询
+                frame = src.get_bar_frame(ts_code, '20240101', '20991231', freq)
+                bar = frame.iloc[-1].to_dict() if not frame.empty else None
+            return bar
+
+        bar = self._route(fetch)
+        if bar is None:
+            return None
+        return BarData(**bar) if as_model else bar
+
     def get_tick_data(self, ts_code, start_time, end_time) -> List[TickData]:
-        for src in self.sources:
-            try:
-                return src.get_tick_data(ts_code, start_time, end_time)
-            except Exception as e:
-                print(f"数据源{src}异常: {e}")
-                continue
-        raise Exception("所有数据源均不可用")
+        return self._route(lambda src: src.get_tick_data(ts_code, start_time, end_time))
 
     def get_snapshot(self, ts_code, trade_time):
-        for src in self.sources:
-            try:
-                return src.get_snapshot(ts_code, trade_time)
-            except Exception as e:
-                print(f"数据源{src}异常: {e}")
-                continue
-        raise Exception("所有数据源均不可用") 
\ No newline at end of file
+        return self._route(lambda src: src.get_snapshot(ts_code, trade_time))
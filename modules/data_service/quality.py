@@ -1,27 +1,236 @@
-from typing import List
-from modules.data_service.schema import BarData
+"""
+行情数据质量检查
+- 单只股票：check_data_completeness / detect_anomalies 直接检查列式K线
+- 全市场：一次查询 stock_daily 构建（股票 × 交易日）存在位图，
+  在NumPy矩阵上一次性找出缺失、重复、价格/成交量跳变，并把最小补采任务集交给 collect_all_daily
+"""
+import time
+import logging
+from typing import Iterable, List, Optional, Union
+import numpy as np
 import pandas as pd
+from modules.data_service.schema import BarData, bars_to_frame
 
-def check_data_completeness(bars: List[BarData], start_time: str, end_time: str, freq: str) -> dict:
-    # 检查缺失、重复、异常
-    if not bars:
+logger = logging.getLogger(__name__)
+
+# 相邻交易日收盘价涨跌幅超过该比例视为异常（覆盖创业板/科创板20%涨跌停）
+MAX_PRICE_JUMP = 0.21
+# 成交量超过此前有效交易日均量的倍数视为异常
+VOLUME_SPIKE_RATIO = 50.0
+
+
+def _get_trade_dates(start_date: str, end_date: str) -> List[str]:
+    from modules.data_service.datasource.tushare_pro import TushareProSource
+    return TushareProSource().get_trade_dates(start_date, end_date)
+
+
+def check_data_completeness(bars: Union[pd.DataFrame, List[BarData]], start_time: str, end_time: str, freq: str,
+                            trade_dates: Optional[List[str]] = None) -> dict:
+    """
+    单只股票的完整性检查：缺失、重复、异常
+
+    Args:
+        bars: 列式DataFrame（get_bar_frame）或BarData列表
+        trade_dates: 应有的交易日列表，日线且未提供时从交易日历获取
+    """
+    df = bars if isinstance(bars, pd.DataFrame) else bars_to_frame(bars)
+    if df.empty:
         return {'missing_dates': [], 'duplicate_records': [], 'anomaly_points': [], 'total_expected': 0, 'total_actual': 0}
-    df = pd.DataFrame([bar.dict() for bar in bars])
-    trade_times = set(df['trade_time'])
-    # 生成应有的时间序列
-    # 这里只做简单示例，实际可用pandas.date_range
+    trade_times = df['trade_time'].astype(str)
+    missing_dates = []
+    total_expected = trade_times.nunique()
+    if freq == 'day':
+        if trade_dates is None:
+            trade_dates = _get_trade_dates(start_time, end_time)
+        expected = pd.Index(trade_dates)
+        missing_dates = expected.difference(pd.Index(trade_times.unique())).tolist()
+        total_expected = len(expected)
+    return {
+        'missing_dates': missing_dates,
+        'duplicate_records': trade_times[trade_times.duplicated()].tolist(),
+        'anomaly_points': detect_anomalies(df),
+        'total_expected': total_expected,
+        'total_actual': len(df)
+    }
+
+
+def detect_anomalies(bars: Union[pd.DataFrame, List[BarData]], max_jump: float = MAX_PRICE_JUMP,
+                     volume_ratio: float = VOLUME_SPIKE_RATIO) -> List[dict]:
+    """单只股票的极端值/跳变检查（与全市场检查使用同一套矩阵算法）"""
+    df = bars if isinstance(bars, pd.DataFrame) else bars_to_frame(bars)
+    if df.empty:
+        return []
+    df = df.sort_values('trade_time', kind='stable')
+    close = df['close'].to_numpy(dtype=float)[None, :]
+    vol = df['volume'].to_numpy(dtype=float)[None, :]
+    flags = _anomaly_flags(close, vol, max_jump, volume_ratio)
+    times = df['trade_time'].astype(str).to_numpy()
+    return [{'trade_time': str(times[j]), 'type': kind} for kind, mask in flags.items() for j in np.flatnonzero(mask[0])]
+
+
+def _anomaly_flags(close: np.ndarray, vol: np.ndarray, max_jump: float, volume_ratio: float) -> dict:
+    """
+    在（股票 × 交易日）矩阵上一次性计算异常标记，缺失值为NaN
+
+    Returns:
+        {异常类型: 同形状bool矩阵}
+    """
+    present = ~np.isnan(close)
+    # 前一有效收盘价（跨过缺失日前向填充）
+    idx = np.where(present, np.arange(close.shape[1])[None, :], 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    prev_idx = np.concatenate([np.zeros((close.shape[0], 1), dtype=idx.dtype), idx[:, :-1]], axis=1)
+    prev_close = np.take_along_axis(close, prev_idx, axis=1)
+    has_prev = np.concatenate([np.zeros((close.shape[0], 1), dtype=bool),
+                               np.maximum.accumulate(present, axis=1)[:, :-1]], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jump = np.abs(close / prev_close - 1)
+        # 此前有效交易日的平均成交量
+        vol_filled = np.where(present, vol, 0.0)
+        cum_vol = np.cumsum(vol_filled, axis=1) - vol_filled
+        cum_cnt = np.cumsum(present, axis=1) - present
+        avg_vol = cum_vol / cum_cnt
+        spike = vol / avg_vol
     return {
-        'missing_dates': [],
-        'duplicate_records': df[df.duplicated(['trade_time'])]['trade_time'].tolist(),
-        'anomaly_points': [],
-        'total_expected': len(trade_times),
-        'total_actual': len(bars)
+        'non_positive_price': present & ~(close > 0),
+        'price_jump': present & has_prev & (prev_close > 0) & (jump > max_jump),
+        'volume_spike': present & (cum_cnt >= 5) & (avg_vol > 0) & (spike > volume_ratio),
     }
 
-def detect_anomalies(bars: List[BarData]) -> List[dict]:
-    # 检查极端值、跳变等
-    return []
 
-def auto_fill_missing(...):
-    # 可自动补采或用前值/均值填补
-    pass 
\ No newline at end of file
+def load_market_daily(start_date: str, end_date: str, stock_list: Optional[List[str]] = None) -> pd.DataFrame:
+    """一次查询取出区间内 stock_daily 的 ts_code/trade_date/close/vol"""
+    from modules.data_service.storage.db_manager import pooled_conn, ensure_schema
+    ensure_schema()
+    sql = 'SELECT ts_code, trade_date, close, vol FROM stock_daily WHERE trade_date BETWEEN %s AND %s'
+    params = [start_date, end_date]
+    if stock_list:
+        sql += f" AND ts_code IN ({','.join(['%s'] * len(stock_list))})"
+        params += list(stock_list)
+    with pooled_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+    return pd.DataFrame(list(rows), columns=['ts_code', 'trade_date', 'close', 'vol'])
+
+
+def load_no_data_tasks(start_date: str, end_date: str) -> pd.DataFrame:
+    """已确认数据源无数据（停牌等）的任务，完整性检查时不再视为缺失"""
+    from modules.data_service.storage.db_manager import pooled_conn, ensure_schema, flush_buffers
+    ensure_schema()
+    flush_buffers()
+    sql = '''
+    SELECT ts_code, trade_date FROM collect_progress
+    WHERE status = 'fail' AND error_msg = 'no data' AND trade_date BETWEEN %s AND %s
+    '''
+    with pooled_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (start_date, end_date))
+            rows = cur.fetchall()
+    return pd.DataFrame(list(rows), columns=['ts_code', 'trade_date'])
+
+
+def build_presence_matrix(df: pd.DataFrame, trade_dates: List[str], symbols: Optional[Iterable[str]] = None):
+    """
+    构建（股票 × 交易日）矩阵
+
+    Returns:
+        (symbols数组, counts矩阵(每格记录数), close矩阵, vol矩阵)，缺失格为NaN
+    """
+    dates = pd.Index([str(d) for d in trade_dates])
+    codes = pd.Index(sorted(set(symbols) if symbols is not None else set(df['ts_code'])))
+    shape = (len(codes), len(dates))
+    counts = np.zeros(shape, dtype=np.int32)
+    close = np.full(shape, np.nan)
+    vol = np.full(shape, np.nan)
+    if not df.empty:
+        row = codes.get_indexer(df['ts_code'])
+        col = dates.get_indexer(df['trade_date'].astype(str))
+        ok = (row >= 0) & (col >= 0)
+        row, col = row[ok], col[ok]
+        np.add.at(counts, (row, col), 1)
+        close[row, col] = df['close'].to_numpy(dtype=float)[ok]
+        vol[row, col] = df['vol'].to_numpy(dtype=float)[ok]
+    return codes.to_numpy(), counts, close, vol
+
+
+def check_market_integrity(start_date: str, end_date: str, stock_list: Optional[List[str]] = None,
+                           trade_dates: Optional[List[str]] = None, df: Optional[pd.DataFrame] = None,
+                           skip_no_data: bool = True, max_jump: float = MAX_PRICE_JUMP,
+                           volume_ratio: float = VOLUME_SPIKE_RATIO) -> dict:
+    """
+    全市场完整性检查
+
+    Args:
+        stock_list: 应检查的股票，None为库中区间内出现过的所有股票
+        trade_dates: 交易日历，None时从Tushare获取
+        df: 已加载的日线（ts_code/trade_date/close/vol），None时从stock_daily一次查询
+        skip_no_data: 跳过采集记录中已确认无数据（停牌）的任务
+    Returns:
+        {'missing': [(ts_code, trade_date)], 'duplicates': [...], 'anomalies': [...], 'stats': {...}}
+    """
+    t0 = time.time()
+    if trade_dates is None:
+        trade_dates = _get_trade_dates(start_date, end_date)
+    if df is None:
+        df = load_market_daily(start_date, end_date, stock_list)
+    codes, counts, close, vol = build_presence_matrix(df, trade_dates, stock_list)
+    dates = np.asarray([str(d) for d in trade_dates])
+    present = counts > 0
+
+    # 有数据的股票从区间内首个有数据的交易日开始计缺失（上市前不算缺失）
+    started = np.maximum.accumulate(present, axis=1)
+    never = ~present.any(axis=1)
+    expected = started | never[:, None]
+    missing = expected & ~present
+    if skip_no_data and missing.any():
+        no_data = load_no_data_tasks(start_date, end_date)
+        if not no_data.empty:
+            row = pd.Index(codes).get_indexer(no_data['ts_code'])
+            col = pd.Index(dates).get_indexer(no_data['trade_date'].astype(str))
+            ok = (row >= 0) & (col >= 0)
+            missing[row[ok], col[ok]] = False
+
+    flags = _anomaly_flags(close, vol, max_jump, volume_ratio)
+    mi, mj = np.nonzero(missing)
+    di, dj = np.nonzero(counts > 1)
+    anomalies = [{'ts_code': str(codes[i]), 'trade_date': str(dates[j]), 'type': kind}
+                 for kind, mask in flags.items() for i, j in zip(*np.nonzero(mask))]
+    report = {
+        'missing': list(zip(codes[mi].tolist(), dates[mj].tolist())),
+        'duplicates': [{'ts_code': c, 'trade_date': d, 'count': int(n)}
+                       for c, d, n in zip(codes[di].tolist(), dates[dj].tolist(), counts[di, dj].tolist())],
+        'anomalies': anomalies,
+        'stats': {
+            'symbols': len(codes),
+            'trade_dates': len(dates),
+            'expected': int(expected.sum()),
+            'actual': int(counts.sum()),
+            'missing': int(missing.sum()),
+            'elapsed': time.time() - t0,
+        }
+    }
+    logger.info(f"[数据质量] {start_date}~{end_date} 股票{len(codes)}只 交易日{len(dates)}个 "
+                f"缺失{report['stats']['missing']} 重复{len(report['duplicates'])} 异常{len(anomalies)} "
+                f"耗时{report['stats']['elapsed']:.2f}s")
+    return report
+
+
+def auto_fill_missing(start_date: str, end_date: str, stock_list: Optional[List[str]] = None,
+                      report: Optional[dict] = None, max_workers: int = 4) -> int:
+    """
+    按完整性检查结果只补采缺失的（股票, 交易日），由 collect_all_daily 自动选择按日期或按股票采集
+
+    Returns:
+        补采任务数
+    """
+    if report is None:
+        report = check_market_integrity(start_date, end_date, stock_list)
+    tasks = report['missing']
+    if not tasks:
+        logger.info("[数据质量] 无缺失数据，无需补采")
+        return 0
+    from modules.data_service.collector.daily_collector import collect_all_daily
+    symbols = sorted({ts_code for ts_code, _ in tasks})
+    collect_all_daily(start_date, end_date, stock_list=symbols, max_workers=max_workers, tasks=tasks)
+    return len(tasks)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import List
+import pandas as pd
 
 class BarData(BaseModel):
     ts_code: str
@@ -20,4 +21,21 @@ class TickData(BaseModel):
     bid_price: List[float]
     ask_price: List[float]
     bid_volume: List[float]
-    ask_volume: List[float] 
\ No newline at end of file
+    ask_volume: List[float] 
+
+# 列式K线（DataFrame）的列名，与 BarData 字段一一对应
+BAR_COLUMNS = list(BarData.model_fields.keys())
+
+
+def bars_to_frame(bars: List[BarData]) -> pd.DataFrame:
+    """BarData列表转列式DataFrame"""
+    if not bars:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    return pd.DataFrame([bar.model_dump() for bar in bars], columns=BAR_COLUMNS)
+
+
+def frame_to_bars(df: pd.DataFrame) -> List[BarData]:
+    """列式DataFrame转BarData列表（按需构建，逐行做pydantic校验）"""
+    if df is None or df.empty:
+        return []
+    return [BarData(**row) for row in df[BAR_COLUMNS].to_dict(orient='records')]
@@ -0,0 +1,174 @@
+# modules/data_service/storage/bar_store.py
+"""
+本地日线行情存储
+每只股票一个 .npy 结构化数组文件（内存映射读取），只增量追加新的交易日，
+替代交易循环中每次都通过 Tushare 重新下载整段历史行情。
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from utils.tushare_limiter import pro_api
+from utils.trading_calendar import get_trading_calendar
+
+logger = logging.getLogger(__name__)
+
+# 与 pro.daily 返回字段保持一致，trade_date 以 int32(YYYYMMDD) 存储
+BAR_DTYPE = np.dtype([
+    ('trade_date', 'i4'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('pre_close', 'f8'),
+    ('change', 'f8'),
+    ('pct_chg', 'f8'),
+    ('vol', 'f8'),
+    ('amount', 'f8'),
+])
+
+DEFAULT_STORE_DIR = os.path.join('data', 'bar_store')
+
+
+class LocalBarStore:
+    """按股票分文件的本地日线存储，读取走内存映射，刷新只拉取最后一个交易日之后的数据"""
+
+    def __init__(self, tushare_token: Optional[str] = None, root_dir: str = DEFAULT_STORE_DIR,
+                 start_date: str = '20240101', refresh_interval: int = 1800):
+        """
+        Args:
+            tushare_token: Tushare Token，为空时只读本地数据
+            root_dir: 存储目录
+            start_date: 本地无数据时首次下载的起始日期
+            refresh_interval: 同一只股票两次联网检查增量的最小间隔（秒）
+        """
+        self.root_dir = root_dir
+        self.start_date = start_date
+        self.refresh_interval = refresh_interval
+        self.pro = pro_api(tushare_token) if tushare_token else None
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._frames: Dict[str, pd.DataFrame] = {}  # symbol -> 已转换好的DataFrame
+        self._last_checked: Dict[str, float] = {}  # symbol -> 上次联网检查时间
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.root_dir, f"{symbol}.npy")
+
+    def _lock(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            if symbol not in self._locks:
+                self._locks[symbol] = threading.Lock()
+            return self._locks[symbol]
+
+    def _load_array(self, symbol: str) -> Optional[np.ndarray]:
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def last_trade_date(self, symbol: str) -> Optional[str]:
+        """本地已存储的最后一个交易日（YYYYMMDD），无数据返回None"""
+        arr = self._load_array(symbol)
+        if arr is None or len(arr) == 0:
+            return None
+        return str(int(arr['trade_date'][-1]))
+
+    def read(self, symbol: str) -> Optional[pd.DataFrame]:
+        """只读本地数据，返回按trade_date升序的DataFrame（字段同pro.daily）"""
+        df = self._frames.get(symbol)
+        if df is not None:
+            return df
+        arr = self._load_array(symbol)
+        if arr is None or len(arr) == 0:
+            return None
+        # 拷贝出内存映射，避免长期占用文件句柄（Windows下占用中的文件无法被替换）
+        df = pd.DataFrame({name: np.array(arr[name]) for name in BAR_DTYPE.names})
+        del arr
+        df['trade_date'] = df['trade_date'].astype(str)
+        df.insert(0, 'ts_code', symbol)
+        self._frames[symbol] = df
+        return df
+
+    def append(self, symbol: str, df: pd.DataFrame) -> int:
+        """把新行情追加到本地文件，只保留比已存储最后交易日更新的行，返回新增行数"""
+        if df is None or df.empty or 'trade_date' not in df.columns:
+            return 0
+        new = df.dropna(subset=['trade_date']).copy()
+        new['trade_date'] = new['trade_date'].astype(int)
+        new = new.drop_duplicates('trade_date').sort_values('trade_date')
+        with self._lock(symbol):
+            old = self._load_array(symbol)
+            if old is not None and len(old) > 0:
+                new = new[new['trade_date'] > int(old['trade_date'][-1])]
+            if new.empty:
+                return 0
+            rows = np.zeros(len(new), dtype=BAR_DTYPE)
+            for name in BAR_DTYPE.names:
+                if name in new.columns:
+                    rows[name] = pd.to_numeric(new[name], errors='coerce').fillna(0).to_numpy()
+            merged = rows if old is None else np.concatenate([np.asarray(old), rows])
+            # 先写临时文件再替换，避免读到写了一半的文件
+            tmp_path = self._path(symbol) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, merged)
+            del old
+            os.replace(tmp_path, self._path(symbol))
+            self._frames.pop(symbol, None)
+        return len(rows)
+
+    def refresh(self, symbol: str) -> int:
+        """从Tushare拉取本地最后交易日之后的新数据并追加，返回新增行数"""
+        if self.pro is None:
+            return 0
+        last_date = self.last_trade_date(symbol)
+        now = datetime.now()
+        today = now.strftime('%Y%m%d')
+        self._last_checked[symbol] = time.time()
+        # 最近一个已出日线的交易日：当天收盘数据约16点后可取，之前以上一交易日为准
+        calendar = get_trading_calendar()
+        if calendar.is_trading_day(now) and now.hour >= 16:
+            expected = today
+        else:
+            expected = calendar.prev_trading_day(now) or today
+        if last_date is not None and last_date >= expected:
+            return 0
+        if last_date is None:
+            start_date = self.start_date
+        else:
+            start_date = (pd.Timestamp(last_date) + pd.Timedelta(days=1)).strftime('%Y%m%d')
+        df = self.pro.daily(ts_code=symbol, start_date=start_date, end_date=today)
+        added = self.append(symbol, df)
+        if added:
+            logger.debug(f"[行情存储] {symbol} 新增 {added} 个交易日")
+        return added
+
+    def is_stale(self, symbol: str) -> bool:
+        """距离上次联网检查是否已超过refresh_interval"""
+        last_checked = self._last_checked.get(symbol)
+        return last_checked is None or time.time() - last_checked >= self.refresh_interval
+
+    def get_history(self, symbol: str) -> Optional[pd.DataFrame]:
+        """读取历史行情，必要时先做一次增量刷新；刷新失败时退回本地数据"""
+        if self.is_stale(symbol):
+            try:
+                self.refresh(symbol)
+            except Exception as e:
+                logger.warning(f"[行情存储] {symbol} 增量刷新失败，使用本地数据: {e}")
+        return self.read(symbol)
+
+
+_bar_store: Optional[LocalBarStore] = None
+
+
+def get_bar_store(tushare_token: Optional[str] = None) -> LocalBarStore:
+    """获取全局本地行情存储实例"""
+    global _bar_store
+    if _bar_store is None:
+        _bar_store = LocalBarStore(tushare_token)
+    return _bar_store
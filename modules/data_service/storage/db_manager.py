@@ -1,12 +1,93 @@
 # modules/data_service/storage/db_manager.py
+import os
+import queue
+import atexit
+import logging
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 import pymysql
 import pandas as pd
 from modules.data_service.config import MYSQL_CONFIG
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+DAILY_COLUMNS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close',
+                 'change', 'pct_chg', 'vol', 'amount']
+
+# executemany 每批行数（pymysql会把 INSERT/REPLACE ... VALUES 合并为多行VALUES语句）
+BATCH_SIZE = 1000
+# 进度/日志缓冲达到该行数时批量写入
+FLUSH_SIZE = 500
+# 缓冲写入失败后，达到阈值触发的写入至少间隔该秒数再重试
+FLUSH_RETRY_INTERVAL = 5.0
+
+
 def get_conn():
+    """新建独立连接（调用方负责关闭），批量读写请使用 pooled_conn()"""
     return pymysql.connect(**MYSQL_CONFIG)
 
+
+class ConnectionPool:
+    """简单的pymysql连接池：复用已建立的连接，避免每次写入都重新握手"""
+
+    def __init__(self, maxsize: int = 8, **config):
+        self.maxsize = maxsize
+        self.config = config
+        self._idle = queue.LifoQueue(maxsize)
+
+    def _acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return pymysql.connect(**self.config)
+        try:
+            conn.ping(reconnect=True)
+        except Exception:
+            conn = pymysql.connect(**self.config)
+        return conn
+
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self._release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            except Exception:
+                pass
+
+
+# 全局连接池（local_infile 供 LOAD DATA LOCAL INFILE 批量回补使用）
+_pool = ConnectionPool(maxsize=8, local_infile=True, **MYSQL_CONFIG)
+
+
+def pooled_conn():
+    """从全局连接池借用连接：with pooled_conn() as conn: ..."""
+    return _pool.connection()
+
+
 def create_table():
     sql_daily = '''
     CREATE TABLE IF NOT EXISTS stock_daily (
@@ -46,56 +127,207 @@ def create_table():
         create_time DATETIME
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     '''
-    with get_conn() as conn:
+    with pooled_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(sql_daily)
             cur.execute(sql_progress)
             cur.execute(sql_log)
         conn.commit()
 
-def save_daily_data(ts_code, df: pd.DataFrame):
-    if df is None or df.empty:
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def ensure_schema():
+    """进程内只建表一次"""
+    global _schema_ready
+    if _schema_ready:
         return
-    create_table()
-    with get_conn() as conn:
+    with _schema_lock:
+        if not _schema_ready:
+            create_table()
+            _schema_ready = True
+
+
+def _daily_rows(df: pd.DataFrame) -> list:
+    """DataFrame转为executemany参数列表（NaN转NULL，numpy类型转Python原生类型）"""
+    data = df[DAILY_COLUMNS].astype(object)
+    data = data.where(data.notna(), None)
+    return list(data.itertuples(index=False, name=None))
+
+
+def save_daily_data(ts_code, df: pd.DataFrame, batch_size: int = BATCH_SIZE, use_load_data: bool = False):
+    """
+    批量写入日线数据（REPLACE语义，主键 ts_code+trade_date）
+
+    Args:
+        ts_code: 股票代码（df中已包含ts_code列，保留参数兼容旧调用）
+        df: 日线数据
+        batch_size: executemany 每批行数
+        use_load_data: 大批量回补时使用 LOAD DATA LOCAL INFILE，失败自动回退executemany
+    """
+    if df is None or df.empty:
+        return 0
+    ensure_schema()
+    if use_load_data:
+        try:
+            return load_daily_data(df)
+        except Exception as e:
+            logger.warning(f"LOAD DATA 写入失败，回退executemany: {e}")
+    rows = _daily_rows(df)
+    sql = '''
+    REPLACE INTO stock_daily (ts_code, trade_date, open, high, low, close, pre_close, `change`, pct_chg, vol, amount)
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    '''
+    with pooled_conn() as conn:
         with conn.cursor() as cur:
-            for _, row in df.iterrows():
-                sql = '''
-                REPLACE INTO stock_daily (ts_code, trade_date, open, high, low, close, pre_close, `change`, pct_chg, vol, amount)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                '''
-                cur.execute(sql, (
-                    row['ts_code'], row['trade_date'], row['open'], row['high'], row['low'],
-                    row['close'], row['pre_close'], row['change'], row['pct_chg'], row['vol'], row['amount']
-                ))
+            for i in range(0, len(rows), batch_size):
+                cur.executemany(sql, rows[i:i + batch_size])
         conn.commit()
+    return len(rows)
 
-def update_progress(ts_code, trade_date, status, error_msg=None):
-    create_table()
-    with get_conn() as conn:
+
+def load_daily_data(df: pd.DataFrame) -> int:
+    """通过 LOAD DATA LOCAL INFILE 批量写入日线（需服务端开启 local_infile）"""
+    if df is None or df.empty:
+        return 0
+    ensure_schema()
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        df[DAILY_COLUMNS].to_csv(path, index=False, header=False, na_rep='\\N', lineterminator='\n')
+        sql = '''
+        LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE stock_daily
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+        LINES TERMINATED BY '\\n'
+        (ts_code, trade_date, open, high, low, close, pre_close, `change`, pct_chg, vol, amount)
+        '''
+        with pooled_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, (path.replace('\\', '/'),))
+            conn.commit()
+        return len(df)
+    finally:
+        os.remove(path)
+
+
+# 进度与日志写缓冲，按 FLUSH_SIZE 或显式 flush_buffers() 批量写入
+_progress_buffer = {}  # (ts_code, trade_date) -> row，同一任务只保留最新状态
+_log_buffer = []
+_buffer_lock = threading.Lock()
+_next_flush_retry = 0.0
+
+
+def _flush_progress(rows):
+    if not rows:
+        return
+    sql = '''
+    REPLACE INTO collect_progress (ts_code, trade_date, status, last_update, error_msg)
+    VALUES (%s, %s, %s, %s, %s)
+    '''
+    with pooled_conn() as conn:
         with conn.cursor() as cur:
-            sql = '''
-            REPLACE INTO collect_progress (ts_code, trade_date, status, last_update, error_msg)
-            VALUES (%s, %s, %s, %s, %s)
-            '''
-            cur.execute(sql, (ts_code, trade_date, status, datetime.now(), error_msg))
+            for i in range(0, len(rows), BATCH_SIZE):
+                cur.executemany(sql, rows[i:i + BATCH_SIZE])
         conn.commit()
 
-def log_collect(ts_code, trade_date, action, status, message, elapsed):
-    create_table()
-    with get_conn() as conn:
+
+def _flush_logs(rows):
+    if not rows:
+        return
+    sql = '''
+    INSERT INTO collect_log (ts_code, trade_date, action, status, message, elapsed, create_time)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    '''
+    with pooled_conn() as conn:
         with conn.cursor() as cur:
-            sql = '''
-            INSERT INTO collect_log (ts_code, trade_date, action, status, message, elapsed, create_time)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            '''
-            cur.execute(sql, (ts_code, trade_date, action, status, message, elapsed, datetime.now()))
+            for i in range(0, len(rows), BATCH_SIZE):
+                cur.executemany(sql, rows[i:i + BATCH_SIZE])
         conn.commit()
 
+
+def _restore_progress(rows):
+    """写入失败的进度放回缓冲，期间已有更新状态的任务保留新状态"""
+    with _buffer_lock:
+        for row in rows:
+            _progress_buffer.setdefault((row[0], row[1]), row)
+
+
+def _restore_logs(rows):
+    """写入失败的日志放回缓冲头部，保持原有顺序"""
+    with _buffer_lock:
+        _log_buffer[:0] = rows
+
+
+def flush_buffers():
+    """将缓冲的进度和日志写入数据库，写入失败的行放回缓冲等待下次写入，并抛出异常"""
+    with _buffer_lock:
+        progress_rows = list(_progress_buffer.values())
+        log_rows = list(_log_buffer)
+        _progress_buffer.clear()
+        _log_buffer.clear()
+    if not progress_rows and not log_rows:
+        return
+    try:
+        ensure_schema()
+        _flush_progress(progress_rows)
+    except Exception:
+        _restore_progress(progress_rows)
+        _restore_logs(log_rows)
+        raise
+    try:
+        _flush_logs(log_rows)
+    except Exception:
+        _restore_logs(log_rows)
+        raise
+
+
+def _flush_when_full():
+    """缓冲达到阈值时写入；失败只记录日志（行已放回缓冲），不中断调用方的采集流程"""
+    global _next_flush_retry
+    if time.monotonic() < _next_flush_retry:
+        return
+    try:
+        flush_buffers()
+        _next_flush_retry = 0.0
+    except Exception as e:
+        _next_flush_retry = time.monotonic() + FLUSH_RETRY_INTERVAL
+        logger.error(f"写入采集进度/日志失败，{FLUSH_RETRY_INTERVAL}秒后重试: {e}")
+
+
+def update_progress(ts_code, trade_date, status, error_msg=None):
+    with _buffer_lock:
+        _progress_buffer[(ts_code, trade_date)] = (ts_code, trade_date, status, datetime.now(), error_msg)
+        full = len(_progress_buffer) >= FLUSH_SIZE
+    if full:
+        _flush_when_full()
+
+
+def log_collect(ts_code, trade_date, action, status, message, elapsed):
+    with _buffer_lock:
+        _log_buffer.append((ts_code, trade_date, action, status, message, elapsed, datetime.now()))
+        full = len(_log_buffer) >= FLUSH_SIZE
+    if full:
+        _flush_when_full()
+
+
+def _flush_at_exit():
+    try:
+        flush_buffers()
+    except Exception as e:
+        logger.error(f"退出时写入采集进度/日志失败: {e}")
+    _pool.close_all()
+
+
+atexit.register(_flush_at_exit)
+
+
 def get_unfinished_tasks(start_date, end_date, stock_list=None):
     """获取未采集或采集失败的任务"""
-    create_table()
-    with get_conn() as conn:
+    ensure_schema()
+    flush_buffers()
+    with pooled_conn() as conn:
         with conn.cursor() as cur:
             if stock_list:
                 format_strings = ','.join(['%s'] * len(stock_list))
@@ -110,4 +342,4 @@ def get_unfinished_tasks(start_date, end_date, stock_list=None):
                 WHERE status != 'success' AND trade_date BETWEEN %s AND %s
                 '''
                 cur.execute(sql, (start_date, end_date))
-            return cur.fetchall() 
\ No newline at end of file
+            return cur.fetchall()
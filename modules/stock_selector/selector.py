@@ -1,6 +1,6 @@
 import pandas as pd
 from typing import List, Optional, Dict, Any
-import tushare as ts
+from utils.tushare_limiter import pro_api
 import numpy as np
 import pywencai as wc
 
@@ -10,7 +10,7 @@ class HotIndustrySelector:
     热点行业自动识别与多因子选股
     """
     def __init__(self, tushare_token, top_n_industries=3, stock_per_industry=5):
-        self.pro = ts.pro_api(tushare_token)
+        self.pro = pro_api(tushare_token)
         self.top_n_industries = top_n_industries
         self.stock_per_industry = stock_per_industry
 
@@ -1,5 +1,9 @@
 # coding=utf-8
+import os
+import time
 import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -8,6 +12,7 @@ from dataclasses import dataclass, asdict
 import json
 
 from strategies.base import BaseStrategy
+from utils.trading_calendar import get_trading_calendar
 from .manager import StrategyManager, StrategyPerformance
 
 logger = logging.getLogger(__name__)
@@ -37,6 +42,64 @@ class BacktestResult:
     equity_curve: List[float]
     trade_history: List[Dict]
     daily_returns: List[float]
+    wall_time: float = 0.0  # 回测耗时（秒）
+
+
+class SharedMatrices:
+    """把回测矩阵复制到共享内存，子进程按名称映射同一块内存，不再逐进程复制数据"""
+    
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.specs: Dict[str, tuple] = {}  # 名称 -> (共享内存名, shape, dtype)
+        try:
+            for name, array in arrays.items():
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                self.blocks[name] = block
+                self.specs[name] = (block.name, array.shape, array.dtype.str)
+        except Exception:
+            self.close()
+            raise
+    
+    @staticmethod
+    def attach(specs: Dict[str, tuple]):
+        """
+        在子进程中映射共享矩阵
+        
+        Returns:
+            (矩阵字典, 共享内存块列表)，块需在矩阵使用期间保持引用
+        """
+        arrays, blocks = {}, []
+        for name, (block_name, shape, dtype) in specs.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        return arrays, blocks
+    
+    def close(self):
+        """释放并删除共享内存"""
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+
+# 回测子进程中的引擎（由进程池 initializer 创建，映射共享矩阵）
+_worker_engine = None
+_worker_blocks = []
+
+
+def _init_backtest_worker(specs: Dict[str, tuple], dates, symbols: List[str], initial_capital: float,
+                          commission_rate: float, slippage: float):
+    global _worker_engine, _worker_blocks
+    arrays, _worker_blocks = SharedMatrices.attach(specs)
+    _worker_engine = BacktestEngine._from_matrices(arrays, dates, symbols, initial_capital,
+                                                   commission_rate, slippage)
+
+
+def _backtest_worker(strategy_name: str, strategy: BaseStrategy, account_id: str, symbols: List[str],
+                     window: slice) -> Optional['BacktestResult']:
+    return _worker_engine._backtest_strategy(strategy_name, strategy, account_id, symbols, window)
 
 
 class BacktestEngine:
@@ -82,14 +145,16 @@ class BacktestEngine:
                 raise ValueError(f"数据缺少必要字段: {missing_columns}")
             
             # 按时间排序
-            self.data = self.data.sort_values('datetime').reset_index(drop=True)
+            self.data = self.data.sort_values('datetime', kind='stable').reset_index(drop=True)
             
             # 按symbol分组
-            self.data_by_symbol = {}
-            for symbol in self.data['symbol'].unique():
-                symbol_data = self.data[self.data['symbol'] == symbol].copy()
-                symbol_data = symbol_data.sort_values('datetime').reset_index(drop=True)
-                self.data_by_symbol[symbol] = symbol_data
+            self.data_by_symbol = {
+                symbol: symbol_data.reset_index(drop=True)
+                for symbol, symbol_data in self.data.groupby('symbol', sort=False)
+            }
+            
+            # 预先展开为 (交易日 × 品种) 矩阵，回测按整数下标取价
+            self._build_matrices()
             
             logger.info(f"数据预处理完成，共 {len(self.data_by_symbol)} 个品种")
             
@@ -97,10 +162,68 @@ class BacktestEngine:
             logger.error(f"数据预处理失败: {e}")
             raise
     
+    def _build_matrices(self):
+        """
+        把行情展开为 (交易日 × 品种) 的 NumPy 矩阵：
+        - self.bar_fields[field][t, j]：第t个交易日品种j的 open/high/low/close/volume，无K线为NaN
+        - self.has_bar[t, j]：当日是否有K线
+        - self.mark_prices[t, j]：估值价，停牌日沿用最近收盘价
+        """
+        date_codes, dates = pd.factorize(self.data['datetime'], sort=True)
+        symbol_codes, symbols = pd.factorize(self.data['symbol'])
+        self.dates = dates
+        self.symbol_index = {symbol: j for j, symbol in enumerate(symbols)}
+        shape = (len(dates), len(symbols))
+        
+        self.bar_fields = {}
+        for field in ('open', 'high', 'low', 'close', 'volume'):
+            matrix = np.full(shape, np.nan)
+            # 同一交易日同一品种有多行时保留最后一行
+            matrix[date_codes, symbol_codes] = self.data[field].to_numpy(dtype=float)
+            self.bar_fields[field] = matrix
+        self.has_bar = np.zeros(shape, dtype=bool)
+        self.has_bar[date_codes, symbol_codes] = True
+        self.mark_prices = pd.DataFrame(self.bar_fields['close']).ffill().fillna(0.0).to_numpy()
+    
+    def _matrix_arrays(self) -> Dict[str, np.ndarray]:
+        """回测用到的全部矩阵"""
+        return {**self.bar_fields, 'has_bar': self.has_bar, 'mark_prices': self.mark_prices}
+    
+    @classmethod
+    def _from_matrices(cls, arrays: Dict[str, np.ndarray], dates, symbols: List[str], initial_capital: float,
+                       commission_rate: float, slippage: float) -> 'BacktestEngine':
+        """由已展开的矩阵构建只用于执行回测内核的引擎（子进程使用）"""
+        engine = cls.__new__(cls)
+        engine.strategy_manager = None
+        engine.data = None
+        engine.initial_capital = initial_capital
+        engine.commission_rate = commission_rate
+        engine.slippage = slippage
+        engine.results = {}
+        engine.dates = dates
+        engine.symbol_index = {symbol: j for j, symbol in enumerate(symbols)}
+        engine.bar_fields = {name: arrays[name] for name in ('open', 'high', 'low', 'close', 'volume')}
+        engine.has_bar = arrays['has_bar']
+        engine.mark_prices = arrays['mark_prices']
+        return engine
+    
+    def _date_window(self, start_date: datetime = None, end_date: datetime = None) -> slice:
+        """回测区间对应的交易日下标范围（交易日已排序）"""
+        mask = np.ones(len(self.dates), dtype=bool)
+        if start_date:
+            mask &= np.asarray(self.dates >= start_date)
+        if end_date:
+            mask &= np.asarray(self.dates <= end_date)
+        selected = np.flatnonzero(mask)
+        if len(selected) == 0:
+            return slice(0, 0)
+        return slice(int(selected[0]), int(selected[-1]) + 1)
+    
     def run_backtest(self, 
                     start_date: datetime = None, 
                     end_date: datetime = None,
-                    strategies: List[str] = None) -> Dict[str, BacktestResult]:
+                    strategies: List[str] = None,
+                    processes: Optional[int] = 1) -> Dict[str, BacktestResult]:
         """
         运行回测
         
@@ -108,6 +231,8 @@ class BacktestEngine:
             start_date: 开始日期
             end_date: 结束日期
             strategies: 要回测的策略列表，None表示回测所有策略
+            processes: 并行进程数，1为在当前进程依次回测，None为CPU核数；
+                       并行时价格矩阵放入共享内存，各策略在进程池中回测（策略对象以副本运行）
             
         Returns:
             回测结果字典
@@ -117,77 +242,137 @@ class BacktestEngine:
                 strategies = list(self.strategy_manager.strategies.keys())
             
             logger.info(f"开始回测 {len(strategies)} 个策略")
+            started = time.perf_counter()
             
-            # 过滤数据时间范围
-            if start_date:
-                self.data = self.data[self.data['datetime'] >= start_date]
-            if end_date:
-                self.data = self.data[self.data['datetime'] <= end_date]
-            
-            # 重新准备数据
-            self._prepare_data()
+            # 时间范围只换算为交易日下标区间，不修改 self.data，多次/并行回测共用同一份矩阵
+            window = self._date_window(start_date, end_date)
             
-            # 为每个策略运行回测
-            for strategy_name in strategies:
-                try:
-                    logger.info(f"开始回测策略: {strategy_name}")
-                    result = self._run_single_strategy_backtest(strategy_name)
-                    if result:
-                        self.results[strategy_name] = result
-                        logger.info(f"策略 {strategy_name} 回测完成")
-                except Exception as e:
-                    logger.error(f"策略 {strategy_name} 回测失败: {e}")
-            
-            logger.info(f"回测完成，共 {len(self.results)} 个策略")
+            if processes is None:
+                processes = os.cpu_count() or 1
+            if processes > 1 and len(strategies) > 1:
+                self._run_parallel(strategies, window, processes)
+            else:
+                # 为每个策略运行回测
+                for strategy_name in strategies:
+                    try:
+                        logger.info(f"开始回测策略: {strategy_name}")
+                        result = self._run_single_strategy_backtest(strategy_name, window)
+                        if result:
+                            self.results[strategy_name] = result
+                            logger.info(f"策略 {strategy_name} 回测完成，耗时 {result.wall_time:.2f}s")
+                    except Exception as e:
+                        logger.error(f"策略 {strategy_name} 回测失败: {e}")
+            
+            logger.info(f"回测完成，共 {len(self.results)} 个策略，总耗时 {time.perf_counter() - started:.2f}s")
             return self.results
             
         except Exception as e:
             logger.error(f"回测运行失败: {e}")
             raise
     
-    def _run_single_strategy_backtest(self, strategy_name: str) -> Optional[BacktestResult]:
+    def _strategy_config(self, strategy_name: str) -> Optional[tuple]:
+        """策略实例、账户与品种，配置不完整返回None"""
+        strategy = self.strategy_manager.strategies[strategy_name]
+        state = self.strategy_manager.strategy_states[strategy_name]
+        
+        account_id = state.get('account_id')
+        symbols = state.get('symbols', [])
+        
+        if not account_id or not symbols:
+            logger.warning(f"策略 {strategy_name} 缺少账户或品种配置")
+            return None
+        return strategy, account_id, symbols
+    
+    def _run_parallel(self, strategies: List[str], window: slice, processes: int):
+        """在进程池中并行回测，子进程映射共享内存中的价格矩阵"""
+        tasks = {}
+        for strategy_name in strategies:
+            try:
+                config = self._strategy_config(strategy_name)
+            except Exception as e:
+                logger.error(f"策略 {strategy_name} 回测失败: {e}")
+                continue
+            if config:
+                tasks[strategy_name] = config
+        if not tasks:
+            return
+        
+        shared = SharedMatrices(self._matrix_arrays())
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(processes, len(tasks)),
+                initializer=_init_backtest_worker,
+                initargs=(shared.specs, self.dates, list(self.symbol_index), self.initial_capital,
+                          self.commission_rate, self.slippage)
+            ) as pool:
+                futures = {
+                    pool.submit(_backtest_worker, strategy_name, strategy, account_id, symbols, window): strategy_name
+                    for strategy_name, (strategy, account_id, symbols) in tasks.items()
+                }
+                logger.info(f"并行回测 {len(futures)} 个策略，进程数: {min(processes, len(tasks))}")
+                for future in as_completed(futures):
+                    strategy_name = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"策略 {strategy_name} 回测失败: {e}")
+                        continue
+                    if result:
+                        self.results[strategy_name] = result
+                        logger.info(f"策略 {strategy_name} 回测完成，耗时 {result.wall_time:.2f}s")
+        finally:
+            shared.close()
+    
+    def _run_single_strategy_backtest(self, strategy_name: str, window: slice = slice(None)) -> Optional[BacktestResult]:
         """运行单个策略回测"""
         try:
-            strategy = self.strategy_manager.strategies[strategy_name]
-            state = self.strategy_manager.strategy_states[strategy_name]
-            
-            account_id = state.get('account_id')
-            symbols = state.get('symbols', [])
-            
-            if not account_id or not symbols:
-                logger.warning(f"策略 {strategy_name} 缺少账户或品种配置")
+            config = self._strategy_config(strategy_name)
+            if config is None:
+                return None
+            strategy, account_id, symbols = config
+            return self._backtest_strategy(strategy_name, strategy, account_id, symbols, window)
+        except Exception as e:
+            logger.error(f"策略 {strategy_name} 回测失败: {e}")
+            return None
+    
+    def _backtest_strategy(self, strategy_name: str, strategy: BaseStrategy, account_id: str,
+                           symbols: List[str], window: slice = slice(None)) -> Optional[BacktestResult]:
+        """回测内核：按交易日下标遍历价格矩阵，持仓为向量，整体估值"""
+        try:
+            started = time.perf_counter()
+            dates = self.dates[window]
+            if len(dates) == 0:
+                logger.warning(f"策略 {strategy_name} 回测区间内没有数据")
                 return None
             
+            # 只取该策略品种对应的列
+            traded = [symbol for symbol in symbols if symbol in self.symbol_index]
+            columns = [self.symbol_index[symbol] for symbol in traded]
+            fields = {name: matrix[window][:, columns] for name, matrix in self.bar_fields.items()}
+            has_bar = self.has_bar[window][:, columns]
+            mark_prices = self.mark_prices[window][:, columns]
+            
             # 初始化回测状态
             capital = self.initial_capital
-            positions = {}  # symbol -> quantity
-            equity_curve = [capital]
+            positions = np.zeros(len(columns))  # 与 traded 对应的持仓数量
+            equity_curve = np.empty(len(dates) + 1)
+            equity_curve[0] = capital
             trade_history = []
-            daily_returns = []
-            
-            # 获取所有交易日
-            all_dates = sorted(self.data['datetime'].unique())
             
-            for date in all_dates:
-                daily_capital = capital
-                
-                # 获取当日数据
-                daily_data = self.data[self.data['datetime'] == date]
-                
-                for _, row in daily_data.iterrows():
-                    symbol = row['symbol']
-                    if symbol not in symbols:
-                        continue
-                    
+            for t, date in enumerate(dates):
+                # 当日各字段整行取出，按下标取值
+                opens, highs, lows, closes, volumes = (fields[name][t].tolist() for name in
+                                                       ('open', 'high', 'low', 'close', 'volume'))
+                for j in np.flatnonzero(has_bar[t]).tolist():
                     # 构建K线数据
                     bar_data = {
-                        'symbol': symbol,
-                        'datetime': row['datetime'],
-                        'open': row['open'],
-                        'high': row['high'],
-                        'low': row['low'],
-                        'close': row['close'],
-                        'volume': row['volume']
+                        'symbol': traded[j],
+                        'datetime': date,
+                        'open': opens[j],
+                        'high': highs[j],
+                        'low': lows[j],
+                        'close': closes[j],
+                        'volume': volumes[j]
                     }
                     
                     # 执行策略
@@ -195,36 +380,26 @@ class BacktestEngine:
                     
                     # 执行交易
                     if signal != 0:
-                        trade_result = self._execute_trade(
-                            symbol, signal, row['close'], 
-                            capital, positions, trade_history
+                        new_capital = self._execute_trade(
+                            traded[j], j, signal, bar_data['close'],
+                            capital, positions, trade_history, date
                         )
-                        if trade_result:
-                            capital = trade_result['new_capital']
-                            positions = trade_result['new_positions']
-                
-                # 更新持仓市值
-                for symbol, quantity in positions.items():
-                    if symbol in self.data_by_symbol:
-                        symbol_data = self.data_by_symbol[symbol]
-                        today_data = symbol_data[symbol_data['datetime'] == date]
-                        if not today_data.empty:
-                            price = today_data.iloc[0]['close']
-                            daily_capital += quantity * price
+                        if new_capital is not None:
+                            capital = new_capital
                 
-                equity_curve.append(daily_capital)
-                
-                # 计算日收益率
-                if len(equity_curve) > 1:
-                    daily_return = (daily_capital - equity_curve[-2]) / equity_curve[-2]
-                    daily_returns.append(daily_return)
+                # 更新持仓市值：现金 + 持仓向量 · 当日估值价
+                equity_curve[t + 1] = capital + positions @ mark_prices[t]
+            
+            # 计算日收益率
+            daily_returns = np.diff(equity_curve) / equity_curve[:-1]
             
             # 计算绩效指标
             performance = self._calculate_backtest_performance(
                 strategy_name, account_id, symbols,
-                all_dates[0], all_dates[-1],
-                equity_curve, trade_history, daily_returns
+                dates[0], dates[-1],
+                equity_curve.tolist(), trade_history, daily_returns.tolist()
             )
+            performance.wall_time = time.perf_counter() - started
             
             return performance
             
@@ -232,11 +407,19 @@ class BacktestEngine:
             logger.error(f"策略 {strategy_name} 回测失败: {e}")
             return None
     
-    def _execute_trade(self, symbol: str, signal: int, price: float, 
-                      capital: float, positions: Dict, trade_history: List) -> Optional[Dict]:
-        """执行交易"""
+    def _execute_trade(self, symbol: str, index: int, signal: int, price: float, capital: float,
+                       positions: np.ndarray, trade_history: List, trade_time=None) -> Optional[float]:
+        """
+        执行交易
+        
+        Args:
+            index: 品种在持仓向量中的下标，成交后原地更新 positions
+            
+        Returns:
+            成交后的资金，未成交返回None
+        """
         try:
-            current_position = positions.get(symbol, 0)
+            current_position = positions[index]
             
             if signal > 0 and current_position == 0:  # 买入信号
                 # 计算可买数量（简化，固定资金比例）
@@ -251,11 +434,11 @@ class BacktestEngine:
                     
                     if total_cost <= capital:
                         # 执行买入
-                        positions[symbol] = quantity
+                        positions[index] = quantity
                         capital -= total_cost
                         
-                        trade_record = {
-                            'datetime': datetime.now(),
+                        trade_history.append({
+                            'datetime': trade_time,
                             'symbol': symbol,
                             'action': 'buy',
                             'quantity': quantity,
@@ -263,39 +446,30 @@ class BacktestEngine:
                             'commission': commission,
                             'slippage': slippage_cost,
                             'total_cost': total_cost
-                        }
-                        trade_history.append(trade_record)
-                        
-                        return {
-                            'new_capital': capital,
-                            'new_positions': positions
-                        }
+                        })
+                        return capital
             
             elif signal < 0 and current_position > 0:  # 卖出信号
                 # 执行卖出
-                commission = current_position * price * self.commission_rate
-                slippage_cost = current_position * price * self.slippage
-                total_revenue = current_position * price - commission - slippage_cost
+                quantity = int(current_position)
+                commission = quantity * price * self.commission_rate
+                slippage_cost = quantity * price * self.slippage
+                total_revenue = quantity * price - commission - slippage_cost
                 
                 capital += total_revenue
-                positions[symbol] = 0
+                positions[index] = 0
                 
-                trade_record = {
-                    'datetime': datetime.now(),
+                trade_history.append({
+                    'datetime': trade_time,
                     'symbol': symbol,
                     'action': 'sell',
-                    'quantity': current_position,
+                    'quantity': quantity,
                     'price': price,
                     'commission': commission,
                     'slippage': slippage_cost,
                     'total_revenue': total_revenue
-                }
-                trade_history.append(trade_record)
-                
-                return {
-                    'new_capital': capital,
-                    'new_positions': positions
-                }
+                })
+                return capital
             
             return None
             
@@ -313,9 +487,9 @@ class BacktestEngine:
             final_capital = equity_curve[-1]
             total_return = (final_capital - initial_capital) / initial_capital
             
-            # 计算年化收益率
-            days = (end_date - start_date).days
-            annual_return = total_return * 365 / days if days > 0 else 0
+            # 计算年化收益率（按交易日历的交易日数，一年252个交易日）
+            days = get_trading_calendar().count_trading_days(start_date, end_date)
+            annual_return = total_return * 252 / days if days > 0 else 0
             
             # 计算夏普比率
             if daily_returns:
@@ -325,13 +499,8 @@ class BacktestEngine:
                 sharpe_ratio = 0
             
             # 计算最大回撤
-            max_drawdown = 0
-            peak = equity_curve[0]
-            for value in equity_curve:
-                if value > peak:
-                    peak = value
-                drawdown = (peak - value) / peak
-                max_drawdown = max(max_drawdown, drawdown)
+            equity = np.asarray(equity_curve, dtype=float)
+            max_drawdown = float((1 - equity / np.maximum.accumulate(equity)).max())
             
             # 计算交易统计
             total_trades = len(trade_history)
@@ -340,14 +509,13 @@ class BacktestEngine:
             total_profit = 0
             total_loss = 0
             
+            # 每只股票全仓进出，卖出与该股票最近一次买入配对
+            last_buy = {}
             for trade in trade_history:
-                if trade['action'] == 'sell':
-                    # 找到对应的买入交易
-                    buy_trade = None
-                    for prev_trade in trade_history[:trade_history.index(trade)]:
-                        if prev_trade['symbol'] == trade['symbol'] and prev_trade['action'] == 'buy':
-                            buy_trade = prev_trade
-                            break
+                if trade['action'] == 'buy':
+                    last_buy[trade['symbol']] = trade
+                elif trade['action'] == 'sell':
+                    buy_trade = last_buy.pop(trade['symbol'], None)
                     
                     if buy_trade:
                         profit = trade['total_revenue'] - buy_trade['total_cost']
@@ -438,6 +606,7 @@ class BacktestEngine:
                 report.append(f"平均盈利: {result.avg_profit:.2f}")
                 report.append(f"平均亏损: {result.avg_loss:.2f}")
                 report.append(f"盈亏比: {result.profit_factor:.2f}")
+                report.append(f"回测耗时: {result.wall_time:.2f}s")
                 report.append("")
             
             return "\n".join(report)
@@ -0,0 +1,167 @@
+# coding=utf-8
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BarSubscription:
+    """单个策略的行情订阅"""
+    name: str
+    symbols: List[str]
+    interval: float
+    next_run: float = 0.0
+    pending: Dict[str, Dict] = field(default_factory=dict)  # 尚未交给策略的最新K线 symbol -> bar
+
+
+class BarDispatcher:
+    """
+    行情分发器
+    - 一个轮询线程按各策略的执行间隔找出到期的订阅，对这些订阅涉及的不同品种只拉取一次最新K线
+    - 也可由行情推送直接调用 publish() 注入新K线
+    - K线按策略放入事件队列，由按CPU核数设定大小的线程池执行；同一策略的事件串行处理，
+      策略处理慢时未处理的K线按品种合并为最新一根，不会无限堆积
+    拉取行情的成本只与不同品种数有关，与订阅的策略数无关。
+    """
+
+    def __init__(self, fetch_bars: Callable[[List[str]], Optional[Dict[str, Dict]]],
+                 handler: Callable[[str, Dict[str, Dict]], None],
+                 max_workers: Optional[int] = None, retry_interval: float = 1.0):
+        """
+        Args:
+            fetch_bars: 批量获取最新K线 symbols -> {symbol: bar}，失败返回None
+            handler: 策略事件处理函数 (策略名, {symbol: bar})
+            max_workers: 事件处理线程数，默认CPU核数
+            retry_interval: 拉取行情失败后重试的间隔（秒）
+        """
+        self.fetch_bars = fetch_bars
+        self.handler = handler
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.retry_interval = retry_interval
+        self._subscriptions: Dict[str, BarSubscription] = {}
+        self._active: Set[str] = set()  # 已提交到线程池、正在处理事件的策略
+        self._lock = threading.Condition()
+        self._wakeup = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def start(self):
+        """启动轮询线程和事件线程池（重复调用无副作用）"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='StrategyWorker')
+            self._thread = threading.Thread(target=self._poll_loop, name='BarDispatcher', daemon=True)
+            self._thread.start()
+        logger.info(f"行情分发器启动，事件线程数: {self.max_workers}")
+
+    def stop(self, timeout: float = 10):
+        """停止轮询并等待已排队的事件处理完"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        logger.info("行情分发器已停止")
+
+    def subscribe(self, name: str, symbols: List[str], interval: float):
+        """订阅：策略 name 每 interval 秒收到一次 symbols 的最新K线"""
+        with self._lock:
+            self._subscriptions[name] = BarSubscription(name, list(symbols), max(float(interval), 0.0))
+        self._wakeup.set()
+
+    def unsubscribe(self, name: str):
+        """取消订阅，已排队未处理的K线一并丢弃"""
+        with self._lock:
+            self._subscriptions.pop(name, None)
+
+    def symbols(self) -> List[str]:
+        """当前订阅涉及的不同品种"""
+        with self._lock:
+            return sorted({s for sub in self._subscriptions.values() for s in sub.symbols})
+
+    def publish(self, bars: Dict[str, Dict]):
+        """推送新K线，立即分发给订阅了这些品种的所有策略"""
+        with self._lock:
+            for sub in self._subscriptions.values():
+                self._enqueue(sub, bars)
+
+    def wait_idle(self, name: str, timeout: float = 10) -> bool:
+        """等待策略当前的事件处理完，超时返回False"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while name in self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+    def _enqueue(self, sub: BarSubscription, bars: Dict[str, Dict]):
+        """把K线放入策略的事件队列（调用方持有锁），分发器未运行时丢弃"""
+        if not self._running or self._executor is None:
+            return
+        selected = {s: bars[s] for s in sub.symbols if s in bars}
+        if not selected:
+            return
+        sub.pending.update(selected)
+        if sub.name not in self._active:
+            self._active.add(sub.name)
+            self._executor.submit(self._drain, sub.name)
+
+    def _drain(self, name: str):
+        """依次处理策略排队的K线，直到队列为空"""
+        while True:
+            with self._lock:
+                sub = self._subscriptions.get(name)
+                if sub is None or not sub.pending:
+                    self._active.discard(name)
+                    self._lock.notify_all()
+                    return
+                bars, sub.pending = sub.pending, {}
+            try:
+                self.handler(name, bars)
+            except Exception as e:
+                logger.error(f"策略 {name} 处理行情事件失败: {e}")
+
+    def _poll_loop(self):
+        """轮询到期订阅，按不同品种拉取一次行情后分发"""
+        while self._running:
+            now = time.monotonic()
+            with self._lock:
+                due = [sub for sub in self._subscriptions.values() if sub.next_run <= now]
+            if due:
+                symbols = sorted({s for sub in due for s in sub.symbols})
+                try:
+                    bars = self.fetch_bars(symbols)
+                except Exception as e:
+                    logger.error(f"行情分发器获取数据失败: {e}")
+                    bars = None
+                now = time.monotonic()
+                with self._lock:
+                    for sub in due:
+                        if self._subscriptions.get(sub.name) is not sub:
+                            continue  # 拉取期间已取消或重新订阅
+                        if bars is None:
+                            sub.next_run = now + self.retry_interval
+                        else:
+                            sub.next_run = now + sub.interval
+                            self._enqueue(sub, bars)
+            with self._lock:
+                next_runs = [sub.next_run for sub in self._subscriptions.values()]
+            wait = min(next_runs) - time.monotonic() if next_runs else 1.0
+            self._wakeup.wait(min(max(wait, 0.05), 1.0))
+            self._wakeup.clear()
@@ -0,0 +1,156 @@
+# coding=utf-8
+import json
+import queue
+import atexit
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, IO, List, Tuple
+
+# 优先使用 orjson 序列化，未安装时退回标准库 json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+
+
+def _dumps(record: Dict) -> bytes:
+    """序列化一条日志为一行JSON（时间等非JSON类型按 str() 输出，与原 json.dumps(default=str) 一致）"""
+    if HAS_ORJSON:
+        return orjson.dumps(record, default=str, option=(orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+                                                         | orjson.OPT_APPEND_NEWLINE))
+    return (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+
+
+class StrategyLogWriter:
+    """
+    策略事件日志的后台写入器
+    - write() 只做级别过滤并放入队列，调用线程不做序列化和文件IO
+    - 后台线程批量序列化，按条数或时间阈值合并写入，每个文件一次 write
+    - 文件按 <策略名>_<YYYYMMDD>.json 按日轮转，句柄保持打开，跨日时关闭旧文件
+    """
+
+    def __init__(self, log_path: Path, level: str = 'DEBUG',
+                 flush_size: int = 1000, flush_interval: float = 1.0):
+        """
+        Args:
+            log_path: 日志目录
+            level: 最低记录级别，低于该级别的事件直接丢弃
+            flush_size: 缓冲达到该条数时写入
+            flush_interval: 距上次写入超过该秒数时写入
+        """
+        self.log_path = Path(log_path)
+        self.level = LOG_LEVELS.get(level.upper(), 10)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._files: Dict[Tuple[str, str], IO[bytes]] = {}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='StrategyLogWriter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enabled(self, level: str) -> bool:
+        """该级别的事件是否需要记录"""
+        return LOG_LEVELS.get(level, 0) >= self.level
+
+    def write(self, entry) -> bool:
+        """放入一条 StrategyLog（非阻塞），被级别过滤或写入器已关闭时返回False"""
+        if self._closed or not self.enabled(entry.log_level):
+            return False
+        self._queue.put(entry)
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待此前放入的事件全部写入文件"""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """写完剩余事件并关闭文件"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        buffer: List = []
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0.0) if buffer else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # 时间阈值到达
+            # 一次取出队列中已有的全部事件
+            items = [item]
+            while len(buffer) + len(items) < self.flush_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            waiters = []
+            for item in items:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                elif item is not False:
+                    buffer.append(item)
+            if buffer and (stop or waiters or len(buffer) >= self.flush_size
+                           or time.monotonic() - last_flush >= self.flush_interval):
+                self._write_batch(buffer)
+                buffer = []
+                last_flush = time.monotonic()
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                self._close_files()
+                return
+
+    def _write_batch(self, entries: List):
+        """批量序列化并按文件合并写入"""
+        chunks: Dict[Tuple[str, str], List[bytes]] = {}
+        for entry in entries:
+            try:
+                key = (entry.strategy_name, entry.timestamp.strftime('%Y%m%d'))
+                # 直接序列化字段（asdict 会深拷贝整个 data 字典）
+                chunks.setdefault(key, []).append(_dumps(vars(entry)))
+            except Exception as e:
+                logger.error(f"序列化策略日志失败: {e}")
+        for key, lines in chunks.items():
+            try:
+                f = self._file(key)
+                f.write(b''.join(lines))
+                f.flush()
+            except Exception as e:
+                logger.error(f"记录策略日志失败: {e}")
+
+    def _file(self, key: Tuple[str, str]) -> IO[bytes]:
+        f = self._files.get(key)
+        if f is None:
+            strategy_name, day = key
+            # 日期轮转：关闭该策略前一日的文件
+            for old_key in [k for k in self._files if k[0] == strategy_name and k[1] != day]:
+                self._files.pop(old_key).close()
+            f = self._files[key] = open(self.log_path / f"{strategy_name}_{day}.json", 'ab')
+        return f
+
+    def _close_files(self):
+        for f in self._files.values():
+            try:
+                f.close()
+            except Exception:
+                pass
+        self._files.clear()
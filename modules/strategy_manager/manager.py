@@ -16,6 +16,10 @@ from xtquant.xttrader import XtQuantTrader
 from xtquant.xttype import StockAccount
 
 from .config import STRATEGY_CONFIG
+from .dispatcher import BarDispatcher
+from .log_writer import StrategyLogWriter
+from .trade_ledger import TradeLedger
+from .performance import compute_performance, with_opening_positions
 from strategies.base import BaseStrategy
 from strategies.registry import StrategyRegistry
 # 确保策略被导入和注册
@@ -24,6 +28,7 @@ from modules.tornadoapp.oms.order_manager import OrderManager
 from modules.tornadoapp.risk.risk_manager import RiskManager
 from modules.tornadoapp.compliance.compliance_manager import ComplianceManager
 from modules.tornadoapp.audit.audit_logger import AuditLogger
+from modules.tornadoapp.oms.account_snapshot import get_account_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -70,14 +75,14 @@ class StrategyManager:
                  xt_trader: XtQuantTrader,
                  order_manager: OrderManager,
                  data_service_manager=None,
-                 base_path: str = "strategy_data"):
+                 base_path: str = "strategy_data",
+                 log_level: str = "DEBUG"):
         self.xt_trader = xt_trader
         self.order_manager = order_manager
         self.data_service_manager = data_service_manager
         
         # 策略相关
         self.strategies: Dict[str, BaseStrategy] = {}
-        self.strategy_threads: Dict[str, threading.Thread] = {}
         self.strategy_states: Dict[str, Dict] = {}
         self.performance_data: Dict[str, StrategyPerformance] = {}
         
@@ -96,6 +101,17 @@ class StrategyManager:
         for path in [self.log_path, self.performance_path, self.config_path]:
             path.mkdir(parents=True, exist_ok=True)
         
+        # 策略事件日志：后台线程批量写入，策略线程不做文件IO
+        self.log_writer = StrategyLogWriter(self.log_path, level=log_level)
+        
+        # 成交台账：由成交回报写入实际成交，绩效计算按策略+时间区间查询
+        self.trade_ledger = TradeLedger(self.base_path / "trades.db")
+        self._backfill_trade_ledger()
+        self.order_manager.add_trade_listener(self._on_trade)
+        
+        # 行情分发：所有策略共用一次行情拉取，事件交给按CPU核数设定的线程池处理
+        self.dispatcher = BarDispatcher(self._get_latest_data, self._on_strategy_bars)
+        
         # 热插拔支持
         self.hot_reload_enabled = True
         self.config_watcher = None
@@ -192,23 +208,24 @@ class StrategyManager:
         try:
             strategy = self.strategies[strategy_name]
             state = self.strategy_states[strategy_name]
+            account_id = state.get('account_id')
+            symbols = state.get('symbols', [])
             
-            # 创建策略运行线程
-            thread = threading.Thread(
-                target=self._run_strategy_loop,
-                args=(strategy_name,),
-                name=f"Strategy-{strategy_name}",
-                daemon=True
-            )
-            
-            self.strategy_threads[strategy_name] = thread
-            thread.start()
+            if not account_id or not symbols:
+                logger.error(f"策略 {strategy_name} 缺少账户或品种配置")
+                return False
             
             # 更新状态
             state['status'] = 'running'
             state['start_time'] = datetime.now()
             state['last_update'] = datetime.now()
+            state['error_count'] = 0
+            
+            # 订阅行情，由分发器按策略执行间隔推送K线
+            self.dispatcher.subscribe(strategy_name, symbols, strategy.get_interval())
+            self.dispatcher.start()
             
+            logger.info(f"策略 {strategy_name} 开始运行 - 账户: {account_id}, 品种: {symbols}")
             self._log_strategy_event(strategy_name, "INFO", f"策略启动成功")
             logger.info(f"策略 {strategy_name} 启动成功")
             return True
@@ -233,10 +250,9 @@ class StrategyManager:
             # 标记停止
             state['status'] = 'stopping'
             
-            # 等待线程结束
-            if strategy_name in self.strategy_threads:
-                thread = self.strategy_threads[strategy_name]
-                thread.join(10)  # 最多等待10秒
+            # 取消订阅并等待正在处理的行情事件结束
+            self.dispatcher.unsubscribe(strategy_name)
+            self.dispatcher.wait_idle(strategy_name, 10)  # 最多等待10秒
             
             # 更新状态
             state['status'] = 'stopped'
@@ -262,69 +278,50 @@ class StrategyManager:
         for strategy_name in self.strategies:
             self.stop_strategy(strategy_name)
     
-    def _run_strategy_loop(self, strategy_name: str):
-        """策略运行循环"""
-        strategy = self.strategies[strategy_name]
-        state = self.strategy_states[strategy_name]
-        account_id = state.get('account_id')
-        symbols = state.get('symbols', [])
-        
-        if not account_id or not symbols:
-            logger.error(f"策略 {strategy_name} 缺少账户或品种配置")
+    def _on_strategy_bars(self, strategy_name: str, bars: Dict[str, Dict]):
+        """处理分发器推送给策略的一组最新K线"""
+        strategy = self.strategies.get(strategy_name)
+        state = self.strategy_states.get(strategy_name)
+        if strategy is None or state is None or state['status'] != 'running':
             return
-        
+        account_id = state.get('account_id')
         account = self.accounts[account_id]
         
-        logger.info(f"策略 {strategy_name} 开始运行 - 账户: {account_id}, 品种: {symbols}")
-        
         try:
-            while state['status'] == 'running':
-                try:
-                    # 获取最新数据
-                    data = self._get_latest_data(symbols)
-                    if data is None:
-                        time.sleep(1)
-                        continue
-                    
-                    # 执行策略逻辑
-                    for symbol in symbols:
-                        if symbol in data:
-                            signal = strategy.on_bar(data[symbol], account_id)
-                            
-                            # 记录信号
-                            self._log_strategy_event(
-                                strategy_name, "DEBUG", 
-                                f"信号生成: {symbol} = {signal}",
-                                {'symbol': symbol, 'signal': signal, 'data': data[symbol]}
-                            )
-                            
-                            # 执行交易
-                            if signal != 0:
-                                self._execute_signal(strategy_name, account, symbol, signal, data[symbol])
+            # 执行策略逻辑
+            for symbol in state.get('symbols', []):
+                if symbol in bars:
+                    signal = strategy.on_bar(bars[symbol], account_id)
                     
-                    # 更新状态
-                    state['last_update'] = datetime.now()
-                    state['error_count'] = 0
-                    
-                    # 策略执行间隔
-                    time.sleep(strategy.get_interval())
-                    
-                except Exception as e:
-                    state['error_count'] += 1
-                    logger.error(f"策略 {strategy_name} 执行错误: {e}")
-                    self._log_strategy_event(strategy_name, "ERROR", f"策略执行错误: {e}")
-                    
-                    if state['error_count'] > 10:
-                        logger.error(f"策略 {strategy_name} 错误次数过多，停止运行")
-                        break
-                    
-                    time.sleep(5)  # 错误后等待5秒
+                    # 记录信号
+                    self._log_strategy_event(
+                        strategy_name, "DEBUG", 
+                        f"信号生成: {symbol} = {signal}",
+                        {'symbol': symbol, 'signal': signal, 'data': bars[symbol]}
+                    )
                     
+                    # 执行交易
+                    if signal != 0:
+                        self._execute_signal(strategy_name, account, symbol, signal, bars[symbol])
+            
+            # 更新状态
+            state['last_update'] = datetime.now()
+            state['error_count'] = 0
+            
         except Exception as e:
-            logger.error(f"策略 {strategy_name} 运行循环异常: {e}")
-        finally:
-            state['status'] = 'stopped'
-            logger.info(f"策略 {strategy_name} 运行结束")
+            state['error_count'] += 1
+            logger.error(f"策略 {strategy_name} 执行错误: {e}")
+            self._log_strategy_event(strategy_name, "ERROR", f"策略执行错误: {e}")
+            
+            if state['error_count'] > 10:
+                logger.error(f"策略 {strategy_name} 错误次数过多，停止运行")
+                self.dispatcher.unsubscribe(strategy_name)
+                state['status'] = 'stopped'
+                logger.info(f"策略 {strategy_name} 运行结束")
+    
+    def publish_bars(self, bars: Dict[str, Dict]):
+        """外部行情推送入口：{symbol: bar} 立即分发给订阅了这些品种的运行中策略"""
+        self.dispatcher.publish(bars)
     
     def _get_latest_data(self, symbols: list) -> dict:
         """获取最新K线数据（多品种）"""
@@ -332,11 +329,10 @@ class StrategyManager:
             if self.data_service_manager:
                 data = {}
                 for symbol in symbols:
-                    # 获取最新一条1分钟K线
-                    bars = self.data_service_manager.get_bar_data(symbol, '20240101', '20991231', '1min')
-                    if bars:
-                        latest_bar = bars[-1]
-                        data[symbol] = latest_bar.dict() if hasattr(latest_bar, 'dict') else latest_bar
+                    # 获取最新一条1分钟K线（只查询最近区间，不构建整段历史的BarData）
+                    latest_bar = self.data_service_manager.get_latest_bar(symbol, '1min')
+                    if latest_bar:
+                        data[symbol] = latest_bar
                 return data if data else None
             else:
                 return self._get_mock_data(symbols)
@@ -364,20 +360,20 @@ class StrategyManager:
     def _execute_signal(self, strategy_name: str, account: StockAccount, symbol: str, signal: int, data: Dict):
         """执行交易信号"""
         try:
+            # 持仓从共享账户快照读取（由交易循环/回调维护，过期才重新查询券商）
+            snapshot = get_account_snapshot(getattr(account, 'account_id', ''))
+            snapshot.ensure_fresh(self.xt_trader, account)
+            current_position = snapshot.get_volume(symbol)
+            
             if signal > 0:  # 买入信号
-                # 检查持仓
-                positions = self.xt_trader.query_stock_positions(account)
-                current_position = 0
-                for pos in positions:
-                    if pos.stock_code == symbol:
-                        current_position = pos.volume
-                        break
-                
                 if current_position == 0:  # 没有持仓才买入
                     price = data['close']
                     quantity = 100  # 固定数量，实际应该根据资金计算
                     
-                    order = self.order_manager.create_order(symbol, "买", price, quantity, account)
+                    order = self.order_manager.create_order(symbol, "买", price, quantity, account,
+                                                            ext={'strategy_name': strategy_name})
+                    if order:
+                        snapshot.apply_order(symbol, "买", price, quantity)
                     
                     self._log_strategy_event(
                         strategy_name, "INFO",
@@ -386,19 +382,14 @@ class StrategyManager:
                     )
             
             elif signal < 0:  # 卖出信号
-                # 检查持仓
-                positions = self.xt_trader.query_stock_positions(account)
-                current_position = 0
-                for pos in positions:
-                    if pos.stock_code == symbol:
-                        current_position = pos.volume
-                        break
-                
                 if current_position > 0:  # 有持仓才卖出
                     price = data['close']
                     quantity = current_position
                     
-                    order = self.order_manager.create_order(symbol, "卖", price, quantity, account)
+                    order = self.order_manager.create_order(symbol, "卖", price, quantity, account,
+                                                            ext={'strategy_name': strategy_name})
+                    if order:
+                        snapshot.apply_order(symbol, "卖", price, quantity)
                     
                     self._log_strategy_event(
                         strategy_name, "INFO",
@@ -411,7 +402,9 @@ class StrategyManager:
             self._log_strategy_event(strategy_name, "ERROR", f"执行信号失败: {e}")
     
     def _log_strategy_event(self, strategy_name: str, level: str, message: str, data: Dict = None):
-        """记录策略事件"""
+        """记录策略事件（级别过滤后放入后台写入队列）"""
+        if not self.log_writer.enabled(level):
+            return
         try:
             log_entry = StrategyLog(
                 timestamp=datetime.now(),
@@ -422,48 +415,72 @@ class StrategyManager:
                 message=message,
                 data=data
             )
+            self.log_writer.write(log_entry)
             
-            # 保存到文件
-            log_file = self.log_path / f"{strategy_name}_{datetime.now().strftime('%Y%m%d')}.json"
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(asdict(log_entry), ensure_ascii=False, default=str) + '\n')
-                
         except Exception as e:
             logger.error(f"记录策略日志失败: {e}")
     
-    def calculate_performance(self, strategy_name: str, start_date: datetime = None, end_date: datetime = None):
-        """计算策略绩效"""
+    def _backfill_trade_ledger(self):
+        """
+        从旧的策略日志导入历史成交，只在首次启用台账时执行一次：
+        完成后写入迁移标记（未导入任何成交也写），之后启动不再扫描日志；
+        已有成交但无标记的旧台账直接补写标记，不重复导入
+        """
+        try:
+            if self.trade_ledger.get_meta('log_import') is not None:
+                return
+            if self.trade_ledger.is_empty():
+                log_files = sorted(self.log_path.glob("*.json"))
+                if log_files:
+                    self.trade_ledger.import_strategy_logs(log_files)
+            self.trade_ledger.set_meta('log_import', datetime.now().isoformat())
+        except Exception as e:
+            logger.error(f"从策略日志导入历史成交失败: {e}")
+    
+    def _on_trade(self, order, trade):
+        """成交回报：把策略订单的实际成交价/量写入成交台账（部分成交逐笔记录，撤单/拒单不会产生记录）"""
+        strategy_name = order.ext.get('strategy_name')
+        if not strategy_name:
+            return
+        traded_time = getattr(trade, 'traded_time', None)
+        try:
+            self.trade_ledger.record(
+                strategy_name, getattr(order.account, 'account_id', ''), order.symbol,
+                'buy' if order.side == "买" else 'sell', trade.traded_price, trade.traded_volume,
+                order_id=order.order_id,
+                trade_time=datetime.fromtimestamp(traded_time) if traded_time else None
+            )
+        except Exception as e:
+            logger.error(f"写入成交台账失败: {e}")
+    
+    def calculate_performance(self, strategy_name: str, start_date: datetime = None, end_date: datetime = None,
+                              initial_capital: float = 1000000, last_prices: Dict[str, float] = None):
+        """
+        计算策略绩效（从成交台账按区间查询，不再扫描日志文件）
+        
+        Args:
+            initial_capital: 初始资金；指定 start_date 时区间收益以 初始资金 + 起点前累计盈亏 为基数
+            last_prices: 未平仓品种的最新价，缺省按最近成交价估值
+        """
         try:
             if strategy_name not in self.strategies:
                 logger.error(f"策略 {strategy_name} 不存在")
                 return None
             
-            # 读取策略日志
-            log_files = list(self.log_path.glob(f"{strategy_name}_*.json"))
-            if not log_files:
-                logger.warning(f"策略 {strategy_name} 没有日志数据")
-                return None
-            
-            # 解析日志数据
-            trades = []
-            equity_curve = [1000000]  # 初始资金100万
-            
-            for log_file in log_files:
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        try:
-                            log_data = json.loads(line.strip())
-                            if log_data.get('data') and log_data['data'].get('action') in ['buy', 'sell']:
-                                trades.append(log_data)
-                        except:
-                            continue
-            
-            if not trades:
+            trades = self.trade_ledger.query(strategy_name=strategy_name, start=start_date, end=end_date)
+            if trades.empty:
                 logger.warning(f"策略 {strategy_name} 没有交易记录")
                 return None
             
+            # 区间起点前的持仓按一次聚合查询补入，起点前开仓、区间内平仓的回合不会被当作开空
+            seeded, start_capital = trades, initial_capital
+            if start_date is not None:
+                opening = self.trade_ledger.opening_balances(start_date, strategy_name=strategy_name)
+                seeded, start_capital = with_opening_positions(trades, opening, initial_capital, start_date)
+            
             # 计算绩效指标
-            performance = self._calculate_performance_metrics(strategy_name, trades, equity_curve)
+            performance = self._calculate_performance_metrics(strategy_name, trades, start_capital, last_prices,
+                                                              seeded)
             
             # 保存绩效数据
             self.performance_data[strategy_name] = performance
@@ -475,50 +492,33 @@ class StrategyManager:
             logger.error(f"计算策略绩效失败: {e}")
             return None
     
-    def _calculate_performance_metrics(self, strategy_name: str, trades: List[Dict], equity_curve: List[float]) -> StrategyPerformance:
-        """计算绩效指标"""
-        # 简化的绩效计算
-        total_trades = len(trades)
-        profit_trades = len([t for t in trades if t.get('profit', 0) > 0])
-        loss_trades = total_trades - profit_trades
-        
-        total_return = (equity_curve[-1] - equity_curve[0]) / equity_curve[0] if equity_curve else 0
-        annual_return = total_return * 252 / len(equity_curve) if len(equity_curve) > 1 else 0
-        
-        # 计算夏普比率（简化）
-        returns = np.diff(equity_curve) / equity_curve[:-1] if len(equity_curve) > 1 else [0]
-        sharpe_ratio = np.mean(returns) / np.std(returns) * np.sqrt(252) if np.std(returns) > 0 else 0
-        
-        # 计算最大回撤
-        max_drawdown = 0
-        peak = equity_curve[0]
-        for value in equity_curve:
-            if value > peak:
-                peak = value
-            drawdown = (peak - value) / peak
-            max_drawdown = max(max_drawdown, drawdown)
-        
-        win_rate = profit_trades / total_trades if total_trades > 0 else 0
+    def _calculate_performance_metrics(self, strategy_name: str, trades: pd.DataFrame, initial_capital: float,
+                                       last_prices: Dict[str, float] = None,
+                                       seeded: pd.DataFrame = None) -> StrategyPerformance:
+        """计算绩效指标（seeded 为补入起点持仓后的成交，trades 只用于成交明细）"""
+        metrics = compute_performance(trades if seeded is None else seeded, initial_capital, last_prices)
+        symbols = trades['symbol'].unique()
+        trade_history = trades.assign(trade_time=trades['trade_time'].astype(str)).to_dict('records')
         
         return StrategyPerformance(
             strategy_name=strategy_name,
             account_id=self.strategy_states[strategy_name].get('account_id', ''),
-            symbol='',  # 多品种策略
-            start_time=datetime.now() - timedelta(days=30),  # 简化
-            end_time=datetime.now(),
-            total_return=total_return,
-            annual_return=annual_return,
-            sharpe_ratio=sharpe_ratio,
-            max_drawdown=max_drawdown,
-            win_rate=win_rate,
-            total_trades=total_trades,
-            profit_trades=profit_trades,
-            loss_trades=loss_trades,
-            avg_profit=0,  # 简化
-            avg_loss=0,    # 简化
-            profit_factor=0,  # 简化
-            equity_curve=equity_curve,
-            trade_history=trades
+            symbol=symbols[0] if len(symbols) == 1 else '',  # 多品种策略为空
+            start_time=metrics['start_time'],
+            end_time=metrics['end_time'],
+            total_return=metrics['total_return'],
+            annual_return=metrics['annual_return'],
+            sharpe_ratio=metrics['sharpe_ratio'],
+            max_drawdown=metrics['max_drawdown'],
+            win_rate=metrics['win_rate'],
+            total_trades=metrics['total_trades'],
+            profit_trades=metrics['profit_trades'],
+            loss_trades=metrics['loss_trades'],
+            avg_profit=metrics['avg_profit'],
+            avg_loss=metrics['avg_loss'],
+            profit_factor=metrics['profit_factor'],
+            equity_curve=metrics['equity_curve'],
+            trade_history=trade_history
         )
     
     def _save_performance_data(self, strategy_name: str, performance: StrategyPerformance):
@@ -570,8 +570,11 @@ class StrategyManager:
         # 停止所有策略
         self.stop_all_strategies()
         
-        # 等待所有线程结束
-        for thread in self.strategy_threads.values():
-            thread.join(timeout=5)
+        # 停止行情分发并等待事件线程结束
+        self.dispatcher.stop()
+        
+        # 写完缓冲的策略日志
+        self.log_writer.close()
+        self.trade_ledger.close()
         
         logger.info("策略管理器已关闭") 
\ No newline at end of file
@@ -0,0 +1,159 @@
+# coding=utf-8
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def equity_series(trades: pd.DataFrame, initial_capital: float,
+                  last_prices: Optional[Dict[str, float]] = None,
+                  as_of: Optional[datetime] = None) -> pd.Series:
+    """
+    逐笔成交后的账户权益（现金 + 持仓按各品种最近成交价估值），全部为整列运算
+
+    Args:
+        trades: TradeLedger.query() 的结果，按时间升序
+        initial_capital: 初始资金
+        last_prices: 最新价 {symbol: price}，提供时在 as_of 追加一个按最新价估值的点
+    Returns:
+        以成交时间为索引的权益序列
+    """
+    sign = np.where(trades['side'].to_numpy() == 'buy', 1.0, -1.0)
+    quantity = trades['quantity'].to_numpy(dtype=float) * sign
+    cash = initial_capital + np.cumsum(-sign * trades['amount'].to_numpy(dtype=float)
+                                       - trades['fee'].to_numpy(dtype=float))
+    # 每笔成交只改变一个品种的市值：持仓市值 = 各行 (本品种新市值 - 本品种上一笔后的市值) 的累加
+    position = pd.Series(quantity).groupby(trades['symbol'].to_numpy()).cumsum()
+    market_value = position.to_numpy() * trades['price'].to_numpy(dtype=float)
+    previous = pd.Series(market_value).groupby(trades['symbol'].to_numpy()).shift().fillna(0.0).to_numpy()
+    equity = pd.Series(cash + np.cumsum(market_value - previous), index=trades['trade_time'].to_numpy())
+    if last_prices:
+        final = pd.DataFrame({'symbol': trades['symbol'].to_numpy(), 'position': position.to_numpy(),
+                              'price': trades['price'].to_numpy(dtype=float)}).groupby('symbol').last()
+        marks = final.index.map(lambda s: last_prices.get(s)).to_numpy(dtype=float)
+        final_price = np.where(np.isnan(marks), final['price'].to_numpy(), marks)
+        value = cash[-1] + float((final['position'].to_numpy() * final_price).sum())
+        equity.loc[pd.Timestamp(as_of or datetime.now())] = value
+    return equity
+
+
+def with_opening_positions(trades: pd.DataFrame, opening: pd.DataFrame, initial_capital: float,
+                           start: datetime):
+    """
+    把区间起点前的持仓作为起点处的开仓成交补入区间成交，使区间内平掉的旧持仓能正确计入回合与权益
+
+    Args:
+        trades: 区间内成交
+        opening: TradeLedger.opening_balances() 的结果
+        initial_capital: 初始资金
+        start: 区间起点
+    Returns:
+        (补入开仓成交后的成交, 起点权益)；旧持仓按起点前最后成交价估值，起点权益 = 初始资金 + 累计现金流 + 持仓市值
+    """
+    held = opening[~np.isclose(opening['position'].to_numpy(dtype=float), 0.0)]
+    capital = initial_capital + float(opening['cash_flow'].sum()) + float((held['position'] * held['price']).sum())
+    if held.empty:
+        return trades, capital
+    position = held['position'].to_numpy(dtype=float)
+    price = held['price'].to_numpy(dtype=float)
+    seeds = pd.DataFrame({
+        'trade_time': pd.Timestamp(start),
+        'strategy_name': trades['strategy_name'].iloc[0] if len(trades) else '',
+        'account_id': trades['account_id'].iloc[0] if len(trades) else '',
+        'symbol': held['symbol'].to_numpy(),
+        'side': np.where(position > 0, 'buy', 'sell'),
+        'price': price,
+        'quantity': np.abs(position),
+        'amount': np.abs(position) * price,
+        'fee': 0.0,
+        'order_id': None,
+    })
+    return pd.concat([seeds, trades], ignore_index=True), capital
+
+
+def round_trips(trades: pd.DataFrame) -> pd.DataFrame:
+    """
+    按品种把成交切分为 开仓->平仓 的完整回合（持仓从0开始再回到0），未平仓的回合不计入
+
+    Returns:
+        symbol/open_time/close_time/pnl 的 DataFrame，pnl 为回合内卖出金额 - 买入金额 - 费用
+    """
+    sign = np.where(trades['side'].to_numpy() == 'buy', 1.0, -1.0)
+    symbols = trades['symbol'].to_numpy()
+    quantity = trades['quantity'].to_numpy(dtype=float) * sign
+    position = pd.Series(quantity).groupby(symbols).cumsum().to_numpy()
+    cash_flow = -sign * trades['amount'].to_numpy(dtype=float) - trades['fee'].to_numpy(dtype=float)
+    # 上一笔后持仓为0的成交开启新回合
+    opens = np.isclose(position - quantity, 0.0)
+    episode = pd.Series(opens.astype(int)).groupby(symbols).cumsum().to_numpy()
+    frame = pd.DataFrame({'symbol': symbols, 'episode': episode, 'trade_time': trades['trade_time'].to_numpy(),
+                          'position': position, 'pnl': cash_flow})
+    grouped = frame.groupby(['symbol', 'episode'], sort=False)
+    trips = pd.DataFrame({
+        'open_time': grouped['trade_time'].first(),
+        'close_time': grouped['trade_time'].last(),
+        'pnl': grouped['pnl'].sum(),
+        'closed': np.isclose(grouped['position'].last(), 0.0),
+    })
+    trips = trips[trips['closed']].drop(columns='closed').reset_index(level='episode', drop=True).reset_index()
+    return trips.sort_values('close_time', kind='stable').reset_index(drop=True)
+
+
+def compute_performance(trades: pd.DataFrame, initial_capital: float = 1000000.0,
+                        last_prices: Optional[Dict[str, float]] = None) -> Dict:
+    """
+    由成交台账计算绩效
+
+    Args:
+        trades: TradeLedger.query() 的结果（非空）
+        initial_capital: 初始资金
+        last_prices: 未平仓持仓的最新价，缺省按最近成交价估值
+    Returns:
+        dict: 权益曲线（按工作日）、收益、夏普、最大回撤、回合胜率、盈亏比等；
+        交易笔数以完整回合计
+    """
+    trades = trades.sort_values('trade_time', kind='stable').reset_index(drop=True)
+    equity = equity_series(trades, initial_capital, last_prices)
+
+    # 日终权益，补齐无成交的工作日，首日之前以初始资金为起点
+    daily = equity.groupby(equity.index.normalize()).last()
+    days = pd.bdate_range(daily.index[0], daily.index[-1])
+    daily = daily.reindex(days.union(daily.index)).ffill()
+    curve = np.concatenate([[initial_capital], daily.to_numpy()])
+
+    returns = np.diff(curve) / curve[:-1]
+    total_return = curve[-1] / initial_capital - 1
+    annual_return = (1 + total_return) ** (TRADING_DAYS_PER_YEAR / len(returns)) - 1 if total_return > -1 else -1.0
+    std = returns.std()
+    sharpe_ratio = float(returns.mean() / std * np.sqrt(TRADING_DAYS_PER_YEAR)) if std > 0 else 0.0
+    max_drawdown = float((1 - curve / np.maximum.accumulate(curve)).max())
+
+    trips = round_trips(trades)
+    pnl = trips['pnl'].to_numpy()
+    profits, losses = pnl[pnl > 0], pnl[pnl <= 0]
+    gross_loss = -losses.sum()
+    if gross_loss > 0:
+        profit_factor = float(profits.sum() / gross_loss)
+    else:
+        profit_factor = float('inf') if len(profits) else 0.0
+
+    return {
+        'start_time': trades['trade_time'].iloc[0].to_pydatetime(),
+        'end_time': trades['trade_time'].iloc[-1].to_pydatetime(),
+        'total_return': float(total_return),
+        'annual_return': float(annual_return),
+        'sharpe_ratio': sharpe_ratio,
+        'max_drawdown': max_drawdown,
+        'win_rate': len(profits) / len(pnl) if len(pnl) else 0.0,
+        'total_trades': len(pnl),
+        'profit_trades': len(profits),
+        'loss_trades': len(losses),
+        'avg_profit': float(profits.mean()) if len(profits) else 0.0,
+        'avg_loss': float(losses.mean()) if len(losses) else 0.0,
+        'profit_factor': profit_factor,
+        'equity_curve': curve.tolist(),
+        'round_trips': trips,
+    }
@@ -0,0 +1,209 @@
+# coding=utf-8
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    trade_time TEXT NOT NULL,          -- YYYY-MM-DD HH:MM:SS.ffffff，按字符串比较即按时间比较
+    strategy_name TEXT NOT NULL,
+    account_id TEXT NOT NULL DEFAULT '',
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,                -- buy / sell
+    price REAL NOT NULL,
+    quantity INTEGER NOT NULL,
+    amount REAL NOT NULL,              -- price * quantity
+    fee REAL NOT NULL DEFAULT 0,
+    order_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trades_strategy_time ON trades (strategy_name, trade_time);
+CREATE INDEX IF NOT EXISTS idx_trades_account_time ON trades (account_id, trade_time);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+TRADE_COLUMNS = ['trade_time', 'strategy_name', 'account_id', 'symbol', 'side', 'price', 'quantity',
+                 'amount', 'fee', 'order_id']
+
+
+def _format_time(value: Union[datetime, str, None]) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = pd.Timestamp(value).to_pydatetime()
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class TradeLedger:
+    """
+    策略成交台账（SQLite，只追加）
+    每笔实际成交（成交回报）写入一行，按 策略/账户 + 时间 建索引，绩效计算直接做区间查询，不再扫描解析全部日志文件。
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        """
+        Args:
+            db_path: SQLite 数据库文件
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        # WAL：写入只追加日志，读不阻塞写
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def record(self, strategy_name: str, account_id: str, symbol: str, side: str, price: float,
+               quantity: int, order_id: Optional[str] = None, fee: float = 0.0,
+               trade_time: Optional[datetime] = None) -> int:
+        """
+        记录一笔成交
+
+        Args:
+            side: 'buy' / 'sell'
+        Returns:
+            台账行ID
+        """
+        row = (_format_time(trade_time or datetime.now()), strategy_name, account_id or '', symbol, side,
+               float(price), int(quantity), float(price) * int(quantity), float(fee),
+               None if order_id is None else str(order_id))
+        with self._lock:
+            cur = self._conn.execute(
+                f"INSERT INTO trades ({', '.join(TRADE_COLUMNS)}) VALUES ({', '.join('?' * len(TRADE_COLUMNS))})", row)
+            self._conn.commit()
+            return cur.lastrowid
+
+    def record_many(self, rows: Iterable[dict]) -> int:
+        """批量写入（字段同 record 的参数），返回写入行数"""
+        values = []
+        for r in rows:
+            price, quantity = float(r['price']), int(r['quantity'])
+            values.append((_format_time(r.get('trade_time') or datetime.now()), r['strategy_name'],
+                           r.get('account_id') or '', r['symbol'], r['side'], price, quantity, price * quantity,
+                           float(r.get('fee', 0.0)), r.get('order_id')))
+        if not values:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO trades ({', '.join(TRADE_COLUMNS)}) VALUES ({', '.join('?' * len(TRADE_COLUMNS))})",
+                values)
+            self._conn.commit()
+        return len(values)
+
+    def query(self, strategy_name: Optional[str] = None, account_id: Optional[str] = None,
+              start: Optional[datetime] = None, end: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        按 策略/账户/时间区间 查询成交，按时间升序
+
+        Returns:
+            列为 TRADE_COLUMNS 的 DataFrame，trade_time 为 datetime64
+        """
+        conditions, params = self._conditions(strategy_name, account_id)
+        if start is not None:
+            conditions.append("trade_time >= ?")
+            params.append(_format_time(start))
+        if end is not None:
+            conditions.append("trade_time <= ?")
+            params.append(_format_time(end))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = f"SELECT {', '.join(TRADE_COLUMNS)} FROM trades{where} ORDER BY trade_time, id"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        df = pd.DataFrame(rows, columns=TRADE_COLUMNS)
+        df['trade_time'] = pd.to_datetime(df['trade_time'], format='%Y-%m-%d %H:%M:%S.%f')
+        return df
+
+    def opening_balances(self, before: datetime, strategy_name: Optional[str] = None,
+                         account_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        区间起点之前的累计持仓与现金流（每个品种一行聚合，不取出明细）
+
+        Returns:
+            symbol/position/cash_flow/price 的 DataFrame：position 为净持仓，
+            cash_flow 为卖出金额 - 买入金额 - 费用，price 为该品种起点前最后一笔成交价
+        """
+        conditions, params = self._conditions(strategy_name, account_id)
+        conditions.append("trade_time < ?")
+        params.append(_format_time(before))
+        # SQLite 中与 MAX() 同时选出的裸列取自最大值所在行，即最后一笔成交价
+        sql = (f"SELECT symbol, SUM(CASE WHEN side = 'buy' THEN quantity ELSE -quantity END), "
+               f"SUM(CASE WHEN side = 'buy' THEN -amount ELSE amount END - fee), price, MAX(trade_time) "
+               f"FROM trades WHERE {' AND '.join(conditions)} GROUP BY symbol")
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return pd.DataFrame([r[:4] for r in rows], columns=['symbol', 'position', 'cash_flow', 'price'])
+
+    @staticmethod
+    def _conditions(strategy_name: Optional[str], account_id: Optional[str]):
+        conditions, params = [], []
+        if strategy_name is not None:
+            conditions.append("strategy_name = ?")
+            params.append(strategy_name)
+        if account_id is not None:
+            conditions.append("account_id = ?")
+            params.append(account_id)
+        return conditions, params
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM trades LIMIT 1").fetchone() is None
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def import_strategy_logs(self, log_files: List[Union[str, Path]]) -> int:
+        """
+        从旧的策略JSON日志导入买卖记录（一次性迁移历史数据），返回导入行数
+        下单失败（create_order 返回None）时同样会记录买卖日志，其 order 为空，不计为成交
+        """
+        rows = []
+        for log_file in log_files:
+            with open(log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        log_data = json.loads(line.strip())
+                    except ValueError:
+                        continue
+                    data = log_data.get('data') or {}
+                    if data.get('action') not in ('buy', 'sell'):
+                        continue
+                    order = data.get('order')
+                    if not order:
+                        continue
+                    rows.append({
+                        'trade_time': log_data['timestamp'],
+                        'strategy_name': log_data['strategy_name'],
+                        'account_id': log_data.get('account_id', ''),
+                        'symbol': data['symbol'],
+                        'side': data['action'],
+                        'price': data['price'],
+                        'quantity': data['quantity'],
+                        'order_id': order.get('order_id') if isinstance(order, dict) else None,
+                    })
+        count = self.record_many(rows)
+        logger.info(f"从 {len(log_files)} 个日志文件导入 {count} 笔成交")
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
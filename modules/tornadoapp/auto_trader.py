@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import time as _time
 from typing import List, Dict, Optional, Any
 from datetime import datetime, time
 
@@ -7,6 +8,9 @@ from xtquant.xttype import StockAccount
 from modules.stock_selector.selector import StockSelector
 from modules.tornadoapp.position.position_analyzer import PositionAnalyzer
 from utils.date_util import is_trading_time
+from utils.quote_cache import get_quote_cache
+from modules.tornadoapp.oms.account_snapshot import AccountSnapshot, get_account_snapshot
+from modules.tornadoapp.oms.order_manager import ORDER_PRICE_MAX_AGE
 from modules.tornadoapp.risk.risk_manager import RiskManager
 from modules.tornadoapp.compliance.compliance_manager import ComplianceManager
 from modules.tornadoapp.audit.audit_logger import AuditLogger
@@ -17,10 +21,7 @@ logger = logging.getLogger(__name__)
 # 假设你有如下实例
 # xt_trader: QMT交易API实例
 # account: QMT账户
-# latest_price_cache: 实时行情缓存
-
-# 全局行情缓存
-latest_price_cache = {}
+# 实时行情缓存统一使用 utils.quote_cache.get_quote_cache()
 
 class TechnicalAnalyzer:
     """技术指标分析器（示例，可扩展）"""
@@ -259,71 +260,67 @@ def _calculate_multi_period_returns(df) -> Dict[str, float]:
     return returns
 
 
-def judge_market_trend_comprehensive(
-    get_history_func,
-    position_analyzer: PositionAnalyzer,
-    fear_greed_index: float,
-    long_term_fear_greed_index: float,
-    index_codes: Optional[List[str]] = None  # 多指数列表
-) -> Dict[str, Any]:
-    """
-    综合判断市场趋势（牛市/熊市/震荡市）- 增强版
+def _calculate_volume_factor(df) -> Dict[str, Any]:
+    """计算成交量+价格方向因子（最近5日与之前15日对比）"""
+    volume = df['volume'] if 'volume' in df.columns else df['vol']
+    # 成交量比率
+    vol_ratio = volume.iloc[-5:].mean() / volume.iloc[-20:-5].mean()
     
-    优化点：
-    1. 多指数综合判断（上证、深证、创业板、中证500）
-    2. 成交量结合价格方向（放量上涨/下跌）
-    3. 数据质量验证
-    4. 均线系统增强（斜率、距离、交叉信号）
-    5. 多时间窗口（5日、20日、60日、120日）
-    6. 恐贪指数优化（加权平均、背离检测）
+    # 价格变化方向（最近5日）
+    price_change_5d = (df['close'].iloc[-1] / df['close'].iloc[-5] - 1) * 100
     
-    结合多个维度：
-    1. 多指数均线系统（权重35%）
-    2. 恐贪指数（权重30%）
-    3. 多周期涨跌幅（权重20%）
-    4. 成交量+价格方向（权重15%）
+    # 结合成交量和价格方向
+    if vol_ratio > 1.2:  # 放量
+        if price_change_5d > 2:  # 放量上涨
+            vol_score = 0.8  # 强烈牛市信号
+        elif price_change_5d < -2:  # 放量下跌
+            vol_score = -0.8  # 强烈熊市信号
+        else:  # 放量但价格变化不大
+            vol_score = 0.2 if price_change_5d > 0 else -0.2
+    elif vol_ratio < 0.8:  # 缩量
+        if price_change_5d > 1:  # 缩量上涨（可能反弹乏力）
+            vol_score = 0.1
+        elif price_change_5d < -1:  # 缩量下跌（可能继续下跌）
+            vol_score = -0.5
+        else:  # 缩量震荡
+            vol_score = -0.2
+    else:  # 正常量
+        vol_score = 0.1 if price_change_5d > 0 else -0.1
     
-    Args:
-        get_history_func: 获取历史数据的函数
-        position_analyzer: 持仓分析器
-        fear_greed_index: 当日恐贪指数
-        long_term_fear_greed_index: 长期恐贪指数
-        index_codes: 指数代码列表，默认['000001.SH', '399001.SZ', '399006.SZ', '000905.SH']
-                    (上证、深证、创业板、中证500)
+    return {
+        'score': vol_score,
+        'volume_ratio': float(vol_ratio),
+        'price_change_5d': float(price_change_5d),
+        'signal': '放量上涨' if vol_ratio > 1.2 and price_change_5d > 2 else
+                 '放量下跌' if vol_ratio > 1.2 and price_change_5d < -2 else
+                 '缩量上涨' if vol_ratio < 0.8 and price_change_5d > 1 else
+                 '缩量下跌' if vol_ratio < 0.8 and price_change_5d < -1 else '正常'
+    }
+
+
+def _calculate_index_factors(idx_code: str, df) -> Dict[str, Any]:
+    """
+    计算单个指数的趋势因子，只依赖该指数自身行情，可按最后一根K线缓存
     
     Returns:
         {
-            'trend': 'bull'/'bear'/'neutral',  # 市场趋势
-            'confidence': 0.0-1.0,  # 置信度
-            'score': -1.0到1.0,  # 综合得分（正数偏向牛市，负数偏向熊市）
-            'factors': {...}  # 各因素得分详情
+            'ma': 均线系统得分详情（数据不足时为None）,
+            'long_history': 是否有足够长（>=120）的数据,
+            'index_return': 多周期涨跌幅因子（long_history为True时有效）,
+            'volume': 成交量+价格方向因子（long_history为True时有效）
         }
     """
-    if index_codes is None:
-        index_codes = ['000001.SH', '399001.SZ', '399006.SZ', '000905.SH']  # 上证、深证、创业板、中证500
+    factors = {'ma': None, 'long_history': False, 'index_return': None, 'volume': None}
     
-    factors = {}
-    scores = []
-    
-    try:
-        # ========== 1. 多指数均线系统（权重35%） ==========
-        index_ma_scores = []
-        index_ma_details = {}
-        
-        for idx_code in index_codes:
-            try:
-                df = get_history_func(idx_code)
-                quality = _validate_data_quality(df, min_length=60)
-                
-                if not quality['valid']:
-                    logger.warning(f"[市场趋势] 指数 {idx_code} 数据质量不足: {quality['issues']}")
-                    continue
-                
-                # 计算增强均线指标
-                ma_indicators = _calculate_ma_indicators(df)
-                if ma_indicators is None:
-                    continue
-                
+    # ========== 均线系统 ==========
+    quality = _validate_data_quality(df, min_length=60)
+    if not quality['valid']:
+        logger.warning(f"[市场趋势] 指数 {idx_code} 数据质量不足: {quality['issues']}")
+    else:
+        try:
+            # 计算增强均线指标
+            ma_indicators = _calculate_ma_indicators(df)
+            if ma_indicators is not None:
                 ma5 = ma_indicators['ma5']['value']
                 ma20 = ma_indicators['ma20']['value']
                 ma60 = ma_indicators['ma60']['value']
@@ -361,8 +358,7 @@ def judge_market_trend_comprehensive(
                 final_score = ma_score + slope_bonus + cross_bonus
                 final_score = max(-1.0, min(1.0, final_score))  # 限制在-1到1
                 
-                index_ma_scores.append(final_score)
-                index_ma_details[idx_code] = {
+                factors['ma'] = {
                     'score': final_score,
                     'ma5': ma5,
                     'ma20': ma20,
@@ -373,9 +369,83 @@ def judge_market_trend_comprehensive(
                     'cross_signals': len(ma_indicators.get('cross_signals', [])),
                     'quality_score': quality['quality_score']
                 }
-            except Exception as e:
-                logger.warning(f"[市场趋势] 处理指数 {idx_code} 失败: {e}")
-                continue
+        except Exception as e:
+            logger.warning(f"[市场趋势] 处理指数 {idx_code} 失败: {e}")
+    
+    if not _validate_data_quality(df, min_length=120)['valid']:
+        return factors
+    factors['long_history'] = True
+    
+    # ========== 多周期涨跌幅 ==========
+    multi_returns = _calculate_multi_period_returns(df)
+    if multi_returns:
+        # 多周期综合得分（加权：短期权重更高）
+        period_weights = {'pct_5d': 0.4, 'pct_20d': 0.3, 'pct_60d': 0.2, 'pct_120d': 0.1}
+        weighted_return_score = 0.0
+        total_weight = 0.0
+        
+        for period_key, weight in period_weights.items():
+            if period_key in multi_returns:
+                pct = multi_returns[period_key]
+                # 归一化得分
+                if period_key == 'pct_5d':
+                    period_score = max(-1.0, min(1.0, pct / 3))  # 5日涨3%为满分
+                elif period_key == 'pct_20d':
+                    period_score = max(-1.0, min(1.0, pct / 5))  # 20日涨5%为满分
+                elif period_key == 'pct_60d':
+                    period_score = max(-1.0, min(1.0, pct / 10))  # 60日涨10%为满分
+                else:  # pct_120d
+                    period_score = max(-1.0, min(1.0, pct / 15))  # 120日涨15%为满分
+                
+                weighted_return_score += period_score * weight
+                total_weight += weight
+        
+        if total_weight > 0:
+            final_return_score = weighted_return_score / total_weight
+        else:
+            final_return_score = 0.0
+        
+        factors['index_return'] = {
+            'score': final_return_score,
+            'returns': multi_returns,
+            'consistency': 'high' if all(r > 0 for r in multi_returns.values()) or 
+                           all(r < 0 for r in multi_returns.values()) else 'low'
+        }
+    
+    # ========== 成交量+价格方向 ==========
+    try:
+        factors['volume'] = _calculate_volume_factor(df)
+    except Exception as e:
+        logger.warning(f"[市场趋势] 指数 {idx_code} 量价因子计算失败: {e}")
+    return factors
+
+
+def _compose_market_trend(
+    index_factors: Dict[str, Dict[str, Any]],
+    index_codes: List[str],
+    fear_greed_index: float,
+    long_term_fear_greed_index: float
+) -> Dict[str, Any]:
+    """
+    由各指数因子与恐贪指数合成市场趋势判断
+    
+    结合多个维度：
+    1. 多指数均线系统（权重35%）
+    2. 恐贪指数（权重30%）
+    3. 多周期涨跌幅（权重20%）
+    4. 成交量+价格方向（权重15%）
+    """
+    factors = {}
+    scores = []
+    
+    try:
+        # ========== 1. 多指数均线系统（权重35%） ==========
+        index_ma_details = {
+            idx_code: index_factors[idx_code]['ma']
+            for idx_code in index_codes
+            if idx_code in index_factors and index_factors[idx_code]['ma'] is not None
+        }
+        index_ma_scores = [detail['score'] for detail in index_ma_details.values()]
         
         if index_ma_scores:
             # 多指数平均得分（可考虑加权，这里简单平均）
@@ -423,95 +493,26 @@ def judge_market_trend_comprehensive(
         scores.append(fg_score * 0.3)
         
         # ========== 3. 多周期涨跌幅（权重20%） ==========
-        # 使用主要指数（上证）计算多周期涨跌幅
-        main_df = None
+        # 使用第一个数据足够长的指数（默认上证）作为主要指数
+        main_factors = None
         for idx_code in index_codes:
-            try:
-                df = get_history_func(idx_code)
-                if _validate_data_quality(df, min_length=120)['valid']:
-                    main_df = df
-                    break
-            except:
-                continue
+            if idx_code in index_factors and index_factors[idx_code]['long_history']:
+                main_factors = index_factors[idx_code]
+                break
         
-        if main_df is not None:
-            multi_returns = _calculate_multi_period_returns(main_df)
-            
-            if multi_returns:
-                # 多周期综合得分（加权：短期权重更高）
-                period_weights = {'pct_5d': 0.4, 'pct_20d': 0.3, 'pct_60d': 0.2, 'pct_120d': 0.1}
-                weighted_return_score = 0.0
-                total_weight = 0.0
-                
-                for period_key, weight in period_weights.items():
-                    if period_key in multi_returns:
-                        pct = multi_returns[period_key]
-                        # 归一化得分
-                        if period_key == 'pct_5d':
-                            period_score = max(-1.0, min(1.0, pct / 3))  # 5日涨3%为满分
-                        elif period_key == 'pct_20d':
-                            period_score = max(-1.0, min(1.0, pct / 5))  # 20日涨5%为满分
-                        elif period_key == 'pct_60d':
-                            period_score = max(-1.0, min(1.0, pct / 10))  # 60日涨10%为满分
-                        else:  # pct_120d
-                            period_score = max(-1.0, min(1.0, pct / 15))  # 120日涨15%为满分
-                        
-                        weighted_return_score += period_score * weight
-                        total_weight += weight
-                
-                if total_weight > 0:
-                    final_return_score = weighted_return_score / total_weight
-                else:
-                    final_return_score = 0.0
-                
-                factors['index_return'] = {
-                    'score': final_return_score,
-                    'returns': multi_returns,
-                    'consistency': 'high' if all(r > 0 for r in multi_returns.values()) or 
-                                   all(r < 0 for r in multi_returns.values()) else 'low'
-                }
-                scores.append(final_return_score * 0.2)
+        if main_factors is not None:
+            if main_factors['index_return'] is not None:
+                factors['index_return'] = main_factors['index_return']
+                scores.append(main_factors['index_return']['score'] * 0.2)
             else:
                 factors['index_return'] = {'score': 0.0, 'error': '无法计算多周期涨跌幅'}
         else:
             factors['index_return'] = {'score': 0.0, 'error': '主要指数数据不足'}
         
         # ========== 4. 成交量+价格方向（权重15%）- 优化版 ==========
-        if main_df is not None and len(main_df) >= 20:
-            # 成交量比率
-            vol_ratio = main_df['volume'].iloc[-5:].mean() / main_df['volume'].iloc[-20:-5].mean()
-            
-            # 价格变化方向（最近5日）
-            price_change_5d = (main_df['close'].iloc[-1] / main_df['close'].iloc[-5] - 1) * 100
-            
-            # 结合成交量和价格方向
-            if vol_ratio > 1.2:  # 放量
-                if price_change_5d > 2:  # 放量上涨
-                    vol_score = 0.8  # 强烈牛市信号
-                elif price_change_5d < -2:  # 放量下跌
-                    vol_score = -0.8  # 强烈熊市信号
-                else:  # 放量但价格变化不大
-                    vol_score = 0.2 if price_change_5d > 0 else -0.2
-            elif vol_ratio < 0.8:  # 缩量
-                if price_change_5d > 1:  # 缩量上涨（可能反弹乏力）
-                    vol_score = 0.1
-                elif price_change_5d < -1:  # 缩量下跌（可能继续下跌）
-                    vol_score = -0.5
-                else:  # 缩量震荡
-                    vol_score = -0.2
-            else:  # 正常量
-                vol_score = 0.1 if price_change_5d > 0 else -0.1
-            
-            factors['volume'] = {
-                'score': vol_score,
-                'volume_ratio': float(vol_ratio),
-                'price_change_5d': float(price_change_5d),
-                'signal': '放量上涨' if vol_ratio > 1.2 and price_change_5d > 2 else
-                         '放量下跌' if vol_ratio > 1.2 and price_change_5d < -2 else
-                         '缩量上涨' if vol_ratio < 0.8 and price_change_5d > 1 else
-                         '缩量下跌' if vol_ratio < 0.8 and price_change_5d < -1 else '正常'
-            }
-            scores.append(vol_score * 0.15)
+        if main_factors is not None and main_factors['volume'] is not None:
+            factors['volume'] = main_factors['volume']
+            scores.append(main_factors['volume']['score'] * 0.15)
         else:
             factors['volume'] = {'score': 0.0, 'error': '数据不足'}
         
@@ -558,6 +559,158 @@ def judge_market_trend_comprehensive(
             'error': str(e)
         }
 
+
+DEFAULT_INDEX_CODES = ['000001.SH', '399001.SZ', '399006.SZ', '000905.SH']  # 上证、深证、创业板、中证500
+
+
+def judge_market_trend_comprehensive(
+    get_history_func,
+    position_analyzer: PositionAnalyzer,
+    fear_greed_index: float,
+    long_term_fear_greed_index: float,
+    index_codes: Optional[List[str]] = None  # 多指数列表
+) -> Dict[str, Any]:
+    """
+    综合判断市场趋势（牛市/熊市/震荡市）- 增强版
+    
+    优化点：
+    1. 多指数综合判断（上证、深证、创业板、中证500）
+    2. 成交量结合价格方向（放量上涨/下跌）
+    3. 数据质量验证
+    4. 均线系统增强（斜率、距离、交叉信号）
+    5. 多时间窗口（5日、20日、60日、120日）
+    6. 恐贪指数优化（加权平均、背离检测）
+    
+    结合多个维度：
+    1. 多指数均线系统（权重35%）
+    2. 恐贪指数（权重30%）
+    3. 多周期涨跌幅（权重20%）
+    4. 成交量+价格方向（权重15%）
+    
+    每次调用都会重新获取指数行情并全量计算；交易循环中请使用 MarketRegimeService。
+    
+    Args:
+        get_history_func: 获取历史数据的函数
+        position_analyzer: 持仓分析器
+        fear_greed_index: 当日恐贪指数
+        long_term_fear_greed_index: 长期恐贪指数
+        index_codes: 指数代码列表，默认['000001.SH', '399001.SZ', '399006.SZ', '000905.SH']
+                    (上证、深证、创业板、中证500)
+    
+    Returns:
+        {
+            'trend': 'bull'/'bear'/'neutral',  # 市场趋势
+            'confidence': 0.0-1.0,  # 置信度
+            'score': -1.0到1.0,  # 综合得分（正数偏向牛市，负数偏向熊市）
+            'factors': {...}  # 各因素得分详情
+        }
+    """
+    if index_codes is None:
+        index_codes = DEFAULT_INDEX_CODES
+    
+    index_factors = {}
+    for idx_code in index_codes:
+        try:
+            index_factors[idx_code] = _calculate_index_factors(idx_code, get_history_func(idx_code))
+        except Exception as e:
+            logger.warning(f"[市场趋势] 处理指数 {idx_code} 失败: {e}")
+    return _compose_market_trend(index_factors, index_codes, fear_greed_index, long_term_fear_greed_index)
+
+
+class MarketRegimeService:
+    """
+    市场状态服务（交易循环使用）
+    - 指数行情常驻内存，按refresh_interval刷新
+    - 各指数因子按(指数, 最后一根K线日期, K线数量)缓存，只有新K线到来才重算
+    - 每次judge只做恐贪指数与缓存因子的合成
+    """
+    
+    def __init__(self, get_history_func, index_codes: Optional[List[str]] = None, refresh_interval: int = 300):
+        """
+        Args:
+            get_history_func: 获取历史数据的函数
+            index_codes: 指数代码列表，默认上证、深证、创业板、中证500
+            refresh_interval: 指数行情刷新间隔（秒）
+        """
+        self.get_history_func = get_history_func
+        self.index_codes = list(index_codes or DEFAULT_INDEX_CODES)
+        self.refresh_interval = refresh_interval
+        self.index_series: Dict[str, Any] = {}  # idx_code -> DataFrame
+        self._factor_cache: Dict[str, tuple] = {}  # idx_code -> (bar_key, factors)
+        self._last_refresh: Optional[float] = None
+    
+    @staticmethod
+    def _bar_key(df):
+        if df is None or len(df) == 0:
+            return None
+        last = df['trade_date'].iloc[-1] if 'trade_date' in df.columns else df.index[-1]
+        return (str(last), len(df))
+    
+    def refresh(self, force: bool = False):
+        """刷新指数行情，只对最后一根K线发生变化的指数重算因子"""
+        now = _time.time()
+        if not force and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+        for idx_code in self.index_codes:
+            try:
+                df = self.get_history_func(idx_code)
+            except Exception as e:
+                logger.warning(f"[市场趋势] 获取指数 {idx_code} 行情失败: {e}")
+                continue
+            bar_key = self._bar_key(df)
+            cached = self._factor_cache.get(idx_code)
+            if cached is not None and bar_key is not None and cached[0] == bar_key:
+                continue
+            self.index_series[idx_code] = df
+            try:
+                self._factor_cache[idx_code] = (bar_key, _calculate_index_factors(idx_code, df))
+            except Exception as e:
+                logger.warning(f"[市场趋势] 处理指数 {idx_code} 失败: {e}")
+    
+    def get_index_factors(self) -> Dict[str, Dict[str, Any]]:
+        self.refresh()
+        return {idx_code: cached[1] for idx_code, cached in self._factor_cache.items()}
+    
+    def judge(self, fear_greed_index: float, long_term_fear_greed_index: float) -> Dict[str, Any]:
+        """综合判断市场趋势，返回格式同judge_market_trend_comprehensive"""
+        return _compose_market_trend(
+            self.get_index_factors(), self.index_codes, fear_greed_index, long_term_fear_greed_index
+        )
+
+
+async def evaluate_symbols_concurrently(
+    symbols: List[str],
+    evaluate_func,
+    max_concurrency: int = 8
+) -> Dict[str, Any]:
+    """
+    并发评估多只股票（取历史行情、计算指标、取最新价等阻塞操作）
+    
+    evaluate_func(symbol) 放到线程池执行，信号量限制同时运行的数量，
+    避免阻塞与Tornado共用的事件循环。单只股票评估异常时结果为None。
+    
+    Args:
+        symbols: 股票代码列表
+        evaluate_func: 同步评估函数，参数为股票代码
+        max_concurrency: 最大并发数
+    
+    Returns:
+        {symbol: 评估结果}，顺序与symbols一致
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run_one(symbol):
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(evaluate_func, symbol)
+            except Exception as e:
+                logger.error(f"[并发评估] {symbol}: 评估失败: {e}", exc_info=True)
+                return None
+    
+    results = await asyncio.gather(*(run_one(symbol) for symbol in symbols))
+    return dict(zip(symbols, results))
+
 # 添加多策略自动交易函数
 async def monitor_positions_and_trade_multi_strategy(
     stock_selector: StockSelector,
@@ -569,7 +722,8 @@ async def monitor_positions_and_trade_multi_strategy(
     get_latest_price_func,
     order_manager,
     interval: int = 60,
-    max_stocks: int = 15
+    max_stocks: int = 15,
+    max_concurrency: int = 8
 ):
     """
     多策略持仓监控+自动买卖任务。
@@ -586,8 +740,10 @@ async def monitor_positions_and_trade_multi_strategy(
         order_manager: 订单管理器
         interval: 监控间隔（秒）
         max_stocks: 最大持股数量（默认15只，根据恐贪指数动态调整）
+        max_concurrency: 逐股评估（历史行情+技术指标+最新价）的最大并发数
     """
     from modules.strategy_manager.manager import StrategyManager
+    from utils.indicator_calculator import get_indicator_calculator
     from modules.strategy_manager.config import STRATEGY_CONFIG
     
     # 初始化策略管理器
@@ -733,6 +889,19 @@ async def monitor_positions_and_trade_multi_strategy(
     # 启动所有策略
     strategy_manager.start_all_strategies()
     
+    # 市场状态服务：上证、深证、创业板、中证500，指数行情每5分钟刷新一次
+    market_regime = MarketRegimeService(get_history_func, index_codes=DEFAULT_INDEX_CODES, refresh_interval=300)
+    
+    # 账户快照：每轮循环同步一次，下单后本地更新，回调推送时校准
+    account_snapshot = get_account_snapshot(getattr(account, 'account_id', ''))
+    
+    async def submit_order(code, side, price, quantity):
+        """下单并同步更新本轮账户快照"""
+        order = await order_manager(code, side, price, quantity, account)
+        if order:
+            account_snapshot.apply_order(code, side, price, quantity)
+        return order
+    
     last_status = None
     while True:
         trading = is_trading_time()
@@ -745,8 +914,8 @@ async def monitor_positions_and_trade_multi_strategy(
         
         last_status = 'trading'
         try:
-            # 获取最新持仓分析
-            positions = xt_trader.query_stock_positions(account)
+            # 同步账户快照（资金+持仓），本轮后续计算都基于该快照
+            positions = account_snapshot.sync(xt_trader, account)
             # 过滤有效持仓：必须有stock_code和volume属性，且持仓数量大于0（剔除已卖出的股票）
             valid_positions = [
                 p for p in positions 
@@ -755,6 +924,11 @@ async def monitor_positions_and_trade_multi_strategy(
                 and p.volume > 0  # 剔除已卖出的股票（volume为0）
             ]
             
+            # 持仓加入行情缓存关注列表，一次get_full_tick批量刷新所有持仓最新价
+            quote_cache = get_quote_cache()
+            quote_cache.watch([p.stock_code for p in valid_positions])
+            quote_cache.refresh()
+            
             # 持仓分析
             analysis = position_analyzer.analyze_positions([
                 {
@@ -772,13 +946,9 @@ async def monitor_positions_and_trade_multi_strategy(
             long_term_fear_greed_index = getattr(summary, 'long_term_fear_greed_index', 50)
             print(f"[恐贪指数] 当日: {fear_greed_index:.1f}，长期: {long_term_fear_greed_index:.1f}")
             
-            # 综合判断市场趋势（牛市/熊市/震荡市）- 使用多指数综合判断
-            market_trend = judge_market_trend_comprehensive(
-                get_history_func=get_history_func,
-                position_analyzer=position_analyzer,
-                fear_greed_index=fear_greed_index,
-                long_term_fear_greed_index=long_term_fear_greed_index,
-                index_codes=['000001.SH', '399001.SZ', '399006.SZ', '000905.SH']  # 上证、深证、创业板、中证500
+            # 综合判断市场趋势（牛市/熊市/震荡市）- 多指数因子按K线缓存，只在刷新间隔到期时取行情
+            market_trend = await asyncio.to_thread(
+                market_regime.judge, fear_greed_index, long_term_fear_greed_index
             )
             
             logger.info(f"[市场趋势] {market_trend['trend']} ({market_trend['description']})，"
@@ -880,6 +1050,25 @@ async def monitor_positions_and_trade_multi_strategy(
             
             logger.info(f"[资金管理] 当前持股数量={current_stock_count}只，最大持股数量={adjusted_max_stocks}只")
             
+            # 候选股票最新价批量预取
+            if selected:
+                quote_cache.refresh([stock['symbol']['ts_code'] for stock in selected])
+            
+            # 并发评估候选股票，下单仍按选股顺序串行执行
+            def evaluate_buy_candidate(code):
+                df = get_history_func(code)
+                return {
+                    'indicators': technical_analyzer.calculate_indicators(df),
+                    'current_price': get_latest_price_func(code)
+                }
+            
+            candidate_codes = []
+            if current_stock_count < adjusted_max_stocks:
+                candidate_codes = list(dict.fromkeys(
+                    stock['symbol']['ts_code'] for stock in selected if stock['symbol']['ts_code'] not in held
+                ))
+            buy_evaluations = await evaluate_symbols_concurrently(candidate_codes, evaluate_buy_candidate, max_concurrency)
+            
             # 多策略买入逻辑
             for stock in selected:
                 symbol = stock['symbol']
@@ -889,15 +1078,22 @@ async def monitor_positions_and_trade_multi_strategy(
                         logger.warning(f"[多策略买入] 已达到最大持股数量限制({adjusted_max_stocks}只)，跳过买入 {symbol.get('ts_code', symbol.get('symbol', 'unknown'))}")
                         print(f"[多策略买入] 已达到最大持股数量限制({adjusted_max_stocks}只)，当前持仓{current_stock_count}只，跳过买入 {symbol.get('ts_code', symbol.get('symbol', 'unknown'))}")
                         continue
-                    df = get_history_func(symbol["ts_code"])
-                    indicators = technical_analyzer.calculate_indicators(df)
-                    current_price = get_latest_price_func(symbol["ts_code"])
+                    evaluation = buy_evaluations.get(symbol["ts_code"])
+                    if evaluation is None:
+                        logger.warning(f"[多策略买入] {symbol['ts_code']}: 评估失败，跳过买入")
+                        continue
+                    indicators = evaluation['indicators']
+                    current_price = evaluation['current_price']
+                    if current_price is None or current_price <= 0:
+                        logger.warning(f"[多策略买入] {symbol['ts_code']}: 无法获取当前价格，跳过买入")
+                        continue
                     # 计算合理的买入股数（考虑账户资金、价格、风险控制）
                     min_amount = get_min_buy_amount(
                         symbol=symbol["ts_code"],
                         account=account,
                         xt_trader=xt_trader,
                         current_price=current_price,
+                        account_snapshot=account_snapshot,
                         max_position_ratio=0.1,  # 单只股票最大10%仓位（风险分散原则）
                         min_position_value=10000.0,  # 最小持仓10000元（控制交易成本占比<1%）
                         max_position_value=800000.0  # 最大持仓800000元（单只股票风险上限）
@@ -907,26 +1103,26 @@ async def monitor_positions_and_trade_multi_strategy(
                     buy_executed = False
                     if fear_greed_index < 10:
                         print(f"[多策略买入] 极端恐慌({fear_greed_index:.1f})，仅允许极小仓位买入 {symbol}")
-                        await order_manager(symbol["ts_code"], "买", current_price, min_amount, account)
+                        await submit_order(symbol["ts_code"], "买", current_price, min_amount)
                         buy_executed = True
                     elif 10 <= fear_greed_index < 20:
                         print(f"[多策略买入] 恐慌区间({fear_greed_index:.1f})，小仓位买入 {symbol}")
-                        await order_manager(symbol["ts_code"], "买", current_price, min_amount, account)
+                        await submit_order(symbol["ts_code"], "买", current_price, min_amount)
                         buy_executed = True
                     elif fear_greed_index > 90 or long_term_fear_greed_index > 90:
                         print(f"[多策略买入] 极端贪婪({fear_greed_index:.1f})，禁止买入 {symbol}")
                         continue
                     elif 80 < fear_greed_index <= 90 or 80 < long_term_fear_greed_index <= 90:
                         print(f"[多策略买入] 贪婪区间({fear_greed_index:.1f})，小仓位买入 {symbol}")
-                        await order_manager(symbol["ts_code"], "买", current_price, min_amount, account)
+                        await submit_order(symbol["ts_code"], "买", current_price, min_amount)
                         buy_executed = True
                     elif fear_greed_index < 30 and long_term_fear_greed_index < 40:
                         print(f"[多策略买入] 市场恐慌，加大买入 {symbol}")
-                        await order_manager(symbol["ts_code"], "买", current_price, min_amount*2, account)
+                        await submit_order(symbol["ts_code"], "买", current_price, min_amount*2)
                         buy_executed = True
                     elif technical_analyzer.is_buy_signal(indicators):
                         print(f"[多策略买入] 正常买入 {symbol}")
-                        await order_manager(symbol["ts_code"], "买", current_price, min_amount, account)
+                        await submit_order(symbol["ts_code"], "买", current_price, min_amount)
                         buy_executed = True
                     
                     # 如果执行了买入，更新当前持股数量
@@ -940,23 +1136,65 @@ async def monitor_positions_and_trade_multi_strategy(
             
             # 多策略卖出逻辑：综合考虑止损止盈、技术指标、市场情绪等因素
             logger.info(f"开始检查持仓卖出信号，持仓数量: {len(valid_positions)}")
+            
+            # 并发评估持仓（历史行情、技术指标、最新价），卖出决策与下单在后面按持仓顺序串行执行
+            def evaluate_position(code):
+                df = get_history_func(code)
+                if df is None or len(df) < 20:
+                    return {'error': '历史数据不足，无法计算技术指标'}
+                indicators = technical_analyzer.calculate_indicators(df)
+                if not indicators:
+                    return {'error': '无法计算技术指标'}
+                result = {
+                    'df': df,
+                    'indicators': indicators,
+                    'current_price': get_latest_price_func(code),
+                    'rsi': None, 'macd': None, 'macd_signal': None, 'macd_hist': None,
+                    'prev_macd': None, 'prev_signal': None
+                }
+                # 使用共享的 IndicatorCalculator 一次计算RSI、MACD（共享中间结果，相同行情命中缓存）
+                indicator_calc = get_indicator_calculator()
+                try:
+                    values = indicator_calc.calculate_many(df, ['RSI', 'MACD'])
+                    result['rsi'] = values['RSI']
+                    macd_result = values['MACD']
+                    if isinstance(macd_result, dict):
+                        result['macd'] = macd_result['macd']
+                        result['macd_signal'] = macd_result['signal']
+                        result['macd_hist'] = macd_result['histogram']
+                except Exception as e:
+                    logger.debug(f"{code}: 计算技术指标失败: {e}，使用基础指标")
+                    result.update(rsi=None, macd=None, macd_signal=None, macd_hist=None)
+                    return result
+                # 前一周期MACD，用于判断是否刚发生死叉
+                if result['macd'] is not None and result['macd_signal'] is not None:
+                    try:
+                        prev = indicator_calc.calculate_many(df.iloc[:-1], ['MACD_DIF', 'MACD_DEA'])
+                        result['prev_macd'] = prev['MACD_DIF']
+                        result['prev_signal'] = prev['MACD_DEA']
+                    except:
+                        pass
+                return result
+            
+            sell_evaluations = await evaluate_symbols_concurrently(
+                [p.stock_code for p in valid_positions], evaluate_position, max_concurrency
+            )
+            
             for p in valid_positions:
                 symbol = p.stock_code
                 try:
-                    # 获取历史数据
-                    df = get_history_func(symbol)
-                    if df is None or len(df) < 20:
-                        logger.warning(f"{symbol}: 历史数据不足，无法计算技术指标，跳过卖出检查")
+                    evaluation = sell_evaluations.get(symbol)
+                    if evaluation is None:
+                        logger.warning(f"{symbol}: 评估失败，跳过卖出检查")
                         continue
-                    
-                    # 计算技术指标
-                    indicators = technical_analyzer.calculate_indicators(df)
-                    if not indicators:
-                        logger.warning(f"{symbol}: 无法计算技术指标，跳过卖出检查")
+                    if evaluation.get('error'):
+                        logger.warning(f"{symbol}: {evaluation['error']}，跳过卖出检查")
                         continue
+                    df = evaluation['df']
+                    indicators = evaluation['indicators']
                     
                     # 获取当前价格和持仓信息
-                    current_price = get_latest_price_func(symbol)
+                    current_price = evaluation['current_price']
                     if current_price is None or current_price <= 0:
                         logger.warning(f"{symbol}: 无法获取当前价格，跳过卖出检查")
                         continue
@@ -980,23 +1218,10 @@ async def monitor_positions_and_trade_multi_strategy(
                     # 计算盈亏比例
                     pnl_pct = ((current_price - avg_price) / avg_price * 100) if avg_price > 0 else 0
                     
-                    # 使用 IndicatorCalculator 计算更多技术指标
-                    from utils.indicator_calculator import IndicatorCalculator
-                    indicator_calc = IndicatorCalculator()
-                    
-                    # 计算RSI、MACD等指标
-                    try:
-                        rsi = indicator_calc.calculate(df, 'RSI')
-                        macd_result = indicator_calc.calculate(df, 'MACD')
-                        macd = macd_result['macd'] if isinstance(macd_result, dict) else None
-                        macd_signal = macd_result['signal'] if isinstance(macd_result, dict) else None
-                        macd_hist = macd_result['histogram'] if isinstance(macd_result, dict) else None
-                    except Exception as e:
-                        logger.debug(f"{symbol}: 计算技术指标失败: {e}，使用基础指标")
-                        rsi = None
-                        macd = None
-                        macd_signal = None
-                        macd_hist = None
+                    rsi = evaluation['rsi']
+                    macd = evaluation['macd']
+                    macd_signal = evaluation['macd_signal']
+                    macd_hist = evaluation['macd_hist']
                     
                     # 获取均线指标
                     ma5 = indicators.get('ma5')
@@ -1043,15 +1268,12 @@ async def monitor_positions_and_trade_multi_strategy(
                     # 6. MACD死叉：MACD下穿信号线
                     if macd is not None and macd_signal is not None:
                         # 检查是否刚发生死叉
-                        try:
-                            prev_macd = indicator_calc.calculate(df.iloc[:-1], 'MACD_DIF')
-                            prev_signal = indicator_calc.calculate(df.iloc[:-1], 'MACD_DEA')
-                            if isinstance(prev_macd, (int, float)) and isinstance(prev_signal, (int, float)):
-                                if macd < macd_signal and prev_macd >= prev_signal:
-                                    sell_signals.append(True)
-                                    sell_reasons.append("MACD死叉")
-                        except:
-                            pass
+                        prev_macd = evaluation['prev_macd']
+                        prev_signal = evaluation['prev_signal']
+                        if isinstance(prev_macd, (int, float)) and isinstance(prev_signal, (int, float)):
+                            if macd < macd_signal and prev_macd >= prev_signal:
+                                sell_signals.append(True)
+                                sell_reasons.append("MACD死叉")
                     
                     # 7. MACD柱状图转负且持续扩大
                     if macd_hist is not None and macd_hist < 0:
@@ -1099,7 +1321,7 @@ async def monitor_positions_and_trade_multi_strategy(
                         # 执行卖出：只卖出可用持仓（已考虑T+1规则）
                         # 注意：available_volume 已经由券商计算，排除了当日买入的股票
                         if available_volume > 0:
-                            await order_manager(symbol, "卖", current_price, available_volume, account)
+                            await submit_order(symbol, "卖", current_price, available_volume)
                             logger.info(f"[多策略卖出] {symbol}: 已提交卖出订单，数量={available_volume}股（总持仓{total_volume}股），价格={current_price:.2f}")
                         else:
                             logger.warning(f"[多策略卖出] {symbol}: 无可用持仓（T+1限制），无法卖出")
@@ -1160,7 +1382,8 @@ async def monitor_positions_and_trade(
             continue
         last_status = 'trading'
         try:
-            positions = xt_trader.query_stock_positions(account)
+            account_snapshot = get_account_snapshot(getattr(account, 'account_id', ''))
+            positions = account_snapshot.sync(xt_trader, account)
             valid_positions = [p for p in positions if hasattr(p, 'stock_code') and hasattr(p, 'volume')]
             held = {p.stock_code for p in valid_positions}
             # 获取持仓分析，提取恐贪指数
@@ -1184,6 +1407,9 @@ async def monitor_positions_and_trade(
                 df = get_history_func(symbol)
                 indicators = technical_analyzer.calculate_indicators(df)
                 current_price = get_latest_price_func(symbol)
+                if current_price is None:
+                    print(f"无法获取{symbol}最新价，跳过卖出检查")
+                    continue
                 # 极端恐慌下禁止卖出
                 if fear_greed_index < 10:
                     print(f"[卖出决策] 极端恐慌({fear_greed_index:.1f})，禁止卖出 {symbol}，建议耐心等待情绪修复。")
@@ -1228,12 +1454,16 @@ async def monitor_positions_and_trade(
                     df = get_history_func(symbol)
                     indicators = technical_analyzer.calculate_indicators(df)
                     current_price = get_latest_price_func(symbol)
+                    if current_price is None:
+                        print(f"无法获取{symbol}最新价，跳过下单")
+                        continue
                     # 计算合理的买入股数（考虑账户资金、价格、风险控制）
                     min_amount = get_min_buy_amount(
                         symbol=symbol,
                         account=account,
                         xt_trader=xt_trader,
                         current_price=current_price,
+                        account_snapshot=account_snapshot,
                         max_position_ratio=0.1,  # 单只股票最大10%仓位（风险分散原则）
                         min_position_value=10000.0,  # 最小持仓10000元（控制交易成本占比<1%）
                         max_position_value=800000.0  # 最大持仓80000元（单只股票风险上限）
@@ -1281,7 +1511,8 @@ def get_min_buy_amount(
     current_price: Optional[float] = None,
     max_position_ratio: float = 0.1,
     min_position_value: float = 10000.0,
-    max_position_value: float = 80000.0
+    max_position_value: float = 80000.0,
+    account_snapshot: Optional[AccountSnapshot] = None
 ) -> int:
     """
     计算合理的买入股数（基于量化交易最佳实践）
@@ -1309,6 +1540,7 @@ def get_min_buy_amount(
         max_position_ratio: 单只股票最大仓位比例（默认0.1，即10%，风险分散原则）
         min_position_value: 最小持仓金额（默认10000元，控制交易成本占比<1%）
         max_position_value: 最大持仓金额（默认80000元，单只股票风险上限）
+        account_snapshot: 本轮账户快照（可选，提供时直接使用快照中的可用资金，不再查询券商）
         
     Returns:
         int: 建议买入股数（已调整为最小买入单位的整数倍）
@@ -1338,14 +1570,17 @@ def get_min_buy_amount(
         return min_unit
     
     # 如果没有提供账户信息，返回最小买入单位
-    if account is None or xt_trader is None:
+    if account_snapshot is None and (account is None or xt_trader is None):
         logger.debug(f"{symbol}: 未提供账户信息，返回最小买入单位 {min_unit}")
         return min_unit
     
     try:
-        # 2. 查询账户可用资金
-        asset = xt_trader.query_stock_asset(account)
-        available_cash = getattr(asset, 'cash', 0) or getattr(asset, 'available_cash', 0)
+        # 2. 账户可用资金（优先使用本轮快照）
+        if account_snapshot is not None:
+            available_cash = account_snapshot.cash
+        else:
+            asset = xt_trader.query_stock_asset(account)
+            available_cash = getattr(asset, 'cash', 0) or getattr(asset, 'available_cash', 0)
         
         if available_cash <= 0:
             logger.warning(f"{symbol}: 账户可用资金为0或无法获取，返回最小买入单位 {min_unit}")
@@ -1400,5 +1635,5 @@ def get_min_buy_amount(
         logger.error(f"{symbol}: 计算买入股数失败: {e}，返回最小买入单位 {min_unit}", exc_info=True)
         return min_unit
 def get_latest_price_func(symbol, xt_trader=None):
-    from main import get_latest_price_func as main_get_latest_price_func
-    return main_get_latest_price_func(symbol)
+    """交易用最新价：刷新失败且缓存报价超过 ORDER_PRICE_MAX_AGE 秒时返回None，调用方跳过该股票"""
+    return get_quote_cache().get_price(symbol, max_age=ORDER_PRICE_MAX_AGE)
@@ -0,0 +1,143 @@
+import time
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class PositionSnapshot:
+    stock_code: str
+    volume: int
+    available_volume: int  # 可用持仓（已考虑T+1）
+    avg_price: float = 0.0
+
+
+def _available_volume(position) -> int:
+    """兼容XtPosition不同版本的可用数量字段"""
+    for attr in ('can_use_volume', 'enable_amount', 'm_nCanUseVolume'):
+        value = getattr(position, attr, None)
+        if value is not None:
+            return int(value)
+    return int(getattr(position, 'volume', 0) or 0)
+
+
+class AccountSnapshot:
+    """
+    账户快照：资金、持仓、可用数量
+    - 每轮交易循环调用一次sync()，只发起query_stock_asset和query_stock_positions两次查询
+    - 本轮下单后用apply_order()在本地扣减，保证同一轮内的仓位计算彼此一致
+    - on_stock_asset/on_stock_position回调推送时用on_asset()/on_position()校准
+    """
+
+    def __init__(self, account_id: str = ''):
+        self.account_id = account_id
+        self.cash = 0.0
+        self.total_asset = 0.0
+        self.positions: Dict[str, PositionSnapshot] = {}
+        self.raw_positions: List = []  # 最近一次查询返回的原始持仓对象
+        self.synced_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def sync(self, xt_trader, account) -> List:
+        """从券商查询资金和持仓，返回原始持仓列表"""
+        asset = xt_trader.query_stock_asset(account)
+        positions = xt_trader.query_stock_positions(account) or []
+        with self.lock:
+            if asset is not None:
+                self._set_asset(asset)
+            self.positions = {}
+            for p in positions:
+                if getattr(p, 'stock_code', None) and getattr(p, 'volume', 0) > 0:
+                    self._set_position(p)
+            self.raw_positions = positions
+            self.synced_at = time.time()
+        return positions
+
+    def ensure_fresh(self, xt_trader, account, max_age: float = 60.0):
+        """快照从未同步或超过max_age秒时重新同步"""
+        if self.synced_at is None or time.time() - self.synced_at > max_age:
+            self.sync(xt_trader, account)
+
+    def _set_asset(self, asset):
+        self.cash = float(getattr(asset, 'cash', 0) or getattr(asset, 'available_cash', 0) or 0)
+        self.total_asset = float(getattr(asset, 'total_asset', 0) or 0)
+
+    def _set_position(self, position):
+        volume = int(getattr(position, 'volume', 0) or 0)
+        if volume <= 0:
+            self.positions.pop(position.stock_code, None)
+            return
+        self.positions[position.stock_code] = PositionSnapshot(
+            stock_code=position.stock_code,
+            volume=volume,
+            available_volume=_available_volume(position),
+            avg_price=float(getattr(position, 'avg_price', 0.0) or 0.0)
+        )
+
+    def on_asset(self, asset):
+        """资金变动推送"""
+        with self.lock:
+            self._set_asset(asset)
+
+    def on_position(self, position):
+        """持仓变动推送"""
+        if not getattr(position, 'stock_code', None):
+            return
+        with self.lock:
+            self._set_position(position)
+
+    def apply_order(self, symbol: str, side: str, price: Optional[float], quantity: int,
+                    commission_rate: float = 0.0003):
+        """已提交订单在本地预先扣减资金/持仓，直到回调推送校准"""
+        if not quantity or quantity <= 0:
+            return
+        with self.lock:
+            amount = (price or 0.0) * quantity
+            pos = self.positions.get(symbol)
+            if side == "买":
+                self.cash -= amount * (1 + commission_rate)
+                if pos is None:
+                    # T+1：当日买入不增加可用数量
+                    self.positions[symbol] = PositionSnapshot(symbol, quantity, 0, price or 0.0)
+                else:
+                    total_cost = pos.avg_price * pos.volume + amount
+                    pos.volume += quantity
+                    pos.avg_price = total_cost / pos.volume if pos.volume > 0 else 0.0
+            elif side == "卖" and pos is not None:
+                sold = min(quantity, pos.available_volume)
+                pos.volume -= sold
+                pos.available_volume -= sold
+                # A股卖出资金当日可用
+                self.cash += (price or 0.0) * sold * (1 - commission_rate)
+                if pos.volume <= 0:
+                    self.positions.pop(symbol, None)
+
+    def get_position(self, symbol: str) -> Optional[PositionSnapshot]:
+        with self.lock:
+            return self.positions.get(symbol)
+
+    def get_volume(self, symbol: str) -> int:
+        pos = self.get_position(symbol)
+        return pos.volume if pos else 0
+
+    def get_available_volume(self, symbol: str) -> int:
+        pos = self.get_position(symbol)
+        return pos.available_volume if pos else 0
+
+    def held_symbols(self) -> List[str]:
+        with self.lock:
+            return list(self.positions.keys())
+
+
+# 按资金账号管理的全局快照
+_snapshots: Dict[str, AccountSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_account_snapshot(account_id: str = '') -> AccountSnapshot:
+    """获取资金账号对应的账户快照（不存在则创建）"""
+    account_id = str(account_id or '')
+    with _snapshots_lock:
+        if account_id not in _snapshots:
+            _snapshots[account_id] = AccountSnapshot(account_id)
+        return _snapshots[account_id]
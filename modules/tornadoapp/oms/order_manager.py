@@ -1,3 +1,4 @@
+import logging
 import threading
 from datetime import datetime
 from .order_model import Order
@@ -7,10 +8,17 @@ from modules.tornadoapp.risk.risk_manager import RiskManager
 from modules.tornadoapp.compliance.compliance_manager import ComplianceManager
 from modules.tornadoapp.audit.audit_logger import AuditLogger
 from xtquant import xtconstant
+from utils.quote_cache import get_quote_cache
 import asyncio
 
+logger = logging.getLogger(__name__)
+
+# 补齐缺失委托价时允许使用的最新价最大年龄（秒），更旧的报价视为无法获取而拒单
+ORDER_PRICE_MAX_AGE = 30.0
+
 class OrderManager:
-    def __init__(self, xt_trader, risk_manager=None, compliance_manager=None, audit_logger=None):
+    def __init__(self, xt_trader, risk_manager=None, compliance_manager=None, audit_logger=None, quote_cache=None,
+                 price_max_age=ORDER_PRICE_MAX_AGE):
         self.orders = {}  # order_id -> Order
         self.lock = threading.Lock()
         self.xt_trader = xt_trader
@@ -18,8 +26,19 @@ class OrderManager:
         self.risk_manager = risk_manager or RiskManager()
         self.compliance_manager = compliance_manager or ComplianceManager()
         self.audit_logger = audit_logger or AuditLogger()
+        self.quote_cache = quote_cache or get_quote_cache()
+        self.price_max_age = price_max_age
+        self.trade_listeners = []  # 成交回报监听者 listener(order, trade)
 
-    def create_order(self, symbol, side, price, quantity, account, user="system"):
+    def create_order(self, symbol, side, price, quantity, account, user="system", ext=None):
+        # 价格缺失时用共享行情缓存的最新价补齐，仍无法获取则拒单
+        if price is None or price <= 0:
+            price = self.quote_cache.get_price(symbol, max_age=self.price_max_age)
+            if price is None:
+                self.audit_logger.log(user, "order_rejected_price", {
+                    "symbol": symbol, "side": side, "quantity": quantity, "reason": "无法获取最新价"
+                })
+                return None
         risk_pass, risk_msg = self.risk_manager.check_order(symbol, price, quantity, account)
         if not risk_pass:
             self.audit_logger.log(user, "order_rejected_risk", {
@@ -33,7 +52,7 @@ class OrderManager:
             return None
         self.audit_logger.log(user, "order_create", order_info)
         order_id = self._generate_order_id()
-        order = Order(order_id, symbol, side, price, quantity, account=account)
+        order = Order(order_id, symbol, side, price, quantity, account=account, ext=dict(ext or {}))
         with self.lock:
             self.orders[order_id] = order
         self._send_order_to_broker(order)
@@ -78,6 +97,24 @@ class OrderManager:
                     "order_id": order_id, "status": status.name, "filled_quantity": filled_quantity, "avg_fill_price": avg_fill_price
                 })
 
+    def add_trade_listener(self, listener):
+        """注册成交回报监听者，每笔成交（含部分成交）调用一次 listener(order, trade)"""
+        self.trade_listeners.append(listener)
+
+    def on_trade(self, trade):
+        """成交回报：按委托备注（本地订单号）或券商订单号找到本地订单后通知监听者"""
+        with self.lock:
+            order = self.orders.get(getattr(trade, 'order_remark', None))
+            if order is None:
+                order = self.orders.get(self.broker_order_map.get(getattr(trade, 'order_id', None)))
+        if order is None:
+            return
+        for listener in list(self.trade_listeners):
+            try:
+                listener(order, trade)
+            except Exception as e:
+                logger.error(f"处理成交回报失败: {e}")
+
     def cancel_order(self, broker_order_id, user="system"):
         self.audit_logger.log(user, "order_cancel", {"broker_order_id": broker_order_id})
         self.xt_trader.cancel_order(broker_order_id)
@@ -0,0 +1,223 @@
+"""
+全市场涨跌宽度缓存
+每个交易日的全市场聚合（上涨/下跌家数、涨停/跌停家数、总成交额、股票数）只计算一次并落盘，
+交易循环中只重新计算当天一行；恐贪指数与长期恐贪指数都基于这张很小的日频表计算。
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from utils.tushare_limiter import pro_api
+from utils.trading_calendar import get_trading_calendar
+
+logger = logging.getLogger(__name__)
+
+# 单日全市场聚合，trade_date 以 int32(YYYYMMDD) 存储
+BREADTH_DTYPE = np.dtype([
+    ('trade_date', 'i4'),
+    ('up_count', 'i4'),
+    ('down_count', 'i4'),
+    ('limit_up_count', 'i4'),
+    ('limit_down_count', 'i4'),
+    ('total_count', 'i4'),
+    ('amount', 'f8'),
+])
+
+DEFAULT_BREADTH_PATH = os.path.join('data', 'market_breadth.npy')
+
+# 涨停/跌停判定阈值（%），与原恐贪指数算法一致
+LIMIT_PCT = 9.5
+
+
+def aggregate_breadth(daily: pd.DataFrame) -> np.ndarray:
+    """将 pro.daily 返回的全市场日线按 trade_date 聚合为 BREADTH_DTYPE 数组"""
+    if daily is None or daily.empty:
+        return np.empty(0, dtype=BREADTH_DTYPE)
+    pct = daily['pct_chg']
+    flags = pd.DataFrame({
+        'trade_date': daily['trade_date'].astype(int),
+        'up_count': pct > 0,
+        'down_count': pct < 0,
+        'limit_up_count': pct > LIMIT_PCT,
+        'limit_down_count': pct < -LIMIT_PCT,
+        'total_count': 1,
+        'amount': daily['amount'] if 'amount' in daily.columns else 0.0,
+    })
+    grouped = flags.groupby('trade_date', sort=True).sum()
+    arr = np.empty(len(grouped), dtype=BREADTH_DTYPE)
+    arr['trade_date'] = grouped.index.values
+    for name in BREADTH_DTYPE.names[1:]:
+        arr[name] = grouped[name].values
+    return arr
+
+
+def breadth_scores(rows: np.ndarray, hist_money) -> np.ndarray:
+    """
+    按原恐贪指数公式批量计算每一行的得分（0-100）
+
+    Args:
+        rows: BREADTH_DTYPE 数组
+        hist_money: 用于对比的日均成交额（标量或与rows等长的数组）
+    """
+    total = rows['total_count'].astype(float)
+    up_ratio = rows['up_count'] / total
+    # 归一化：假设极端情况下涨停/跌停最多占总数的10%
+    limit_ratio = (rows['limit_up_count'] - rows['limit_down_count']) / (total * 0.1)
+    limit_ratio = np.clip(limit_ratio, -1.0, 1.0)
+    money = rows['amount']
+    hist_money = np.broadcast_to(np.asarray(hist_money, dtype=float), money.shape)
+    valid = (money > 0) & (hist_money > 0)
+    money_ratio = np.where(valid, money / np.where(hist_money > 0, hist_money, 1.0), 1.0)
+    money_score = np.clip((money_ratio - 1.0) * 2, -1.0, 1.0)
+    # 基础分50，涨跌家数影响±30，涨停跌停影响±10，成交额影响±10
+    idx = 50 + 30 * (up_ratio - 0.5) + 10 * limit_ratio + 10 * money_score
+    return np.clip(idx, 0, 100)
+
+
+class MarketBreadthCache:
+    """全市场日频宽度表：历史交易日只下载聚合一次，当天一行按间隔重算"""
+
+    def __init__(self, tushare_token: str, path: str = DEFAULT_BREADTH_PATH,
+                 max_rows: int = 250, today_refresh_interval: int = 60):
+        """
+        Args:
+            tushare_token: Tushare Token
+            path: 历史宽度表文件路径
+            max_rows: 本地最多保留的交易日数
+            today_refresh_interval: 当天数据两次重算的最小间隔（秒）
+        """
+        self.pro = pro_api(tushare_token)
+        self.path = path
+        self.max_rows = max_rows
+        self.today_refresh_interval = today_refresh_interval
+        self._history: Optional[np.ndarray] = None  # 已落盘的历史交易日（不含当天）
+        self._today: Optional[np.ndarray] = None  # 当天一行（不落盘）
+        self._today_checked_at = 0.0
+        self._today_key: Optional[str] = None
+        self._history_checked: Dict[int, str] = {}  # days -> 已核对交易日历的日期，同一天只核对一次
+        self._lock = threading.Lock()
+
+    def _load(self) -> np.ndarray:
+        if self._history is None:
+            if os.path.exists(self.path):
+                self._history = np.load(self.path)
+            else:
+                self._history = np.empty(0, dtype=BREADTH_DTYPE)
+        return self._history
+
+    def _save(self, arr: np.ndarray):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp.npy'
+        np.save(tmp_path, arr)
+        os.replace(tmp_path, self.path)
+
+    def _trade_dates(self, start_date: str, end_date: str) -> list:
+        return get_trading_calendar().trading_days_between(start_date, end_date)
+
+    def ensure_history(self, days: int, today_str: Optional[str] = None) -> np.ndarray:
+        """
+        保证本地至少有今天之前最近days个交易日的宽度数据，缺失的交易日逐日补齐
+
+        Returns:
+            今天之前的历史宽度数组（按日期升序）
+        """
+        today_str = today_str or datetime.now().strftime('%Y%m%d')
+        with self._lock:
+            history = self._load()
+            history = history[history['trade_date'] < int(today_str)]
+            if self._history_checked.get(days) == today_str:
+                return history
+            # 多取一些自然日防止节假日
+            start = (datetime.strptime(today_str, '%Y%m%d') - timedelta(days=days * 2 + 10)).strftime('%Y%m%d')
+            end = (datetime.strptime(today_str, '%Y%m%d') - timedelta(days=1)).strftime('%Y%m%d')
+            wanted = self._trade_dates(start, end)[-days:]
+            have = set(history['trade_date'].tolist())
+            missing = [d for d in wanted if int(d) not in have]
+            if missing:
+                logger.info(f"[市场宽度] 补齐 {len(missing)} 个交易日的全市场聚合数据")
+                parts = [history]
+                for trade_date in missing:
+                    # 按交易日逐日拉取，避免区间查询触发单次返回行数上限
+                    parts.append(aggregate_breadth(self.pro.daily(trade_date=trade_date)))
+                history = np.concatenate(parts)
+                history = history[np.argsort(history['trade_date'], kind='stable')]
+                history = history[-self.max_rows:]
+                self._save(history)
+            self._history = history
+            self._history_checked[days] = today_str
+            return history
+
+    def get_today(self, today_str: Optional[str] = None) -> Optional[np.ndarray]:
+        """当天全市场宽度（单行数组），today_refresh_interval 秒内重复调用直接返回缓存"""
+        today_str = today_str or datetime.now().strftime('%Y%m%d')
+        now = time.time()
+        with self._lock:
+            if self._today_key == today_str and now - self._today_checked_at < self.today_refresh_interval:
+                return self._today
+        if not get_trading_calendar().is_trading_day(today_str):
+            # 非交易日没有当天数据，不必请求
+            with self._lock:
+                self._today, self._today_key, self._today_checked_at = None, today_str, now
+            return None
+        row = aggregate_breadth(self.pro.daily(trade_date=today_str))
+        with self._lock:
+            self._today = row if len(row) else None
+            self._today_key = today_str
+            self._today_checked_at = now
+            return self._today
+
+    def fear_greed_index(self, hist_days: int = 20) -> Optional[float]:
+        """当天恐贪指数，成交额与今天之前hist_days个交易日的日均成交额对比"""
+        today = self.get_today()
+        if today is None:
+            logger.warning(f"[恐贪指数] 当天数据为空，日期: {datetime.now().strftime('%Y%m%d')}")
+            return None
+        if today['total_count'][0] == 0:
+            return None
+        money = float(today['amount'][0])
+        if money <= 0:
+            logger.warning(f"[恐贪指数] 当天成交额为0或无法获取")
+            return None
+        history = self.ensure_history(hist_days)[-hist_days:]
+        hist_money = float(history['amount'].mean()) if len(history) else money
+        if hist_money <= 0:
+            hist_money = money
+        idx = float(breadth_scores(today, hist_money)[0])
+        logger.debug(f"[恐贪指数] 计算详情 - 上涨比例={today['up_count'][0] / today['total_count'][0]:.2%}, "
+                     f"成交额比例={money / hist_money:.2f}, 最终指数={idx:.1f}")
+        return idx
+
+    def long_term_fear_greed_index(self, window: int = 20) -> Optional[float]:
+        """近window个交易日恐贪指数均值（含当天，当天数据未出时只用历史）"""
+        rows = self.ensure_history(window)
+        today = self.get_today()
+        if today is not None:
+            rows = np.concatenate([rows, today])
+        rows = rows[-window:]
+        rows = rows[rows['total_count'] > 0]
+        if len(rows) == 0:
+            logger.warning(f"[长期恐贪指数] 无有效交易日")
+            return None
+        # 与原算法一致：成交额与这window个交易日的日均成交额对比
+        hist_money = float(rows['amount'].mean())
+        avg_idx = float(breadth_scores(rows, hist_money).mean())
+        logger.debug(f"[长期恐贪指数] 计算完成 - 交易日数={len(rows)}, 平均指数={avg_idx:.1f}")
+        return avg_idx
+
+
+# 按token管理的全局宽度缓存
+_breadth_caches: Dict[str, MarketBreadthCache] = {}
+_breadth_caches_lock = threading.Lock()
+
+
+def get_market_breadth_cache(tushare_token: str) -> MarketBreadthCache:
+    """获取全局市场宽度缓存实例（同一token共用）"""
+    with _breadth_caches_lock:
+        if tushare_token not in _breadth_caches:
+            _breadth_caches[tushare_token] = MarketBreadthCache(tushare_token)
+        return _breadth_caches[tushare_token]
@@ -4,7 +4,7 @@ import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import talib
-import tushare as ts
+from utils.tushare_limiter import pro_api
 
 from xtquant.xttrader import XtQuantTrader
 from xtquant.xttype import StockAccount
@@ -15,7 +15,7 @@ class XtQuantPositionManager:
     """XtQuant持仓管理器"""
     
     def __init__(self, tushare_token: str, xt_trader: Optional[XtQuantTrader] = None):
-        self.pro = ts.pro_api(tushare_token)
+        self.pro = pro_api(tushare_token)
         self.xt_trader = xt_trader
         self.analyzer = PositionAnalyzer(tushare_token)
         
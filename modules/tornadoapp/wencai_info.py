@@ -15,7 +15,7 @@ if str(project_root) not in sys.path:
 from typing import List, Dict, Any, Optional, Union
 import pandas as pd
 import pywencai as wc
-import tushare as ts
+from utils.tushare_limiter import pro_api
 from datetime import datetime
 import asyncio
 import logging
@@ -190,7 +190,7 @@ async def async_get_stock_info(stock_pool: List[str], stock_name_map: Dict[str,
                 return []
         
         try:
-            pro = ts.pro_api(tushare_token)
+            pro = pro_api(tushare_token)
             stock_info = pro.stock_basic(
                 exchange='',
                 list_status='L',
@@ -52,7 +52,7 @@ python main.py
 import numpy as np
 import pandas as pd
 import pymysql
-import tushare as ts
+from utils.tushare_limiter import pro_api
 import talib
 from scipy.stats import zscore
 from sklearn.linear_model import LinearRegression, Lasso
@@ -62,12 +62,13 @@ import time
 from tqdm import tqdm
 import threading
 import config.ConfigServer as Cs
+from utils.trading_calendar import get_trading_calendar
 import asyncio
 
 
 class QuantitativeStockSelector:
     def __init__(self, token, start_date='20180101', end_date='20231231', db_config=None):
-        self.pro = ts.pro_api(token)
+        self.pro = pro_api(token)
         self.start_date = start_date
         self.end_date = end_date
         self.factor_weights = None
@@ -100,7 +101,7 @@ class QuantitativeStockSelector:
         """增量更新日频数据"""
         while True:
             loop = asyncio.get_event_loop()
-            latest_date = await loop.run_in_executor(None, lambda: self.pro.trade_cal(exchange='SSE', is_open='1')['cal_date'].iloc[-1])
+            latest_date = get_trading_calendar().prev_trading_day(inclusive=True)
             new_data = await loop.run_in_executor(None, self.pro.daily, None, latest_date)
 
             # 加载本地数据
@@ -1,13 +1,13 @@
 import pandas as pd
 import numpy as np
-import tushare as ts
+from utils.tushare_limiter import pro_api
 import talib
 from scipy.stats import zscore
 from sklearn.linear_model import Lasso, LinearRegression
 
 class StockSelector:
     def __init__(self, token, start_date='20250101', end_date='20250310'):
-        self.pro = ts.pro_api(token)
+        self.pro = pro_api(token)
         self.start_date = start_date
         self.end_date = end_date
         self.factor_weights = None
@@ -6,7 +6,7 @@
 
 import pandas as pd
 import numpy as np
-import tushare as ts
+from utils.tushare_limiter import pro_api
 import logging
 from datetime import datetime, timedelta
 import pymysql
@@ -33,7 +33,7 @@ class SimpleStockSelector:
         """
         self.token = token
         self.db_config = db_config
-        self.pro = ts.pro_api(token)
+        self.pro = pro_api(token)
         self.factor_weights = None
         
         # 设置日期范围
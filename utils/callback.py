@@ -1,6 +1,7 @@
 from xtquant.xttrader import XtQuantTrader, XtQuantTraderCallback
 from modules.tornadoapp.oms.order_manager import OrderManager
 from modules.tornadoapp.oms.order_status import OrderStatus
+from modules.tornadoapp.oms.account_snapshot import get_account_snapshot
 import logging
 import requests
 import os
@@ -59,6 +60,8 @@ class MyXtQuantTraderCallback(XtQuantTraderCallback):
         """
         print("on asset callback")
         print(asset.account_id, asset.cash, asset.total_asset)
+        # 校准账户快照
+        get_account_snapshot(asset.account_id).on_asset(asset)
 
     def on_stock_trade(self, trade):
         """
@@ -68,6 +71,8 @@ class MyXtQuantTraderCallback(XtQuantTraderCallback):
         """
         print("on trade callback")
         print(trade.account_id, trade.stock_code, trade.order_id)
+        # 按实际成交价/量写入策略成交台账等
+        self.order_manager.on_trade(trade)
 
     def on_stock_position(self, position):
         """
@@ -77,6 +82,8 @@ class MyXtQuantTraderCallback(XtQuantTraderCallback):
         """
         print("on position callback")
         print(position.stock_code, position.volume)
+        # 校准账户快照
+        get_account_snapshot(position.account_id).on_position(position)
 
     def on_cancel_error(self, cancel_error):
         """
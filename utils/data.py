@@ -1,6 +1,6 @@
 import time
 import os
-import tushare as ts
+from utils.tushare_limiter import pro_api
 import pandas as pd
 import efinance as ef
 from datetime import datetime
@@ -12,7 +12,7 @@ load_dotenv()
 
 # tushare token从环境变量获取
 TUSHARE_TOKEN = os.getenv('TUSHARE_TOKEN')
-pro = ts.pro_api(TUSHARE_TOKEN)  # 5000积分
+pro = pro_api(TUSHARE_TOKEN)  # 5000积分
 
 
 # 获取当前脚本的目录
@@ -60,48 +60,107 @@ def save_one_stock_history_data(stock='000601.SZ'):
     df.to_csv(f"./data/all_data/{stock}.csv", index=False)
 
 
-def download_all_data(stock_list=[]):
+ALL_DATA_DIR = './data/all_data'
+# efinance 历史行情的日期列
+DATE_COLUMN = '日期'
+
+
+def _last_stored_date(file_path, date_column=DATE_COLUMN):
+    """只读取CSV表头和文件末尾几KB，返回最后一行的日期，不加载整个文件"""
+    with open(file_path, 'rb') as f:
+        header = f.readline().decode('utf-8-sig').strip().split(',')
+        if date_column not in header:
+            return None
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 4096))
+        lines = [line for line in f.read().decode('utf-8', errors='ignore').splitlines() if line.strip()]
+    if len(lines) < 2 and size <= 4096:
+        return None
+    values = lines[-1].split(',')
+    idx = header.index(date_column)
+    return values[idx] if idx < len(values) else None
+
+
+def append_stock_data(code, new_data, data_dir=ALL_DATA_DIR):
+    """
+    追加写入单只股票的日线：只与文件中最后一个日期比较去重，追加新行，不重写历史
+
+    Returns:
+        追加的行数
+    """
+    if new_data is None or new_data.empty:
+        return 0
+    file_path = os.path.join(data_dir, f'{code}.csv')
+    if not os.path.exists(file_path):
+        new_data.to_csv(file_path, encoding='utf-8-sig', index=False)
+        return len(new_data)
+    last_date = _last_stored_date(file_path)
+    if last_date and DATE_COLUMN in new_data.columns:
+        new_data = new_data[new_data[DATE_COLUMN].astype(str) > last_date]
+    if new_data.empty:
+        return 0
+    new_data.to_csv(file_path, mode='a', header=False, encoding='utf-8', index=False)
+    return len(new_data)
+
+
+def download_all_data(stock_list=[], max_workers=8):
+    """收盘后下载当日行情并追加到每只股票的CSV（耗时只与当天数据量有关）"""
     print("download_all_data")
     # 获取当前日期
     now = datetime.now()
 
     # 格式化为 YYYYMMDD 格式
     formatted_date = now.strftime("%Y%m%d")
+    # 确保数据目录存在
+    os.makedirs(ALL_DATA_DIR, exist_ok=True)
     if stock_list == []:
         # 获取股票信息
         # df = ak.stock_info_a_code_name()
         df = pro.stock_basic(exchange='', list_status='L', fields='ts_code,symbol,name,area,industry,list_date')
 
-        # 确保数据目录存在
-        os.makedirs('./data/all_data', exist_ok=True)
-
-
         # 获取股票历史数据
         stock_list = list(map(lambda x: x[:-3], list(df['ts_code'])))
     all_data = ef.stock.get_quote_history(stock_list, formatted_date, formatted_date)
     # all_data = ef.stock.get_quote_history(stock_list[:1])
-    for code in all_data.keys():
-        # 构造文件路径
-        file_path = f'./data/all_data/{code}.csv'
-        new_data = all_data[code]
-        # 检查文件是否存在
-        if os.path.exists(file_path):
-            # 如果文件存在，读取现有数据
-            existing_data = pd.read_csv(file_path)
-
-            # 合并新数据和现有数据
-            combined_data = pd.concat([existing_data, new_data], ignore_index=True)
-
-            # 去重（如果需要）
-            combined_data = combined_data.drop_duplicates()
-
-            # 保存合并后的数据
-            combined_data.to_csv(file_path, encoding='utf-8-sig', index=False)
-            print(f"数据已追加到文件: {file_path}")
-        else:
-            # 如果文件不存在，直接保存新数据
-            new_data.to_csv(file_path, encoding='utf-8-sig', index=False)
-            print(f"新文件已创建并保存: {file_path}")
+    # 每只股票一个文件，互不影响，用有限大小的线程池并行追加
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {code: executor.submit(append_stock_data, code, all_data[code]) for code in all_data.keys()}
+    appended = 0
+    for code, future in futures.items():
+        try:
+            appended += future.result()
+        except Exception as e:
+            print(f"追加 {code} 数据失败: {e}")
+    print(f"数据追加完成: {len(futures)} 只股票，新增 {appended} 行")
+
+
+def compact_stock_data(code, data_dir=ALL_DATA_DIR):
+    """整理单只股票文件：按日期去重排序后重写（定期执行，修复异常中断等造成的重复行）"""
+    file_path = os.path.join(data_dir, f'{code}.csv')
+    data = pd.read_csv(file_path)
+    if DATE_COLUMN in data.columns:
+        data = data.drop_duplicates(subset=[DATE_COLUMN], keep='last').sort_values(DATE_COLUMN)
+    else:
+        data = data.drop_duplicates()
+    tmp_path = file_path + '.tmp'
+    data.to_csv(tmp_path, encoding='utf-8-sig', index=False)
+    os.replace(tmp_path, file_path)
+
+
+def compact_all_data(max_workers=8):
+    """整理 data/all_data 下所有股票文件"""
+    if not os.path.isdir(ALL_DATA_DIR):
+        return
+    codes = [name[:-4] for name in os.listdir(ALL_DATA_DIR) if name.endswith('.csv')]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {code: executor.submit(compact_stock_data, code) for code in codes}
+    for code, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            print(f"整理 {code} 数据失败: {e}")
+    print(f"数据整理完成: {len(codes)} 只股票")
 
 def get_all_data_path():
     return r"F:\Code\python\qmt_python\data\all_data"
@@ -3,16 +3,21 @@ import pandas as pd
 
 from datetime import datetime, time
 
+from utils.trading_calendar import get_trading_calendar
+
 def is_trading_time():
     """
     判断当前时间是否为中国A股交易时间。
-    - 交易日：周一至周五（不含法定节假日）
+    - 交易日：以交易日历为准（排除周末和法定节假日）
     - 上午 9:30-11:30，下午 13:00-15:00
     """
     now = datetime.now()
     # 判断是否为工作日（周一至周五）
     if now.weekday() >= 5:  # 周六（5）和周日（6）
         return False
+    # 法定节假日
+    if not get_trading_calendar().is_trading_day(now):
+        return False
     # 定义交易时间段
     morning_start = time(9, 30)
     morning_end = time(11, 30)
@@ -27,10 +32,10 @@ def is_trading_time():
 
 
 def get_previous_trading_day():
+    """上一个交易日（YYYY-MM-DD），按交易日历计算，跳过法定节假日"""
     now = datetime.now()
-    day = now.strftime("%Y-%m-%d")
-    previous_trading_day = (pd.Timestamp(day) - pd.offsets.BDay(1)).strftime("%Y-%m-%d")
-    return previous_trading_day
+    previous_trading_day = get_trading_calendar().prev_trading_day(now)
+    return pd.Timestamp(previous_trading_day).strftime("%Y-%m-%d")
 
 def get_today_trade_day(is_format=False):
     now = datetime.now()
@@ -9,9 +9,12 @@
 版本: 1.0
 """
 
+import hashlib
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Optional, Union, Any, Callable, Hashable
 import logging
 
 # 尝试导入 talib，如果没有则使用纯 Python 实现
@@ -26,10 +29,18 @@ except ImportError:
 class IndicatorCalculator:
     """技术指标计算工具类"""
     
-    def __init__(self):
-        """初始化指标计算器"""
+    def __init__(self, cache_size: int = 512):
+        """
+        初始化指标计算器
+        
+        Args:
+            cache_size: 结果缓存（LRU）最多保留的条目数，0为不缓存
+        """
         self.logger = logging.getLogger(__name__)
         self._supported_indicators = self._init_supported_indicators()
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def _init_supported_indicators(self) -> Dict[str, Dict[str, Any]]:
         """初始化支持的指标列表"""
@@ -283,44 +294,117 @@ class IndicatorCalculator:
             >>> macd = calculator.calculate(df, 'MACD')
             >>> print(macd['macd'], macd['signal'], macd['histogram'])
         """
-        if indicator not in self._supported_indicators:
-            raise ValueError(f"不支持的指标: {indicator}。使用 help() 查看支持的指标列表")
-        
-        indicator_info = self._supported_indicators[indicator]
-        
-        # 预处理数据（如果是tick数据，需要转换为OHLCV格式）
-        df = self._preprocess_data(data.copy())
-        
-        # 检查所需字段
-        required_fields = indicator_info['requires']
-        missing_fields = [f for f in required_fields if f not in df.columns]
-        if missing_fields:
-            raise ValueError(f"缺少必需字段: {missing_fields}。指标 {indicator} 需要: {required_fields}")
-        
-        # 合并参数（kwargs 优先）
-        params = {**indicator_info['params'], **kwargs}
+        return self.calculate_many(data, {indicator: kwargs})[indicator]
+    
+    def calculate_many(self, data: pd.DataFrame,
+                       indicators: Union[List[str], Dict[str, Dict[str, Any]]]) -> Dict[str, Union[float, Dict[str, float]]]:
+        """
+        一次计算多个指标
+        - 数据只预处理一次
+        - 同一批指标共享中间结果（EMA、MACD快慢线、滚动均值/极值、典型价格、真实波幅等）
+        - 结果按 (数据指纹, 指标, 参数) 缓存在有界LRU中，相同数据重复计算直接返回
         
-        # 计算指标
-        try:
-            result = self._calculate_indicator(df, indicator, params)
+        Args:
+            data: 股票数据，格式同 calculate
+            indicators: 指标名列表，或 {指标名: 参数覆盖}
+            
+        Returns:
+            {指标名: 结果}，每个结果的格式与 calculate 相同
             
-            # 如果返回多个值，返回字典；否则返回最后一个值
-            if isinstance(result, dict):
-                return {k: float(v.iloc[-1]) if isinstance(v, pd.Series) else float(v) 
-                       for k, v in result.items()}
-            elif isinstance(result, pd.Series):
-                # 检查是否为空
-                if len(result) == 0 or result.isna().all():
-                    raise ValueError(f"指标 {indicator} 计算结果为空，可能需要更多历史数据")
-                return float(result.iloc[-1])
-            elif isinstance(result, (int, float, np.number)):
-                return float(result)
+        Example:
+            >>> calculator = IndicatorCalculator()
+            >>> result = calculator.calculate_many(df, ['MA5', 'MA20', 'RSI', 'MACD', 'BOLL'])
+            >>> print(result['MACD']['macd'], result['RSI'])
+        """
+        if isinstance(indicators, dict):
+            requests = {name: dict(overrides or {}) for name, overrides in indicators.items()}
+        else:
+            requests = {name: {} for name in indicators}
+        for name in requests:
+            if name not in self._supported_indicators:
+                raise ValueError(f"不支持的指标: {name}。使用 help() 查看支持的指标列表")
+        
+        fingerprint = self._fingerprint(data) if self.cache_size else None
+        results = {}
+        pending = {}
+        for name, overrides in requests.items():
+            # 合并参数（overrides 优先）
+            params = {**self._supported_indicators[name]['params'], **overrides}
+            key = (fingerprint, name, tuple(sorted(params.items())))
+            cached = self._cache_get(key) if fingerprint else None
+            if cached is not None:
+                results[name] = dict(cached) if isinstance(cached, dict) else cached
             else:
-                return float(result)
-                
-        except Exception as e:
-            self.logger.error(f"计算指标 {indicator} 失败: {e}", exc_info=True)
-            raise
+                pending[name] = (key, params)
+        
+        if pending:
+            # 预处理数据（如果是tick数据，需要转换为OHLCV格式）
+            df = self._preprocess_data(data.copy())
+            shared = {}
+            for name, (key, params) in pending.items():
+                # 检查所需字段
+                required_fields = self._supported_indicators[name]['requires']
+                missing_fields = [f for f in required_fields if f not in df.columns]
+                if missing_fields:
+                    raise ValueError(f"缺少必需字段: {missing_fields}。指标 {name} 需要: {required_fields}")
+                try:
+                    value = self._finalize(name, self._calculate_indicator(df, name, params, shared))
+                except Exception as e:
+                    self.logger.error(f"计算指标 {name} 失败: {e}", exc_info=True)
+                    raise
+                if fingerprint:
+                    self._cache_put(key, value)
+                results[name] = dict(value) if isinstance(value, dict) else value
+        
+        return {name: results[name] for name in requests}
+    
+    @staticmethod
+    def _finalize(indicator: str, result) -> Union[float, Dict[str, float]]:
+        """多值指标返回字典，序列取最后一个值"""
+        if isinstance(result, dict):
+            return {k: float(v.iloc[-1]) if isinstance(v, pd.Series) else float(v)
+                    for k, v in result.items()}
+        if isinstance(result, pd.Series):
+            # 检查是否为空
+            if len(result) == 0 or result.isna().all():
+                raise ValueError(f"指标 {indicator} 计算结果为空，可能需要更多历史数据")
+            return float(result.iloc[-1])
+        return float(result)
+    
+    @staticmethod
+    def _fingerprint(data: pd.DataFrame) -> tuple:
+        """数据指纹：形状、列名与逐行哈希的摘要（O(n) 向量化，远小于指标计算本身）"""
+        row_hashes = pd.util.hash_pandas_object(data, index=True).to_numpy()
+        digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+        return data.shape, tuple(map(str, data.columns)), digest
+    
+    def _cache_get(self, key: tuple):
+        with self._cache_lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            return value
+    
+    def _cache_put(self, key: tuple, value):
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def clear_cache(self):
+        """清空结果缓存"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    @staticmethod
+    def _shared(shared: Optional[dict], key: Hashable, func: Callable):
+        """同一批指标内复用中间结果；shared 为 None 时直接计算"""
+        if shared is None:
+            return func()
+        if key not in shared:
+            shared[key] = func()
+        return shared[key]
     
     def _preprocess_data(self, data: pd.DataFrame) -> pd.DataFrame:
         """
@@ -380,57 +464,54 @@ class IndicatorCalculator:
         
         raise ValueError("无法识别数据格式。需要包含 'open/high/low/close' 或 'last_price/price' 列")
     
-    def _calculate_indicator(self, df: pd.DataFrame, indicator: str, params: Dict[str, Any]) -> Union[float, Dict[str, float], pd.Series]:
-        """内部方法：计算具体指标"""
+    def _calculate_indicator(self, df: pd.DataFrame, indicator: str, params: Dict[str, Any],
+                             shared: Optional[dict] = None) -> Union[float, Dict[str, float], pd.Series]:
+        """内部方法：计算具体指标（shared 为同一批指标共享的中间结果）"""
         
         if HAS_TALIB:
             try:
-                return self._calculate_with_talib(df, indicator, params)
+                return self._calculate_with_talib(df, indicator, params, shared)
             except Exception as e:
                 # 如果 talib 计算失败，回退到 pandas 实现
                 self.logger.warning(f"TA-Lib 计算 {indicator} 失败，回退到 pandas 实现: {e}")
-                return self._calculate_with_pandas(df, indicator, params)
+                return self._calculate_with_pandas(df, indicator, params, shared)
         else:
-            return self._calculate_with_pandas(df, indicator, params)
+            return self._calculate_with_pandas(df, indicator, params, shared)
     
-    def _calculate_with_talib(self, df: pd.DataFrame, indicator: str, params: Dict[str, Any]) -> Union[float, Dict[str, float], pd.Series]:
+    def _calculate_with_talib(self, df: pd.DataFrame, indicator: str, params: Dict[str, Any],
+                              shared: Optional[dict] = None) -> Union[float, Dict[str, float], pd.Series]:
         """使用 TA-Lib 计算指标"""
-        close = df['close'].values.astype(np.float64)
-        high = df['high'].values.astype(np.float64) if 'high' in df.columns else None
-        low = df['low'].values.astype(np.float64) if 'low' in df.columns else None
-        volume = df['volume'].values.astype(np.float64) if 'volume' in df.columns else None
-        
-        # 注意：必须先检查 MACD 相关指标，因为它们以 'MA' 开头
-        if indicator == 'MACD':
-            fast = params.get('fast', 12)
-            slow = params.get('slow', 26)
-            signal = params.get('signal', 9)
-            macd, macd_signal, macd_hist = talib.MACD(close, fastperiod=fast, slowperiod=slow, signalperiod=signal)
-            return {
-                'macd': pd.Series(macd),
-                'signal': pd.Series(macd_signal),
-                'histogram': pd.Series(macd_hist)
-            }
-        
-        elif indicator == 'MACD_DIF':
-            fast = params.get('fast', 12)
-            slow = params.get('slow', 26)
-            macd, _, _ = talib.MACD(close, fastperiod=fast, slowperiod=slow)
-            return pd.Series(macd)
+        def column(name):
+            return self._shared(shared, ('array', name),
+                                lambda: df[name].values.astype(np.float64) if name in df.columns else None)
         
-        elif indicator == 'MACD_DEA':
-            fast = params.get('fast', 12)
-            slow = params.get('slow', 26)
-            signal = params.get('signal', 9)
-            _, macd_signal, _ = talib.MACD(close, fastperiod=fast, slowperiod=slow, signalperiod=signal)
-            return pd.Series(macd_signal)
+        close = column('close')
+        high = column('high')
+        low = column('low')
+        volume = column('volume')
         
-        elif indicator == 'MACD_HIST':
+        # 注意：必须先检查 MACD 相关指标，因为它们以 'MA' 开头
+        if indicator.startswith('MACD'):
             fast = params.get('fast', 12)
             slow = params.get('slow', 26)
             signal = params.get('signal', 9)
-            _, _, macd_hist = talib.MACD(close, fastperiod=fast, slowperiod=slow, signalperiod=signal)
-            return pd.Series(macd_hist)
+            # MACD 各变体共用一次计算（快线与 signal 无关，同参数下结果相同）
+            macd, macd_signal, macd_hist = self._shared(
+                shared, ('talib_macd', fast, slow, signal),
+                lambda: talib.MACD(close, fastperiod=fast, slowperiod=slow, signalperiod=signal)
+            )
+            if indicator == 'MACD':
+                return {
+                    'macd': pd.Series(macd),
+                    'signal': pd.Series(macd_signal),
+                    'histogram': pd.Series(macd_hist)
+                }
+            elif indicator == 'MACD_DIF':
+                return pd.Series(macd)
+            elif indicator == 'MACD_DEA':
+                return pd.Series(macd_signal)
+            elif indicator == 'MACD_HIST':
+                return pd.Series(macd_hist)
         
         # 移动平均线（必须在 MACD 之后检查）
         elif indicator.startswith('MA'):
@@ -448,7 +529,10 @@ class IndicatorCalculator:
         elif indicator.startswith('BOLL'):
             period = params.get('period', 20)
             std = params.get('std', 2)
-            upper, middle, lower = talib.BBANDS(close, timeperiod=period, nbdevup=std, nbdevdn=std)
+            upper, middle, lower = self._shared(
+                shared, ('talib_bbands', period, std),
+                lambda: talib.BBANDS(close, timeperiod=period, nbdevup=std, nbdevdn=std)
+            )
             
             if indicator == 'BOLL':
                 return {
@@ -467,7 +551,10 @@ class IndicatorCalculator:
             k_period = params.get('k_period', 9)
             d_period = params.get('d_period', 3)
             j_period = params.get('j_period', 3)
-            k, d = talib.STOCH(high, low, close, fastk_period=k_period, slowk_period=d_period, slowd_period=j_period)
+            k, d = self._shared(
+                shared, ('talib_stoch', k_period, d_period, j_period),
+                lambda: talib.STOCH(high, low, close, fastk_period=k_period, slowk_period=d_period, slowd_period=j_period)
+            )
             j = 3 * k - 2 * d
             
             if indicator == 'KDJ':
@@ -514,65 +601,58 @@ class IndicatorCalculator:
             return ((df['high'] - df['low']) / df['low'] * 100).iloc[-1]
         
         # 如果 TA-Lib 不支持，回退到 pandas 实现
-        return self._calculate_with_pandas(df, indicator, params)
+        return self._calculate_with_pandas(df, indicator, params, shared)
     
-    def _calculate_with_pandas(self, df: pd.DataFrame, indicator: str, params: Dict[str, Any]) -> Union[float, Dict[str, float], pd.Series]:
-        """使用 pandas 计算指标（纯 Python 实现）"""
+    def _calculate_with_pandas(self, df: pd.DataFrame, indicator: str, params: Dict[str, Any],
+                               shared: Optional[dict] = None) -> Union[float, Dict[str, float], pd.Series]:
+        """使用 pandas 计算指标（纯 Python 实现），中间结果通过 shared 在同一批指标间复用"""
+        
+        def memo(key, func):
+            return self._shared(shared, key, func)
+        
+        def rolling(column, period, how):
+            """滚动统计（MA/BOLL/VOLUME_MA 共用均值，KDJ/WILLR 共用极值）"""
+            return memo(('rolling', column, period, how), lambda: getattr(df[column].rolling(window=period), how)())
+        
+        def ema(span):
+            return memo(('ema', span), lambda: df['close'].ewm(span=span).mean())
+        
+        def macd_lines(fast, slow, signal):
+            macd = memo(('macd_dif', fast, slow), lambda: ema(fast) - ema(slow))
+            macd_signal = memo(('macd_dea', fast, slow, signal), lambda: macd.ewm(span=signal).mean())
+            return macd, macd_signal
         
         # 注意：必须先检查 MACD 相关指标，因为它们以 'MA' 开头
-        if indicator == 'MACD':
+        if indicator.startswith('MACD'):
             fast = params.get('fast', 12)
             slow = params.get('slow', 26)
             signal = params.get('signal', 9)
-            ema_fast = df['close'].ewm(span=fast).mean()
-            ema_slow = df['close'].ewm(span=slow).mean()
-            macd = ema_fast - ema_slow
-            macd_signal = macd.ewm(span=signal).mean()
+            if indicator == 'MACD_DIF':
+                return memo(('macd_dif', fast, slow), lambda: ema(fast) - ema(slow))
+            macd, macd_signal = macd_lines(fast, slow, signal)
+            if indicator == 'MACD_DEA':
+                return macd_signal
             macd_hist = macd - macd_signal
+            if indicator == 'MACD_HIST':
+                return macd_hist
             return {
                 'macd': macd,
                 'signal': macd_signal,
                 'histogram': macd_hist
             }
         
-        elif indicator == 'MACD_DIF':
-            fast = params.get('fast', 12)
-            slow = params.get('slow', 26)
-            ema_fast = df['close'].ewm(span=fast).mean()
-            ema_slow = df['close'].ewm(span=slow).mean()
-            return ema_fast - ema_slow
-        
-        elif indicator == 'MACD_DEA':
-            fast = params.get('fast', 12)
-            slow = params.get('slow', 26)
-            signal = params.get('signal', 9)
-            ema_fast = df['close'].ewm(span=fast).mean()
-            ema_slow = df['close'].ewm(span=slow).mean()
-            macd = ema_fast - ema_slow
-            return macd.ewm(span=signal).mean()
-        
-        elif indicator == 'MACD_HIST':
-            fast = params.get('fast', 12)
-            slow = params.get('slow', 26)
-            signal = params.get('signal', 9)
-            ema_fast = df['close'].ewm(span=fast).mean()
-            ema_slow = df['close'].ewm(span=slow).mean()
-            macd = ema_fast - ema_slow
-            macd_signal = macd.ewm(span=signal).mean()
-            return macd - macd_signal
-        
         # 移动平均线（必须在 MACD 之后检查）
         elif indicator.startswith('MA'):
             period = params.get('period', 5)
-            return df['close'].rolling(window=period).mean()
+            return rolling('close', period, 'mean')
         
         elif indicator.startswith('EMA'):
             period = params.get('period', 12)
-            return df['close'].ewm(span=period).mean()
+            return ema(period)
         
         elif indicator.startswith('RSI'):
             period = params.get('period', 14)
-            delta = df['close'].diff()
+            delta = memo(('diff', 'close'), lambda: df['close'].diff())
             gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
             loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
             rs = gain / loss
@@ -582,8 +662,8 @@ class IndicatorCalculator:
         elif indicator.startswith('BOLL'):
             period = params.get('period', 20)
             std = params.get('std', 2)
-            middle = df['close'].rolling(period).mean()
-            std_val = df['close'].rolling(period).std()
+            middle = rolling('close', period, 'mean')
+            std_val = rolling('close', period, 'std')
             upper = middle + (std_val * std)
             lower = middle - (std_val * std)
             
@@ -604,11 +684,14 @@ class IndicatorCalculator:
             k_period = params.get('k_period', 9)
             d_period = params.get('d_period', 3)
             j_period = params.get('j_period', 3)
-            low_min = df['low'].rolling(k_period).min()
-            high_max = df['high'].rolling(k_period).max()
-            rsv = (df['close'] - low_min) / (high_max - low_min) * 100
-            k = rsv.ewm(alpha=1/d_period).mean()
-            d = k.ewm(alpha=1/j_period).mean()
+            
+            def rsv():
+                low_min = rolling('low', k_period, 'min')
+                high_max = rolling('high', k_period, 'max')
+                return (df['close'] - low_min) / (high_max - low_min) * 100
+            
+            k = memo(('kdj_k', k_period, d_period), lambda: memo(('rsv', k_period), rsv).ewm(alpha=1/d_period).mean())
+            d = memo(('kdj_d', k_period, d_period, j_period), lambda: k.ewm(alpha=1/j_period).mean())
             j = 3 * k - 2 * d
             
             if indicator == 'KDJ':
@@ -626,34 +709,39 @@ class IndicatorCalculator:
         
         elif indicator == 'ATR':
             period = params.get('period', 14)
-            high_low = df['high'] - df['low']
-            high_close = np.abs(df['high'] - df['close'].shift())
-            low_close = np.abs(df['low'] - df['close'].shift())
-            true_range = np.maximum(high_low, np.maximum(high_close, low_close))
-            return true_range.rolling(period).mean()
+            
+            def true_range():
+                high_low = df['high'] - df['low']
+                high_close = np.abs(df['high'] - df['close'].shift())
+                low_close = np.abs(df['low'] - df['close'].shift())
+                return np.maximum(high_low, np.maximum(high_close, low_close))
+            
+            return memo(('true_range',), true_range).rolling(period).mean()
         
         elif indicator == 'CCI':
             period = params.get('period', 20)
-            typical_price = (df['high'] + df['low'] + df['close']) / 3
+            typical_price = memo(('typical_price',), lambda: (df['high'] + df['low'] + df['close']) / 3)
             sma = typical_price.rolling(period).mean()
-            mean_deviation = typical_price.rolling(period).apply(
-                lambda x: np.mean(np.abs(x - x.mean()))
-            )
+            # 平均偏差：用 period 次整列平移代替 rolling().apply 的逐窗口回调
+            mean_deviation = (typical_price - sma).abs()
+            for lag in range(1, period):
+                mean_deviation = mean_deviation + (typical_price.shift(lag) - sma).abs()
+            mean_deviation = mean_deviation / period
             return (typical_price - sma) / (0.015 * mean_deviation)
         
         elif indicator == 'WILLR':
             period = params.get('period', 14)
-            highest_high = df['high'].rolling(period).max()
-            lowest_low = df['low'].rolling(period).min()
+            highest_high = rolling('high', period, 'max')
+            lowest_low = rolling('low', period, 'min')
             return -100 * (highest_high - df['close']) / (highest_high - lowest_low)
         
         elif indicator.startswith('VOLUME_MA'):
             period = params.get('period', 5)
-            return df['volume'].rolling(window=period).mean()
+            return rolling('volume', period, 'mean')
         
         elif indicator == 'VOLUME_RATIO':
             period = params.get('period', 5)
-            volume_ma = df['volume'].rolling(window=period).mean()
+            volume_ma = rolling('volume', period, 'mean')
             return df['volume'] / volume_ma
         
         elif indicator == 'INTRADAY_LOW':
@@ -668,6 +756,19 @@ class IndicatorCalculator:
         raise ValueError(f"不支持的指标: {indicator}")
 
 
+_indicator_calculator: Optional[IndicatorCalculator] = None
+_indicator_calculator_lock = threading.Lock()
+
+
+def get_indicator_calculator() -> IndicatorCalculator:
+    """获取全局指标计算器（共享结果缓存）"""
+    global _indicator_calculator
+    with _indicator_calculator_lock:
+        if _indicator_calculator is None:
+            _indicator_calculator = IndicatorCalculator()
+        return _indicator_calculator
+
+
 # 使用示例
 if __name__ == '__main__':
     # 创建计算器实例
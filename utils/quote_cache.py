@@ -0,0 +1,161 @@
+"""
+实时行情缓存
+- 每条报价带时间戳，按股票设置TTL，过期自动刷新
+- 批量刷新：所有关注股票一次 xtdata.get_full_tick 调用
+- 可选推送模式：xtdata.subscribe_quote 回调直接更新缓存
+auto_trader、PositionAnalyzer、OrderManager 共用同一个实例（get_quote_cache）
+"""
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteCache:
+    """带TTL的最新价缓存"""
+
+    def __init__(self, default_ttl: float = 5.0):
+        """
+        Args:
+            default_ttl: 默认报价有效期（秒）
+        """
+        self.default_ttl = default_ttl
+        self._quotes: Dict[str, dict] = {}  # symbol -> {'price': float, 'ts': float, 'tick': dict}
+        self._ttl: Dict[str, float] = {}  # symbol -> 单独设置的TTL
+        self._watched = set()
+        self._sub_ids: Dict[str, int] = {}  # 推送模式订阅号
+        self._lock = threading.Lock()
+
+    def set_ttl(self, symbol: str, ttl: float):
+        """为单只股票设置TTL"""
+        with self._lock:
+            self._ttl[symbol] = ttl
+
+    def watch(self, symbols: Iterable[str]):
+        """加入关注列表，批量刷新时一并拉取"""
+        with self._lock:
+            self._watched.update(s for s in symbols if s)
+
+    def unwatch(self, symbols: Iterable[str]):
+        with self._lock:
+            self._watched.difference_update(symbols)
+
+    def _is_fresh(self, symbol: str, now: float) -> bool:
+        quote = self._quotes.get(symbol)
+        if quote is None:
+            return False
+        return now - quote['ts'] < self._ttl.get(symbol, self.default_ttl)
+
+    def update(self, symbol: str, price: float, tick: Optional[dict] = None, ts: Optional[float] = None):
+        """写入一条报价"""
+        if price is None or price <= 0:
+            return
+        with self._lock:
+            self._quotes[symbol] = {'price': float(price), 'ts': ts or time.time(), 'tick': tick}
+
+    def update_from_ticks(self, tick_info: dict):
+        """
+        用 get_full_tick / subscribe_quote 返回的数据更新缓存
+        支持 {code: tick} 与 {code: [tick, ...]} 两种格式
+        """
+        if not tick_info:
+            return
+        now = time.time()
+        for symbol, tick in tick_info.items():
+            if isinstance(tick, list):
+                if not tick:
+                    continue
+                tick = tick[-1]
+            if isinstance(tick, dict) and 'lastPrice' in tick:
+                self.update(symbol, tick['lastPrice'], tick, now)
+
+    def refresh(self, symbols: Optional[Iterable[str]] = None, force: bool = False) -> int:
+        """
+        批量刷新：关注列表与symbols中所有过期的股票合并为一次get_full_tick调用
+
+        Returns:
+            本次请求的股票数量
+        """
+        now = time.time()
+        with self._lock:
+            candidates = set(self._watched)
+            if symbols:
+                candidates.update(s for s in symbols if s)
+            stale = [s for s in candidates if force or not self._is_fresh(s, now)]
+        if not stale:
+            return 0
+        try:
+            from xtquant import xtdata
+            self.update_from_ticks(xtdata.get_full_tick(stale))
+        except Exception as e:
+            logger.warning(f"[行情缓存] 批量获取最新价失败: {e}")
+        return len(stale)
+
+    def get_price(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        """
+        获取最新价，过期时连同其它过期的关注股票一起刷新
+
+        Args:
+            max_age: 允许返回的报价最大年龄（秒）；刷新失败且缓存报价超过该年龄时返回None。
+                     为None时刷新失败仍返回旧价（仅用于展示等对时效不敏感的场景）
+        """
+        with self._lock:
+            if self._is_fresh(symbol, time.time()):
+                return self._quotes[symbol]['price']
+        self.refresh([symbol])
+        with self._lock:
+            quote = self._quotes.get(symbol)
+        if quote is None:
+            return None
+        if max_age is not None and time.time() - quote['ts'] > max_age:
+            return None
+        return quote['price']
+
+    def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """批量获取最新价，只发起一次刷新"""
+        self.refresh(symbols)
+        with self._lock:
+            return {s: self._quotes[s]['price'] for s in symbols if s in self._quotes}
+
+    def get_quote(self, symbol: str) -> Optional[dict]:
+        """返回 {'price', 'ts', 'tick'}，不触发刷新"""
+        with self._lock:
+            quote = self._quotes.get(symbol)
+            return dict(quote) if quote else None
+
+    def start_push(self, symbols: Iterable[str], period: str = 'tick'):
+        """推送模式：订阅行情，回调中直接更新缓存"""
+        from xtquant import xtdata
+        symbols = list(symbols)
+        for symbol in symbols:
+            if not symbol or symbol in self._sub_ids:
+                continue
+            try:
+                self._sub_ids[symbol] = xtdata.subscribe_quote(symbol, period=period, count=0,
+                                                               callback=self.update_from_ticks)
+            except Exception as e:
+                logger.warning(f"[行情缓存] 订阅{symbol}行情失败: {e}")
+        self.watch(symbols)
+
+    def stop_push(self, symbols: Optional[Iterable[str]] = None):
+        """取消推送订阅，symbols为空时取消全部"""
+        from xtquant import xtdata
+        for symbol in list(symbols or self._sub_ids.keys()):
+            sub_id = self._sub_ids.pop(symbol, None)
+            if sub_id is None:
+                continue
+            try:
+                xtdata.unsubscribe_quote(sub_id)
+            except Exception as e:
+                logger.warning(f"[行情缓存] 取消订阅{symbol}失败: {e}")
+
+
+# 全局行情缓存实例
+quote_cache = QuoteCache()
+
+
+def get_quote_cache() -> QuoteCache:
+    """获取全局行情缓存实例"""
+    return quote_cache
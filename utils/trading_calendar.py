@@ -0,0 +1,201 @@
+"""
+A股交易日历
+- 交易日以 int32(YYYYMMDD) 升序数组保存在 data/trade_calendar.npy，进程内只加载一次
+- 本地日历未覆盖到今天之后 min_ahead 天时才通过 Tushare trade_cal 刷新（有间隔限制）
+- is_trading_day O(1)；prev/next_trading_day、trading_days_between 基于 searchsorted
+- date_index 提供有序NumPy日期索引，shift() 可对整列日期做交易日偏移
+无Token且无本地文件时退化为工作日近似（不含节假日），并给出警告
+"""
+import os
+import time
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+DEFAULT_CALENDAR_PATH = os.path.join('data', 'trade_calendar.npy')
+
+
+def to_int_date(value) -> int:
+    """支持 'YYYYMMDD'、'YYYY-MM-DD'、date/datetime/Timestamp、int"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (datetime, date)):
+        return value.year * 10000 + value.month * 100 + value.day
+    text = str(value).strip()[:10].replace('-', '').replace('/', '')
+    return int(text)
+
+
+def to_str_date(value: int, fmt: str = '%Y%m%d') -> str:
+    if fmt == '%Y%m%d':
+        return str(int(value))
+    return datetime.strptime(str(int(value)), '%Y%m%d').strftime(fmt)
+
+
+class TradingCalendar:
+    """交易日历（SSE），进程内共享"""
+
+    def __init__(self, tushare_token: Optional[str] = None, path: str = DEFAULT_CALENDAR_PATH,
+                 start_date: str = '20100101', min_ahead: int = 30, refresh_interval: int = 3600):
+        """
+        Args:
+            tushare_token: Tushare Token，为空时只读本地文件
+            path: 本地日历文件
+            start_date: 首次下载的起始日期
+            min_ahead: 日历至少覆盖到今天之后的天数，不足时刷新
+            refresh_interval: 两次联网刷新的最小间隔（秒）
+        """
+        self.tushare_token = tushare_token if tushare_token is not None else os.getenv('TUSHARE_TOKEN')
+        self.path = path
+        self.start_date = start_date
+        self.min_ahead = min_ahead
+        self.refresh_interval = refresh_interval
+        self._dates = np.empty(0, dtype=np.int32)
+        self._positions = {}  # 交易日 -> 在 _dates 中的下标
+        self._covered_until = 0  # 日历覆盖到的最后一个自然日（含非交易日）
+        self._last_refresh = 0.0
+        self._approximate = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            data = np.load(self.path)
+            # 文件中最后一个元素记录覆盖到的自然日
+            self._set(data[:-1], int(data[-1]) if len(data) else 0)
+
+    def _set(self, dates: np.ndarray, covered_until: int):
+        self._dates = np.asarray(np.unique(dates), dtype=np.int32)
+        self._positions = {int(d): i for i, d in enumerate(self._dates)}
+        self._covered_until = covered_until
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp.npy'
+        np.save(tmp_path, np.append(self._dates, np.int32(self._covered_until)))
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, force: bool = False) -> bool:
+        """本地日历覆盖不足（或force）时从Tushare下载，返回是否刷新"""
+        today = datetime.now()
+        need_until = to_int_date(today + timedelta(days=self.min_ahead))
+        with self._lock:
+            # 工作日近似只是下载失败时的兜底，覆盖范围不代表真实日历，需要继续重试
+            if not force and not self._approximate and self._covered_until >= need_until:
+                return False
+            if not force and time.time() - self._last_refresh < self.refresh_interval:
+                return False
+            self._last_refresh = time.time()
+            if not self.tushare_token:
+                if len(self._dates) == 0:
+                    self._use_weekday_approximation(today)
+                return False
+            end_date = to_int_date(date(today.year + 1, 12, 31))
+            try:
+                from utils.tushare_limiter import pro_api
+                df = pro_api(self.tushare_token).trade_cal(exchange='SSE', start_date=self.start_date,
+                                                           end_date=str(end_date))
+            except Exception as e:
+                logger.warning(f"[交易日历] 下载失败: {e}")
+                if len(self._dates) == 0:
+                    self._use_weekday_approximation(today)
+                return False
+            if df is None or df.empty:
+                return False
+            open_days = df.loc[df['is_open'].astype(int) == 1, 'cal_date'].astype(int).to_numpy()
+            self._set(open_days, int(df['cal_date'].astype(int).max()))
+            self._approximate = False
+            self._save()
+            logger.info(f"[交易日历] 已更新，共 {len(self._dates)} 个交易日，覆盖至 {self._covered_until}")
+            return True
+
+    def _use_weekday_approximation(self, today: datetime):
+        logger.warning("[交易日历] 无本地日历且无法下载，使用工作日近似（不含法定节假日）")
+        days = pd.bdate_range(self.start_date, date(today.year + 1, 12, 31))
+        self._set(days.strftime('%Y%m%d').astype(int).to_numpy(), to_int_date(days[-1]))
+        self._approximate = True
+
+    def _ensure(self):
+        # 使用工作日近似时每次都尝试刷新（refresh 内按 refresh_interval 限频）
+        if self._approximate or self._covered_until < to_int_date(datetime.now() + timedelta(days=self.min_ahead)):
+            self.refresh()
+
+    @property
+    def date_index(self) -> np.ndarray:
+        """有序交易日数组 int32(YYYYMMDD)"""
+        self._ensure()
+        return self._dates
+
+    def is_trading_day(self, day=None) -> bool:
+        self._ensure()
+        return to_int_date(day or datetime.now()) in self._positions
+
+    def prev_trading_day(self, day=None, inclusive: bool = False) -> Optional[str]:
+        """day 之前（inclusive时含当天）最近的交易日"""
+        dates = self.date_index
+        d = to_int_date(day or datetime.now())
+        i = np.searchsorted(dates, d, side='right' if inclusive else 'left') - 1
+        return str(int(dates[i])) if i >= 0 else None
+
+    def next_trading_day(self, day=None, inclusive: bool = False) -> Optional[str]:
+        """day 之后（inclusive时含当天）最近的交易日"""
+        dates = self.date_index
+        d = to_int_date(day or datetime.now())
+        i = np.searchsorted(dates, d, side='left' if inclusive else 'right')
+        return str(int(dates[i])) if i < len(dates) else None
+
+    def trading_days_between(self, start, end) -> List[str]:
+        """[start, end] 区间内的交易日（YYYYMMDD）"""
+        dates = self.date_index
+        lo = np.searchsorted(dates, to_int_date(start), side='left')
+        hi = np.searchsorted(dates, to_int_date(end), side='right')
+        return [str(d) for d in dates[lo:hi].tolist()]
+
+    def count_trading_days(self, start, end) -> int:
+        dates = self.date_index
+        return int(np.searchsorted(dates, to_int_date(end), side='right')
+                   - np.searchsorted(dates, to_int_date(start), side='left'))
+
+    def shift(self, days, n: int) -> np.ndarray:
+        """
+        向量化交易日偏移：把一组日期（非交易日先对齐到之前最近的交易日）偏移n个交易日
+
+        Args:
+            days: 可迭代的日期（int/str），或 int32 数组
+            n: 偏移交易日数，负数向前
+        Returns:
+            int32(YYYYMMDD) 数组，越界为0
+        """
+        dates = self.date_index
+        arr = np.asarray([to_int_date(d) for d in days] if not isinstance(days, np.ndarray) else days, dtype=np.int64)
+        pos = np.searchsorted(dates, arr, side='right') - 1 + n
+        valid = (pos >= 0) & (pos < len(dates))
+        out = np.zeros(len(arr), dtype=np.int32)
+        out[valid] = dates[pos[valid]]
+        return out
+
+    @property
+    def is_approximate(self) -> bool:
+        return self._approximate
+
+
+# 全局交易日历实例（首次使用时加载）
+_calendar: Optional[TradingCalendar] = None
+_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """获取全局交易日历"""
+    global _calendar
+    with _calendar_lock:
+        if _calendar is None:
+            _calendar = TradingCalendar()
+        return _calendar
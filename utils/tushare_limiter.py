@@ -0,0 +1,168 @@
+"""
+Tushare 接口限流
+- 每个接口（daily、stk_mins、daily_basic、fina_indicator……）一个令牌桶，线程安全，进程内共享
+- 调用前取令牌，额度内不等待；超过额度时只等待到下一个令牌可用
+- 接口返回"超过访问频次"类错误时自适应退避：暂停该接口、降低速率并重试，之后逐步恢复
+使用 pro_api(token) 代替 ts.pro_api(token)，返回对象的接口调用方式不变
+"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+import tushare as ts
+
+logger = logging.getLogger(__name__)
+
+# 每分钟调用次数（按5000积分账户配置），可通过环境变量 TUSHARE_RATE_LIMITS="daily=500,stk_mins=2" 覆盖
+DEFAULT_LIMITS = {
+    'daily': 500,
+    'stk_mins': 2,
+    'daily_basic': 200,
+    'fina_indicator': 200,
+    'default': 200,
+}
+
+# Tushare 超频错误关键字
+RATE_LIMIT_KEYWORDS = ('每分钟最多访问', '每小时最多访问', '每天最多访问', '访问频次', '频率超限', 'exceed')
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    msg = str(e)
+    return any(k in msg for k in RATE_LIMIT_KEYWORDS)
+
+
+class TokenBucket:
+    """令牌桶：rate 个/秒，最多积累 capacity 个"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.base_rate = per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = capacity if capacity is not None else max(1.0, min(per_minute, per_minute / 6.0))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.backoff = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        """取一个令牌，不足时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def on_success(self):
+        """调用成功：速率逐步恢复到配置值"""
+        with self.lock:
+            if self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+            self.backoff = 0.0
+
+    def on_rate_limited(self) -> float:
+        """收到超频错误：清空令牌、速率减半、暂停一段时间（5秒起指数增长，最长60秒）"""
+        with self.lock:
+            self.backoff = min(60.0, self.backoff * 2 if self.backoff else 5.0)
+            self.rate = max(self.base_rate / 8, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = time.monotonic() + self.backoff
+            return self.backoff
+
+
+class TushareRateLimiter:
+    """按接口名管理令牌桶"""
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None, max_retries: int = 3):
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(self._limits_from_env())
+        if limits:
+            self.limits.update(limits)
+        self.max_retries = max_retries
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _limits_from_env() -> Dict[str, float]:
+        limits = {}
+        for item in os.getenv('TUSHARE_RATE_LIMITS', '').split(','):
+            if '=' not in item:
+                continue
+            name, value = item.split('=', 1)
+            try:
+                limits[name.strip()] = float(value)
+            except ValueError:
+                logger.warning(f"[Tushare限流] 无效的限流配置: {item}")
+        return limits
+
+    def configure(self, endpoint: str, per_minute: float):
+        """修改某个接口的每分钟调用次数"""
+        with self._lock:
+            self.limits[endpoint] = per_minute
+            self._buckets.pop(endpoint, None)
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        with self._lock:
+            if endpoint not in self._buckets:
+                per_minute = self.limits.get(endpoint, self.limits['default'])
+                self._buckets[endpoint] = TokenBucket(per_minute)
+            return self._buckets[endpoint]
+
+    def call(self, endpoint: str, func, *args, **kwargs):
+        """限流调用，超频错误时退避重试"""
+        bucket = self.bucket(endpoint)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                wait = bucket.on_rate_limited()
+                logger.warning(f"[Tushare限流] {endpoint} 超过访问频次，{wait:.0f}秒后重试({attempt + 1}/{self.max_retries}): {e}")
+                continue
+            bucket.on_success()
+            return result
+
+
+class RateLimitedProApi:
+    """包装 ts.pro_api() 返回的对象，所有接口调用先经过限流器"""
+
+    def __init__(self, pro, limiter: 'TushareRateLimiter'):
+        self._pro = pro
+        self._limiter = limiter
+
+    def query(self, api_name, fields='', **kwargs):
+        return self._limiter.call(api_name, self._pro.query, api_name, fields=fields, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self._pro, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            return self._limiter.call(name, attr, *args, **kwargs)
+        return wrapper
+
+
+# 全局限流器（同一进程内所有Tushare调用共享额度）
+tushare_limiter = TushareRateLimiter()
+
+
+def get_tushare_limiter() -> TushareRateLimiter:
+    """获取全局Tushare限流器"""
+    return tushare_limiter
+
+
+def pro_api(token: str = '') -> RateLimitedProApi:
+    """带限流的 ts.pro_api()"""
+    return RateLimitedProApi(ts.pro_api(token) if token else ts.pro_api(), tushare_limiter)